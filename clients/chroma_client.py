@@ -1,21 +1,60 @@
 import os
+import re
+import zlib
+from collections.abc import Awaitable, Callable
 from typing import Any
 
 import chromadb
+from chromadb.api import AsyncClientAPI
+from chromadb.api.models.AsyncCollection import AsyncCollection
+from chromadb.config import Settings
 from diskcache import Cache
 from fastapi.logger import logger
 
+from src.agent_tools.rag.embedding_reduction import storage_collection_name
 from src.utils.cache import CacheConfig, cache_key
 
+CHROMA_CLOUD_HOST = "api.trychroma.com"
+
+SHARDING_MODES = ("none", "ticker", "hash")
+SHARD_SEPARATOR = "__"
+SHARD_NAME_UNSAFE_RE = re.compile(r"[^a-z0-9._-]+")
+
 
 class ChromaClient:
-    def __init__(self):
+    """
+    Shared Chroma access.
+
+    Request paths use the async HTTP client: Chroma keeps one pooled `httpx.AsyncClient` per
+    event loop, and collection handles are cached by name so each request costs one round
+    trip. The sync client is kept for scripts and other non-async callers.
+
+    Collections can be sharded by ticker (`CHROMA_SHARDING_MODE=ticker`, one physical
+    collection per company) or by a hash bucket of the ticker (`hash`, with
+    `CHROMA_SHARD_BUCKETS` buckets). Callers keep using the logical collection name and pass
+    the ticker; `route` maps it to the physical collection. The default `none` keeps one
+    collection for every company. Collections stored with reduced embeddings are routed to a
+    collection per reduction spec (see `storage_collection_name`).
+    """
+
+    def __init__(self, *, sharding_mode: str | None = None, shard_buckets: int | None = None):
+        self.sharding_mode = (sharding_mode or os.getenv("CHROMA_SHARDING_MODE") or "none").lower()
+        if self.sharding_mode not in SHARDING_MODES:
+            raise ValueError(
+                f"Unsupported CHROMA_SHARDING_MODE '{self.sharding_mode}'; "
+                f"expected one of {SHARDING_MODES}"
+            )
+        self.shard_buckets = shard_buckets or int(os.getenv("CHROMA_SHARD_BUCKETS") or "64")
+
         api_key = os.getenv("CHROMA_API_KEY")
         tenant = os.getenv("CHROMA_TENANT")
         database = os.getenv("CHROMA_DATABASE")
 
         self._client: Any | None = None
         self._client_factory = self._make_client_factory(api_key, tenant, database)
+        self._async_client: AsyncClientAPI | None = None
+        self._async_client_factory = self._make_async_client_factory(api_key, tenant, database)
+        self._collections: dict[str, AsyncCollection] = {}
 
     def _make_client_factory(self, api_key: str | None, tenant: str | None, database: str | None):
         if api_key and tenant and database:
@@ -25,11 +64,40 @@ class ChromaClient:
         port = int(os.getenv("CHROMA_PORT") or "8000")
         return lambda: chromadb.HttpClient(host=host, port=port)
 
+    def _make_async_client_factory(
+        self, api_key: str | None, tenant: str | None, database: str | None
+    ) -> Callable[[], Awaitable[AsyncClientAPI]]:
+        settings = Settings(
+            chroma_http_max_connections=int(os.getenv("CHROMA_HTTP_MAX_CONNECTIONS", "64")),
+            chroma_http_max_keepalive_connections=int(
+                os.getenv("CHROMA_HTTP_MAX_KEEPALIVE_CONNECTIONS", "16")
+            ),
+        )
+        if api_key and tenant and database:
+            return lambda: chromadb.AsyncHttpClient(
+                host=CHROMA_CLOUD_HOST,
+                port=443,
+                ssl=True,
+                headers={"x-chroma-token": api_key},
+                settings=settings,
+                tenant=tenant,
+                database=database,
+            )
+
+        host = os.getenv("CHROMA_HOST") or "localhost"
+        port = int(os.getenv("CHROMA_PORT") or "8000")
+        return lambda: chromadb.AsyncHttpClient(host=host, port=port, settings=settings)
+
     def _get_client(self):
         if self._client is None:
             self._client = self._client_factory()
         return self._client
 
+    async def get_async_client(self) -> AsyncClientAPI:
+        if self._async_client is None:
+            self._async_client = await self._async_client_factory()
+        return self._async_client
+
     async def list_collection_names(self, *, cache: Cache | None) -> list[str]:
         chroma_identity = {
             "chroma_api_key_set": bool(os.getenv("CHROMA_API_KEY")),
@@ -43,9 +111,9 @@ class ChromaClient:
                 logger.info(f"Using cached list_collections response: {key}")
                 return cached
 
-        client = self._get_client()
         try:
-            collections = client.list_collections()
+            client = await self.get_async_client()
+            collections = await client.list_collections()
         except Exception as exc:
             logger.error("Failed to list Chroma collections", exc_info=exc)
             return []
@@ -65,14 +133,72 @@ class ChromaClient:
     def get_client(self):
         return self._get_client()
 
+    @property
+    def sharded(self) -> bool:
+        return self.sharding_mode != "none"
+
+    def route(self, collection_name: str, ticker: str | None = None) -> str:
+        """Physical collection holding `ticker`'s chunks of the logical `collection_name`."""
+        collection_name = storage_collection_name(collection_name)
+        if not self.sharded or not ticker:
+            return collection_name
+        normalized = ticker.strip().upper()
+        if self.sharding_mode == "hash":
+            bucket = zlib.crc32(normalized.encode("utf-8")) % self.shard_buckets
+            shard = f"b{bucket:03d}"
+        else:
+            shard = SHARD_NAME_UNSAFE_RE.sub("-", normalized.lower()).strip("-._")
+        return f"{collection_name}{SHARD_SEPARATOR}{shard}"
+
+    async def list_shard_names(self, collection_name: str) -> list[str]:
+        prefix = f"{storage_collection_name(collection_name)}{SHARD_SEPARATOR}"
+        names = await self.list_collection_names(cache=None)
+        return [name for name in names if name.startswith(prefix)]
+
+    async def get_collection(
+        self, collection_name: str, *, create: bool = False
+    ) -> AsyncCollection:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            client = await self.get_async_client()
+            if create:
+                collection = await client.get_or_create_collection(name=collection_name)
+            else:
+                collection = await client.get_collection(name=collection_name)
+            self._collections[collection_name] = collection
+        return collection
+
+    def forget_collection(self, collection_name: str) -> None:
+        """Drop a cached handle, e.g. after the collection was deleted or recreated."""
+        self._collections.pop(collection_name, None)
+
     async def get_collection_or_raise(
-        self, collection_name: str | None, *, cache: Cache | None
-    ) -> Any:
+        self, collection_name: str | None, *, cache: Cache | None, ticker: str | None = None
+    ) -> AsyncCollection:
         try:
-            client = self._get_client()
-            return client.get_collection(name=collection_name)
+            return await self.get_collection(self.route(collection_name, ticker))
         except Exception as exc:
             available = await self.list_collection_names(cache=cache)
             raise ValueError(
                 f"Failed to open Chroma collection '{collection_name}'. Available: {available}"
             ) from exc
+
+    async def get_query_collections_or_raise(
+        self, collection_name: str, *, cache: Cache | None, ticker: str | None = None
+    ) -> list[AsyncCollection]:
+        """
+        Collections a read must search: the routed one, or every shard when sharding is on
+        and the read is not scoped to a single ticker.
+        """
+        if not self.sharded or ticker:
+            return [await self.get_collection_or_raise(collection_name, cache=cache, ticker=ticker)]
+        shard_names = await self.list_shard_names(collection_name)
+        if not shard_names:
+            available = await self.list_collection_names(cache=cache)
+            raise ValueError(
+                f"No shards of Chroma collection '{collection_name}'. Available: {available}"
+            )
+        return [await self.get_collection(name) for name in shard_names]
+
+
+chroma_client = ChromaClient()
@@ -0,0 +1,105 @@
+import asyncio
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+EmbedMany = Callable[[list[str], str], list[list[float]]]
+
+
+@dataclass
+class EmbeddingBatcherStats:
+    requests: int = 0
+    batches: int = 0
+    texts_embedded: int = 0
+    max_batch_size: int = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        snapshot = asdict(self)
+        snapshot["avg_batch_size"] = self.requests / self.batches if self.batches else 0.0
+        return snapshot
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batch calls.
+
+    Requests for the same model that arrive within `window_seconds` of the first one, up to
+    `max_batch_size`, are embedded by one `embed_many` call in a worker thread and each
+    caller receives its own vector. Duplicate texts inside a batch are embedded once. If a
+    batch call fails, its texts are retried individually so errors stay per caller.
+    """
+
+    def __init__(self, embed_many: EmbedMany, *, max_batch_size: int, window_seconds: float):
+        self.embed_many = embed_many
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_seconds = window_seconds
+        self._stats = EmbeddingBatcherStats()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: dict[str, list[tuple[str, asyncio.Future[list[float]]]]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, text: str, model_name: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending = {}
+            self._timers = {}
+            self._tasks = set()
+
+        future: asyncio.Future[list[float]] = loop.create_future()
+        batch = self._pending.setdefault(model_name, [])
+        batch.append((text, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(model_name)
+        elif model_name not in self._timers:
+            self._timers[model_name] = loop.call_later(self.window_seconds, self._flush, model_name)
+        return await future
+
+    def stats(self) -> dict[str, Any]:
+        return self._stats.snapshot()
+
+    def _flush(self, model_name: str) -> None:
+        timer = self._timers.pop(model_name, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model_name, [])
+        if not batch:
+            return
+        task = self._loop.create_task(self._run(model_name, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, model_name: str, batch: list[tuple[str, asyncio.Future[list[float]]]]
+    ) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self._stats.requests += len(batch)
+        self._stats.batches += 1
+        self._stats.texts_embedded += len(texts)
+        self._stats.max_batch_size = max(self._stats.max_batch_size, len(batch))
+        try:
+            embeddings = await asyncio.to_thread(self.embed_many, texts, model_name)
+            outcomes: dict[str, list[float] | Exception] = dict(zip(texts, embeddings, strict=True))
+        except Exception as exc:
+            if len(texts) == 1:
+                outcomes = {texts[0]: exc}
+            else:
+                # Retry one by one so a single bad text only fails its own callers.
+                outcomes = {}
+                for text in texts:
+                    try:
+                        (outcomes[text],) = await asyncio.to_thread(
+                            self.embed_many, [text], model_name
+                        )
+                    except Exception as text_exc:
+                        outcomes[text] = text_exc
+
+        for text, future in batch:
+            if future.done():
+                continue
+            outcome = outcomes[text]
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
@@ -0,0 +1,127 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Literal
+
+from diskcache import Cache
+
+EmbeddingKind = Literal["query", "text"]
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_embedding_text(text: str) -> str:
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    def snapshot(self, memory_entries: int) -> dict[str, Any]:
+        snapshot = asdict(self)
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        snapshot["hit_rate"] = (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+        snapshot["memory_entries"] = memory_entries
+        return snapshot
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (kind, model, normalised text).
+
+    An in-memory LRU answers hot queries without I/O; misses fall through to a diskcache tier
+    that survives restarts. Embeddings are deterministic per model, so entries never expire.
+    Query and document embeddings are keyed separately since some models embed them
+    differently; document embeddings skip the memory tier so a bulk ingest cannot evict
+    hot queries.
+    """
+
+    def __init__(self, cache_dir: str | None, *, memory_size: int = 2048):
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._disk: Cache | None = None
+        self._stats = EmbeddingCacheStats()
+        self._lock = threading.Lock()
+
+    @property
+    def disk(self) -> Cache | None:
+        if self._disk is None and self.cache_dir:
+            self._disk = Cache(self.cache_dir)
+        return self._disk
+
+    @staticmethod
+    def key(kind: EmbeddingKind, model_name: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_embedding_text(text).encode("utf-8")).hexdigest()
+        return f"embedding:{kind}:{model_name}:{digest}"
+
+    def peek(self, kind: EmbeddingKind, model_name: str, text: str) -> list[float] | None:
+        """Memory-tier lookup only; safe to call on the event loop."""
+        if kind != "query":
+            return None
+        key = self.key(kind, model_name, text)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self._stats.memory_hits += 1
+        return embedding
+
+    def get_many(
+        self, kind: EmbeddingKind, model_name: str, texts: list[str]
+    ) -> list[list[float] | None]:
+        found: list[list[float] | None] = []
+        for text in texts:
+            key = self.key(kind, model_name, text)
+            use_memory = kind == "query"
+            with self._lock:
+                embedding = self._memory.get(key) if use_memory else None
+                if embedding is not None:
+                    self._memory.move_to_end(key)
+                    self._stats.memory_hits += 1
+                    found.append(embedding)
+                    continue
+
+            disk = self.disk
+            embedding = disk.get(key) if disk is not None else None
+            with self._lock:
+                if embedding is None:
+                    self._stats.misses += 1
+                else:
+                    self._stats.disk_hits += 1
+                    if use_memory:
+                        self._remember(key, embedding)
+            found.append(embedding)
+        return found
+
+    def set_many(
+        self,
+        kind: EmbeddingKind,
+        model_name: str,
+        texts: list[str],
+        embeddings: list[list[float]],
+    ) -> None:
+        disk = self.disk
+        for text, embedding in zip(texts, embeddings, strict=True):
+            key = self.key(kind, model_name, text)
+            vector = list(embedding)
+            if kind == "query":
+                with self._lock:
+                    self._remember(key, vector)
+            if disk is not None:
+                disk.set(key, vector)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return self._stats.snapshot(len(self._memory))
+
+    def _remember(self, key: str, embedding: list[float]) -> None:
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
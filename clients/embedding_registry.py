@@ -0,0 +1,268 @@
+import asyncio
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from fastapi.logger import logger
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.embeddings.utils import resolve_embed_model
+
+from clients.embedding_batcher import EmbeddingBatcher
+from clients.embedding_cache import EmbeddingCache, EmbeddingKind, normalize_embedding_text
+
+DEFAULT_EMBED_MODEL = "default"
+WARMUP_TEXT = "warmup"
+
+
+def default_embed_model_name() -> str:
+    return os.getenv("RAG_EMBED_MODEL") or DEFAULT_EMBED_MODEL
+
+
+def _supports_batched_queries(model: BaseEmbedding) -> bool:
+    """OpenAI-style models embed queries and documents with the same engine."""
+    query_engine = getattr(model, "_query_engine", None)
+    return query_engine is not None and query_engine == getattr(model, "_text_engine", None)
+
+
+def _embed_queries(model: BaseEmbedding, texts: list[str]) -> list[list[float]]:
+    if len(texts) > 1 and _supports_batched_queries(model):
+        return model.get_text_embedding_batch(texts)
+    return [model.get_query_embedding(text) for text in texts]
+
+
+@dataclass
+class EmbeddingModelStats:
+    calls: int = 0
+    texts: int = 0
+    errors: int = 0
+    total_latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+
+    def record(self, texts: int, latency_ms: float, *, failed: bool = False) -> None:
+        self.calls += 1
+        self.texts += texts
+        self.errors += int(failed)
+        self.total_latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+
+    def snapshot(self) -> dict[str, Any]:
+        snapshot = asdict(self)
+        snapshot["avg_latency_ms"] = self.total_latency_ms / self.calls if self.calls else 0.0
+        return snapshot
+
+
+@dataclass
+class EmbeddingDedupReport:
+    """How many of a batch's texts needed the model versus came from duplicates or cache."""
+
+    texts: int
+    unique_texts: int
+    embedded: int
+
+    @property
+    def reused(self) -> int:
+        return self.texts - self.embedded
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.reused / self.texts if self.texts else 0.0
+
+
+class EmbeddingRegistry:
+    """
+    Process-wide embedding models keyed by name.
+
+    Each model is resolved once and reused, so its HTTP client and connection pool survive
+    across requests. All embedding calls go through the registry to be counted and timed,
+    and, when a cache is configured, only texts missing from the cache reach the model.
+    With `batch_window_ms` set, concurrent async query embeddings are coalesced into batches.
+    """
+
+    def __init__(
+        self,
+        resolver: Callable[[str], BaseEmbedding] = resolve_embed_model,
+        *,
+        cache: EmbeddingCache | None = None,
+        batch_window_ms: float = 0,
+        max_batch_size: int = 32,
+    ):
+        self._resolver = resolver
+        self.cache = cache
+        self._batcher = (
+            EmbeddingBatcher(
+                self.get_query_embeddings,
+                max_batch_size=max_batch_size,
+                window_seconds=batch_window_ms / 1000,
+            )
+            if batch_window_ms > 0
+            else None
+        )
+        self._models: dict[str, BaseEmbedding] = {}
+        self._stats: dict[str, EmbeddingModelStats] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str | None = None) -> BaseEmbedding:
+        name = model_name or default_embed_model_name()
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                logger.info("Loading embedding model %s", name)
+                model = self._resolver(name)
+                self._models[name] = model
+                self._stats.setdefault(name, EmbeddingModelStats())
+        return model
+
+    def warm(self, model_names: Iterable[str | None] = (None,)) -> None:
+        """Resolve models and issue one embedding call each so connections are open."""
+        for model_name in model_names:
+            name = model_name or default_embed_model_name()
+            try:
+                # Bypass the cache: the point is to open the model's connections.
+                self._timed(name, 1, lambda model: [model.get_query_embedding(WARMUP_TEXT)])
+                logger.info("Embedding model %s warmed", name)
+            except Exception as exc:
+                logger.warning("Failed to warm embedding model %s: %s", name, exc)
+
+    def get_query_embedding(self, text: str, model_name: str | None = None) -> list[float]:
+        (embedding,) = self.get_query_embeddings([text], model_name)
+        return embedding
+
+    def get_query_embeddings(
+        self, texts: list[str], model_name: str | None = None
+    ) -> list[list[float]]:
+        return self._embed_cached("query", model_name, texts, _embed_queries)
+
+    def get_text_embedding_batch(
+        self, texts: list[str], model_name: str | None = None
+    ) -> list[list[float]]:
+        embeddings, _ = self.get_text_embedding_batch_with_report(texts, model_name)
+        return embeddings
+
+    def get_text_embedding_batch_with_report(
+        self, texts: list[str], model_name: str | None = None
+    ) -> tuple[list[list[float]], EmbeddingDedupReport]:
+        return self._embed_cached_with_report(
+            "text", model_name, texts, lambda model, batch: model.get_text_embedding_batch(batch)
+        )
+
+    async def aget_query_embedding(self, text: str, model_name: str | None = None) -> list[float]:
+        name = model_name or default_embed_model_name()
+        if self._batcher is None:
+            return await asyncio.to_thread(self.get_query_embedding, text, name)
+        if self.cache is not None:
+            cached = self.cache.peek("query", name, text)
+            if cached is not None:
+                return cached
+        return await self._batcher.submit(text, name)
+
+    async def aget_query_embeddings(
+        self, texts: list[str], model_name: str | None = None
+    ) -> list[list[float]]:
+        """Embed several queries in one model call; cached queries are not re-embedded."""
+        if len(texts) == 1:
+            return [await self.aget_query_embedding(texts[0], model_name)]
+        return await asyncio.to_thread(self.get_query_embeddings, texts, model_name)
+
+    async def aget_text_embedding_batch(
+        self, texts: list[str], model_name: str | None = None
+    ) -> list[list[float]]:
+        return await asyncio.to_thread(self.get_text_embedding_batch, texts, model_name)
+
+    async def aget_text_embedding_batch_with_report(
+        self, texts: list[str], model_name: str | None = None
+    ) -> tuple[list[list[float]], EmbeddingDedupReport]:
+        return await asyncio.to_thread(self.get_text_embedding_batch_with_report, texts, model_name)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in self._stats.items()}
+
+    def cache_stats(self) -> dict[str, Any] | None:
+        return self.cache.stats() if self.cache is not None else None
+
+    def batch_stats(self) -> dict[str, Any] | None:
+        return self._batcher.stats() if self._batcher is not None else None
+
+    def _embed_cached(
+        self,
+        kind: EmbeddingKind,
+        model_name: str | None,
+        texts: list[str],
+        compute: Callable[[BaseEmbedding, list[str]], list[list[float]]],
+    ) -> list[list[float]]:
+        embeddings, _ = self._embed_cached_with_report(kind, model_name, texts, compute)
+        return embeddings
+
+    def _embed_cached_with_report(
+        self,
+        kind: EmbeddingKind,
+        model_name: str | None,
+        texts: list[str],
+        compute: Callable[[BaseEmbedding, list[str]], list[list[float]]],
+    ) -> tuple[list[list[float]], EmbeddingDedupReport]:
+        if not texts:
+            return [], EmbeddingDedupReport(texts=0, unique_texts=0, embedded=0)
+        name = model_name or default_embed_model_name()
+        unique_texts = len(set(map(normalize_embedding_text, texts)))
+        if self.cache is None:
+            embeddings = self._timed(name, len(texts), lambda model: compute(model, texts))
+            return embeddings, EmbeddingDedupReport(
+                texts=len(texts), unique_texts=unique_texts, embedded=len(texts)
+            )
+
+        embeddings = self.cache.get_many(kind, name, texts)
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        # Texts differing only in whitespace share a cache key, so they are embedded once.
+        first_by_key: dict[str, str] = {}
+        for index in missing:
+            first_by_key.setdefault(normalize_embedding_text(texts[index]), texts[index])
+        missing_texts = list(first_by_key.values())
+        if missing:
+            computed = self._timed(
+                name, len(missing_texts), lambda model: compute(model, missing_texts)
+            )
+            self.cache.set_many(kind, name, missing_texts, computed)
+            by_key = dict(zip(first_by_key, computed, strict=True))
+            for index in missing:
+                embeddings[index] = by_key[normalize_embedding_text(texts[index])]
+        return embeddings, EmbeddingDedupReport(
+            texts=len(texts), unique_texts=unique_texts, embedded=len(missing_texts)
+        )
+
+    def _timed(
+        self,
+        model_name: str | None,
+        texts: int,
+        call: Callable[[BaseEmbedding], list[list[float]]],
+    ) -> list[list[float]]:
+        name = model_name or default_embed_model_name()
+        model = self.get(name)
+        start = time.perf_counter()
+        failed = False
+        try:
+            return call(model)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._stats.setdefault(name, EmbeddingModelStats()).record(
+                    texts, latency_ms, failed=failed
+                )
+
+
+embedding_registry = EmbeddingRegistry(
+    cache=EmbeddingCache(
+        os.getenv("EMBEDDING_CACHE_DIR", "./.embedding_cache"),
+        memory_size=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "2048")),
+    ),
+    batch_window_ms=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")),
+    max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32")),
+)
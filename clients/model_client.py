@@ -3,12 +3,19 @@ import contextvars
 import logging
 import os
 import time
+from functools import lru_cache
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4)
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """One AsyncOpenAI client per key, so its connection pool is shared across requests."""
+    return AsyncOpenAI(api_key=api_key)
+
+
 class ModelClient:
     """
     Bridge client for LLM model providers.
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import sys
+from contextlib import asynccontextmanager
 
 from diskcache import Cache
 from dotenv import load_dotenv
@@ -15,6 +17,8 @@ def _ensure_repo_root_on_path() -> None:
 
 _ensure_repo_root_on_path()
 
+from clients.embedding_registry import embedding_registry
+from src.agent_tools.edgar.ingestion_queue import ingestion_queue
 from src.agent_tools.edgar.search_reports import (
     register_tools as register_edgar_tools,
 )
@@ -25,7 +29,19 @@ from src.utils.logging_config import configure_logging
 load_dotenv()
 configure_logging()
 
-mcp_server = McpServerFactory.create_mcp_server("AnalystReportMcpServer")
+
+@asynccontextmanager
+async def _lifespan(_server):
+    await asyncio.to_thread(embedding_registry.warm)
+    # Resume ingestion jobs a previous run left queued or running.
+    ingestion_queue.start()
+    try:
+        yield {}
+    finally:
+        await ingestion_queue.stop()
+
+
+mcp_server = McpServerFactory.create_mcp_server("AnalystReportMcpServer", lifespan=_lifespan)
 cache = Cache("./.rag_mcp_cache")
 
 register_rag_tools(mcp_server, cache=cache)
@@ -1,11 +1,10 @@
 from __future__ import annotations
 
-import re
-
 import aiohttp
 import requests
 from llama_index.core.schema import BaseNode
 
+from src.agent_tools.edgar.filing_segmenter import FilingOutline, segment_filing
 from src.utils.edgar_config import EdgarConfig
 
 
@@ -46,29 +45,13 @@ class EdgarClient:
 
             return await resp.text()
 
-    def _normalize_html_nodes(raw_nodes: list[BaseNode]):
+    def _normalize_html_nodes(raw_nodes: list[BaseNode], form: str | None = None) -> FilingOutline:
         """
-        Normalize + filter junk before chunking
+        Normalize + filter junk before chunking, tagging each node with its Item section
+        and financial statement type.
 
-        :param raw_nodes: Description
+        :param raw_nodes: nodes produced by `HTMLNodeParser`, in document order
         :type raw_nodes: list[BaseNode]
+        :param form: SEC form type (e.g. '10-K', '10-Q')
         """
-        cleaned_nodes = []
-        item_re = re.compile(r"ITEM\s+\d+[A-Z]?\.", re.IGNORECASE)
-        current_section = None
-
-        for n in raw_nodes:
-            text = re.sub(r"\s+", " ", n.text or "").strip()
-            MIN_TEXT_LEN, MAX_TEXT_LEN = 80, 5000
-            if len(text) < MIN_TEXT_LEN or len(text) > MAX_TEXT_LEN:
-                continue
-
-            if item_re.search(text):
-                current_section = text
-
-            n.text = text
-            if current_section:
-                n.metadata["section"] = current_section
-
-            cleaned_nodes.append(n)
-        return cleaned_nodes
+        return segment_filing(raw_nodes, form)
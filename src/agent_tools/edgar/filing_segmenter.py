@@ -0,0 +1,270 @@
+"""Section-aware segmentation of 10-K / 10-Q filings into an Item tree."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+from llama_index.core.schema import BaseNode
+
+PREAMBLE_SECTION = "preamble"
+NO_STATEMENT = "none"
+
+MIN_TEXT_LEN = 80
+MIN_STATEMENT_TEXT_LEN = 20
+MAX_HEADING_LEN = 200
+MAX_TITLE_LEN = 120
+# A node that names this many distinct items is a table of contents, not a heading.
+TOC_ITEM_COUNT = 3
+
+ITEM_HEADING_RE = re.compile(
+    r"^(?:PART\s+(?P<part>IV|III|II|I)\b[\s,.:\-\u2013\u2014]*)?"
+    r"ITEM\s+(?P<item>\d{1,2}[A-C]?)\s*[.:\-\u2013\u2014]?\s*(?P<title>.*)$",
+    re.IGNORECASE,
+)
+ITEM_MENTION_RE = re.compile(r"\bITEM\s+(\d{1,2}[A-C]?)\b", re.IGNORECASE)
+PART_HEADING_RE = re.compile(r"^PART\s+(IV|III|II|I)\b(?!\s*,?\s*ITEM)", re.IGNORECASE)
+
+STATEMENT_HEADING_PATTERNS: dict[str, re.Pattern[str]] = {
+    "income_statement": re.compile(
+        r"statements?\s+of\s+(?:consolidated\s+)?"
+        r"(?:operations|income|earnings|comprehensive\s+(?:income|loss))"
+        r"|income\s+statements?",
+        re.IGNORECASE,
+    ),
+    "balance_sheet": re.compile(
+        r"balance\s+sheets?|statements?\s+of\s+financial\s+(?:position|condition)",
+        re.IGNORECASE,
+    ),
+    "cash_flow_statement": re.compile(
+        r"statements?\s+of\s+(?:consolidated\s+)?cash\s+flows?|cash\s+flows?\s+statements?",
+        re.IGNORECASE,
+    ),
+}
+# Headings that close the current statement without opening a tracked one.
+STATEMENT_END_RE = re.compile(
+    r"statements?\s+of\s+(?:changes\s+in\s+)?(?:shareholders|stockholders)['\u2019]?\s+equity"
+    r"|notes\s+to\s+(?:the\s+)?(?:condensed\s+)?(?:consolidated\s+)?financial\s+statements",
+    re.IGNORECASE,
+)
+
+# Sections in which primary financial statements are printed.
+FINANCIAL_STATEMENT_SECTIONS = frozenset({"item_8", "item_15", "part_i_item_1"})
+
+FORM_10K_TITLES: dict[str, str] = {
+    "item_1": "Business",
+    "item_1a": "Risk Factors",
+    "item_1b": "Unresolved Staff Comments",
+    "item_1c": "Cybersecurity",
+    "item_2": "Properties",
+    "item_3": "Legal Proceedings",
+    "item_4": "Mine Safety Disclosures",
+    "item_5": "Market for Registrant's Common Equity",
+    "item_6": "[Reserved]",
+    "item_7": "Management's Discussion and Analysis",
+    "item_7a": "Quantitative and Qualitative Disclosures About Market Risk",
+    "item_8": "Financial Statements and Supplementary Data",
+    "item_9": "Changes in and Disagreements with Accountants",
+    "item_9a": "Controls and Procedures",
+    "item_9b": "Other Information",
+    "item_9c": "Disclosure Regarding Foreign Jurisdictions that Prevent Inspections",
+    "item_10": "Directors, Executive Officers and Corporate Governance",
+    "item_11": "Executive Compensation",
+    "item_12": "Security Ownership of Certain Beneficial Owners and Management",
+    "item_13": "Certain Relationships and Related Transactions",
+    "item_14": "Principal Accountant Fees and Services",
+    "item_15": "Exhibits and Financial Statement Schedules",
+    "item_16": "Form 10-K Summary",
+}
+FORM_10Q_TITLES: dict[str, str] = {
+    "part_i_item_1": "Financial Statements",
+    "part_i_item_2": "Management's Discussion and Analysis",
+    "part_i_item_3": "Quantitative and Qualitative Disclosures About Market Risk",
+    "part_i_item_4": "Controls and Procedures",
+    "part_ii_item_1": "Legal Proceedings",
+    "part_ii_item_1a": "Risk Factors",
+    "part_ii_item_2": "Unregistered Sales of Equity Securities and Use of Proceeds",
+    "part_ii_item_3": "Defaults Upon Senior Securities",
+    "part_ii_item_4": "Mine Safety Disclosures",
+    "part_ii_item_5": "Other Information",
+    "part_ii_item_6": "Exhibits",
+}
+
+# Form-independent topics mapped to the section ids that carry them.
+SECTION_TOPICS: dict[str, tuple[str, ...]] = {
+    "business": ("item_1",),
+    "risk_factors": ("item_1a", "part_ii_item_1a"),
+    "mdna": ("item_7", "part_i_item_2"),
+    "market_risk": ("item_7a", "part_i_item_3"),
+    "financial_statements": ("item_8", "part_i_item_1"),
+    "legal_proceedings": ("item_3", "part_ii_item_1"),
+    "controls": ("item_9a", "part_i_item_4"),
+}
+# Question wording that points at a topic's sections; a question matching none is unscoped.
+SECTION_INTENT_PATTERNS: dict[str, re.Pattern[str]] = {
+    "business": re.compile(
+        r"business\s+model|products?\b|customers?\b|competit|strategy", re.IGNORECASE
+    ),
+    "risk_factors": re.compile(r"\brisks?\b|uncertaint|headwinds?", re.IGNORECASE),
+    "mdna": re.compile(
+        r"guidance|outlook|results\s+of\s+operations|management['\u2019]?s\s+discussion|md&a"
+        r"|segments?\b|margins?\b|growth|liquidity|trends?\b",
+        re.IGNORECASE,
+    ),
+    "market_risk": re.compile(
+        r"interest[\s-]+rates?|foreign\s+(?:currency|exchange)|\bfx\b|hedg|commodity\s+price",
+        re.IGNORECASE,
+    ),
+    "financial_statements": re.compile(
+        r"balance\s+sheets?|cash\s+flows?|income\s+statements?|financial\s+statements"
+        r"|earnings\s+per\s+share|\beps\b|total\s+(?:assets|liabilities|debt)",
+        re.IGNORECASE,
+    ),
+    "legal_proceedings": re.compile(r"litigation|lawsuits?|legal\s+proceedings", re.IGNORECASE),
+    "controls": re.compile(
+        r"internal\s+controls?|material\s+weakness|disclosure\s+controls", re.IGNORECASE
+    ),
+}
+
+
+@dataclass
+class FilingStatement:
+    """A primary financial statement located inside a financial-statements section."""
+
+    statement_type: str
+    title: str
+    nodes: list[BaseNode] = field(default_factory=list)
+
+
+@dataclass
+class FilingSection:
+    """One Item of the filing together with the statements identified inside it."""
+
+    section_id: str
+    title: str
+    nodes: list[BaseNode] = field(default_factory=list)
+    statements: list[FilingStatement] = field(default_factory=list)
+
+
+@dataclass
+class FilingOutline:
+    """Item tree of a filing plus its cleaned nodes in document order."""
+
+    form: str
+    sections: list[FilingSection] = field(default_factory=list)
+    nodes: list[BaseNode] = field(default_factory=list)
+
+    def section(self, section_id: str) -> FilingSection | None:
+        for section in self.sections:
+            if section.section_id == section_id:
+                return section
+        return None
+
+
+def _is_quarterly(form: str | None) -> bool:
+    return bool(form) and form.upper().startswith("10-Q")
+
+
+def infer_section_topics(*texts: str) -> list[str]:
+    """`SECTION_TOPICS` keys whose intent patterns match any of `texts`, in table order."""
+    text = " ".join(texts)
+    return [topic for topic, pattern in SECTION_INTENT_PATTERNS.items() if pattern.search(text)]
+
+
+def _section_id(item: str, part: str | None, quarterly: bool) -> str:
+    item_id = f"item_{item.lower()}"
+    if quarterly:
+        return f"part_{(part or 'I').lower()}_{item_id}"
+    return item_id
+
+
+def _match_item_heading(text: str) -> tuple[str, str | None, str] | None:
+    match = ITEM_HEADING_RE.match(text)
+    if not match:
+        return None
+    if len({m.upper() for m in ITEM_MENTION_RE.findall(text)}) >= TOC_ITEM_COUNT:
+        return None
+    part = match.group("part")
+    title = match.group("title").strip()
+    return match.group("item"), part.upper() if part else None, title
+
+
+def _match_statement_heading(text: str) -> str | None:
+    """Return the statement type for a statement heading, or NO_STATEMENT for an end marker."""
+    if len(text) > MAX_HEADING_LEN:
+        return None
+    found = [kind for kind, pattern in STATEMENT_HEADING_PATTERNS.items() if pattern.search(text)]
+    if len(found) == 1:
+        return found[0]
+    if not found and STATEMENT_END_RE.search(text):
+        return NO_STATEMENT
+    # Several statement names in one short node is an index of statements.
+    return None
+
+
+def segment_filing(raw_nodes: list[BaseNode], form: str | None = None) -> FilingOutline:
+    """
+    Build the Item tree of a 10-K / 10-Q in one linear pass over parsed HTML nodes.
+
+    Every kept node is normalised and tagged with `section`, `section_title` and
+    `statement_type` metadata. Long nodes are kept intact for the sentence splitter.
+
+    :param raw_nodes: nodes produced by `HTMLNodeParser`, in document order
+    :param form: SEC form type; 10-Q filings get part-qualified section ids
+    """
+    quarterly = _is_quarterly(form)
+    titles = FORM_10Q_TITLES if quarterly else FORM_10K_TITLES
+    outline = FilingOutline(form=(form or "").upper())
+
+    current = FilingSection(section_id=PREAMBLE_SECTION, title="Cover and Table of Contents")
+    outline.sections.append(current)
+    sections_by_id = {current.section_id: current}
+    statement: FilingStatement | None = None
+    part: str | None = None
+
+    for node in raw_nodes:
+        text = re.sub(r"\s+", " ", node.text or "").strip()
+        if not text:
+            continue
+
+        part_match = PART_HEADING_RE.match(text)
+        if part_match and len(text) <= MAX_HEADING_LEN:
+            part = part_match.group(1).upper()
+
+        heading = _match_item_heading(text)
+        if heading:
+            item, heading_part, heading_title = heading
+            part = heading_part or part
+            section_id = _section_id(item, part, quarterly)
+            existing = sections_by_id.get(section_id)
+            if existing is None:
+                title = titles.get(section_id, section_id)
+                if heading_title and len(text) <= MAX_HEADING_LEN:
+                    title = heading_title[:MAX_TITLE_LEN]
+                existing = FilingSection(section_id=section_id, title=title)
+                outline.sections.append(existing)
+                sections_by_id[section_id] = existing
+            current = existing
+            statement = None
+        elif current.section_id in FINANCIAL_STATEMENT_SECTIONS:
+            statement_type = _match_statement_heading(text)
+            if statement_type == NO_STATEMENT:
+                statement = None
+            elif statement_type:
+                statement = FilingStatement(statement_type=statement_type, title=text)
+                current.statements.append(statement)
+
+        min_len = MIN_STATEMENT_TEXT_LEN if statement else MIN_TEXT_LEN
+        if len(text) < min_len:
+            continue
+
+        node.text = text
+        node.metadata["section"] = current.section_id
+        node.metadata["section_title"] = current.title
+        node.metadata["statement_type"] = statement.statement_type if statement else NO_STATEMENT
+        current.nodes.append(node)
+        if statement:
+            statement.nodes.append(node)
+        outline.nodes.append(node)
+
+    return outline
@@ -0,0 +1,256 @@
+"""Persistent record of which EDGAR accessions have been ingested into Chroma."""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Callable, Iterable
+from datetime import UTC, datetime, timedelta
+
+from diskcache import Cache
+from fastapi.encoders import jsonable_encoder
+
+from src.models.edgar_ingestion import IngestionManifestEntry, IngestionPlan, IngestionStatus
+
+logger = logging.getLogger(__name__)
+
+ENTRY_KEY_PREFIX = "edgar_manifest:"
+VERSION_KEY_PREFIX = "edgar_manifest_version:"
+SCOPE_KEY_PREFIX = "edgar_manifest_scope:"
+# Set once the scope listings have been built from the entries written before they existed.
+SCOPES_BUILT_KEY = "edgar_manifest_scopes_built"
+# An ingest that has not finished within this window is assumed to have died mid-way.
+STALE_INGEST_AFTER = timedelta(minutes=15)
+
+
+class IngestionManifest:
+    """
+    Accession → ingestion status store kept next to the MCP server.
+
+    The manifest is the source of truth for "is this filing already in Chroma": a complete
+    entry lets the upsert path return without touching Chroma, and an entry stuck in
+    `ingesting` or `failed` marks a filing whose chunks need to be repaired.
+
+    It also keeps content version counters per collection and per (collection, ticker),
+    bumped whenever chunks are written or deleted, so retrieval caches can key on them, and
+    a listing of the accessions in each of those scopes, so a query can learn what its scope
+    holds without scanning every entry.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._cache: Cache | None = None
+
+    @property
+    def cache(self) -> Cache:
+        if self._cache is None:
+            self._cache = Cache(self.cache_dir)
+        return self._cache
+
+    def get(self, accession_number: str) -> IngestionManifestEntry | None:
+        payload = self.cache.get(self._entry_key(accession_number))
+        if not payload:
+            return None
+        return IngestionManifestEntry.model_validate(payload)
+
+    def scope(self, collection_name: str, ticker: str | None = None) -> dict[str, int | None]:
+        """
+        Accessions recorded for the collection, or one ticker's, mapped to their chunk count.
+
+        Accessions that are not (yet) fully ingested map to None.
+        """
+        if not self.cache.get(SCOPES_BUILT_KEY):
+            self._build_scopes()
+        return dict(self.cache.get(self._scope_key(collection_name, ticker)) or {})
+
+    def plan(
+        self,
+        accession_numbers: Iterable[str],
+        *,
+        is_outdated: Callable[[IngestionManifestEntry], bool] | None = None,
+    ) -> IngestionPlan:
+        """
+        Partition accessions by what still has to be ingested, from local state only.
+
+        Ingested entries for which `is_outdated` returns True (built with another embedding
+        model or stored in another collection) are reported as partial, to be rebuilt.
+        """
+        plan = IngestionPlan()
+        now = datetime.now(UTC)
+        for accession_number in dict.fromkeys(accession_numbers):
+            entry = self.get(accession_number)
+            if entry is None:
+                plan.pending.append(accession_number)
+            elif entry.status == IngestionStatus.INGESTED:
+                if is_outdated is not None and is_outdated(entry):
+                    plan.partial.append(accession_number)
+                else:
+                    plan.ingested.append(accession_number)
+            elif self.is_stale(entry, now):
+                plan.partial.append(accession_number)
+            else:
+                plan.in_progress.append(accession_number)
+        return plan
+
+    def mark_ingesting(
+        self,
+        accession_number: str,
+        *,
+        collection_name: str,
+        embed_model: str | None = None,
+        stored_collection: str | None = None,
+        ticker: str | None = None,
+    ) -> None:
+        self._save(
+            IngestionManifestEntry(
+                accession_number=accession_number,
+                status=IngestionStatus.INGESTING,
+                collection_name=collection_name,
+                embed_model=embed_model,
+                stored_collection=stored_collection,
+                ticker=ticker,
+                updated_at=datetime.now(UTC),
+            )
+        )
+
+    def mark_ingested(
+        self,
+        accession_number: str,
+        *,
+        chunk_count: int,
+        collection_name: str,
+        embed_model: str | None = None,
+        stored_collection: str | None = None,
+        ticker: str | None = None,
+        reused_embeddings: int = 0,
+    ) -> None:
+        now = datetime.now(UTC)
+        self._save(
+            IngestionManifestEntry(
+                accession_number=accession_number,
+                status=IngestionStatus.INGESTED,
+                collection_name=collection_name,
+                chunk_count=chunk_count,
+                reused_embeddings=reused_embeddings,
+                embed_model=embed_model,
+                stored_collection=stored_collection,
+                ticker=ticker,
+                ingested_at=now,
+                updated_at=now,
+            )
+        )
+
+    def mark_failed(self, accession_number: str, error: str) -> None:
+        entry = self.get(accession_number)
+        if entry is None:
+            logger.warning("No manifest entry to fail for accession %s", accession_number)
+            return
+        entry.status = IngestionStatus.FAILED
+        entry.error = error
+        entry.updated_at = datetime.now(UTC)
+        self._save(entry)
+
+    def mark_moved(self, accession_number: str, *, stored_collection: str, ticker: str) -> None:
+        """Record that an accession's chunks were copied, unchanged, into another collection."""
+        entry = self.get(accession_number)
+        if entry is None:
+            return
+        entry.stored_collection = stored_collection
+        entry.ticker = entry.ticker or ticker
+        entry.updated_at = datetime.now(UTC)
+        self._save(entry)
+
+    def content_version(self, collection_name: str, ticker: str | None = None) -> int:
+        return int(self.cache.get(self._version_key(collection_name, ticker), 0))
+
+    def bump_content_version(self, collection_name: str, ticker: str | None = None) -> None:
+        """Invalidate cached retrievals over the collection and, if given, the ticker."""
+        self.cache.incr(self._version_key(collection_name, None))
+        if ticker:
+            self.cache.incr(self._version_key(collection_name, ticker))
+
+    @staticmethod
+    def is_outdated(
+        entry: IngestionManifestEntry,
+        *,
+        collection_name: str,
+        embed_model: str,
+        stored_collection: str,
+    ) -> bool:
+        """
+        Whether the entry's chunks were built for other settings than the current ones.
+
+        Fields an older entry did not record (embedding model of chunks found in Chroma
+        before the manifest existed, physical collection before sharding) are not compared.
+        """
+        if entry.collection_name != collection_name:
+            return True
+        if entry.embed_model is not None and entry.embed_model != embed_model:
+            return True
+        return entry.stored_collection is not None and entry.stored_collection != stored_collection
+
+    @staticmethod
+    def is_stale(entry: IngestionManifestEntry, now: datetime | None = None) -> bool:
+        if entry.status == IngestionStatus.FAILED:
+            return True
+        if entry.status != IngestionStatus.INGESTING:
+            return False
+        return (now or datetime.now(UTC)) - entry.updated_at > STALE_INGEST_AFTER
+
+    def _save(self, entry: IngestionManifestEntry) -> None:
+        with self.cache.transact():
+            previous = self.get(entry.accession_number)
+            self.cache.set(
+                self._entry_key(entry.accession_number), jsonable_encoder(entry, exclude_none=True)
+            )
+            if previous is not None:
+                self._unlist(previous)
+            self._list(entry)
+
+    def _list(self, entry: IngestionManifestEntry) -> None:
+        count = entry.chunk_count if entry.status == IngestionStatus.INGESTED else None
+        for key in self._entry_scope_keys(entry):
+            listing = self.cache.get(key) or {}
+            listing[entry.accession_number] = count
+            self.cache.set(key, listing)
+
+    def _unlist(self, entry: IngestionManifestEntry) -> None:
+        for key in self._entry_scope_keys(entry):
+            listing = self.cache.get(key) or {}
+            if entry.accession_number in listing:
+                del listing[entry.accession_number]
+                self.cache.set(key, listing)
+
+    def _build_scopes(self) -> None:
+        with self.cache.transact():
+            if self.cache.get(SCOPES_BUILT_KEY):
+                return
+            for key in list(self.cache.iterkeys()):
+                if str(key).startswith(ENTRY_KEY_PREFIX) and (payload := self.cache.get(key)):
+                    self._list(IngestionManifestEntry.model_validate(payload))
+            self.cache.set(SCOPES_BUILT_KEY, True)
+
+    def _entry_scope_keys(self, entry: IngestionManifestEntry) -> list[str]:
+        keys = [self._scope_key(entry.collection_name, None)]
+        if entry.ticker:
+            keys.append(self._scope_key(entry.collection_name, entry.ticker))
+        return keys
+
+    @staticmethod
+    def _entry_key(accession_number: str) -> str:
+        return f"{ENTRY_KEY_PREFIX}{accession_number}"
+
+    @staticmethod
+    def _version_key(collection_name: str, ticker: str | None) -> str:
+        scope = f"{collection_name}:{ticker.upper()}" if ticker else collection_name
+        return f"{VERSION_KEY_PREFIX}{scope}"
+
+    @staticmethod
+    def _scope_key(collection_name: str, ticker: str | None) -> str:
+        scope = f"{collection_name}:{ticker.upper()}" if ticker else collection_name
+        return f"{SCOPE_KEY_PREFIX}{scope}"
+
+
+ingestion_manifest = IngestionManifest(
+    os.getenv("EDGAR_INGESTION_MANIFEST_DIR", "./.edgar_ingestion_manifest")
+)
@@ -0,0 +1,261 @@
+"""Bounded-queue stage runner, adaptive batch sizing and throughput metrics for ingestion."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from clients.embedding_registry import EmbeddingDedupReport, embedding_registry
+from src.agent_tools.rag.embedding_reduction import get_embedding_reducer
+from src.utils.edgar_config import EdgarConfig
+
+UPSERT_BATCH_SIZE = 64
+
+_DONE = object()
+
+
+@dataclass
+class StageMetrics:
+    items: int = 0
+    batches: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    in_flight: int = 0
+    max_in_flight: int = 0
+    max_queue_depth: int = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        snapshot = asdict(self)
+        snapshot["items_per_second"] = self.items / self.busy_seconds if self.busy_seconds else 0.0
+        snapshot["avg_batch_seconds"] = self.busy_seconds / self.batches if self.batches else 0.0
+        return snapshot
+
+
+class IngestionMetrics:
+    """
+    Per-stage counters for the ingestion path.
+
+    `busy_seconds` is summed over concurrent workers, so `items_per_second` is the throughput
+    of one worker of that stage; the stage with the lowest rate times its concurrency is the
+    bottleneck.
+    """
+
+    def __init__(self):
+        self._stages: dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    @asynccontextmanager
+    async def track(self, stage: str, items: int = 1) -> AsyncIterator[None]:
+        with self._lock:
+            metrics = self._stages.setdefault(stage, StageMetrics())
+            metrics.in_flight += 1
+            metrics.max_in_flight = max(metrics.max_in_flight, metrics.in_flight)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                metrics.in_flight -= 1
+                metrics.batches += 1
+                metrics.busy_seconds += elapsed
+                if failed:
+                    metrics.errors += 1
+                else:
+                    metrics.items += items
+
+    def observe_queue(self, stage: str, depth: int) -> None:
+        with self._lock:
+            metrics = self._stages.setdefault(stage, StageMetrics())
+            metrics.max_queue_depth = max(metrics.max_queue_depth, depth)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {stage: metrics.snapshot() for stage, metrics in self._stages.items()}
+
+
+class AdaptiveBatchSizer:
+    """
+    Picks embedding batch sizes from observed latency.
+
+    Batches grow by half while a batch finishes well inside `target_seconds`, and halve
+    when one overshoots it, so large batches are used when the embedding API is fast and
+    smaller ones keep per-request latency bounded when it slows down.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int = 64,
+        min_size: int = 8,
+        max_size: int = 256,
+        target_seconds: float = 2.0,
+    ):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self._size = max(min_size, min(initial, max_size))
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def observe(self, batch_size: int, seconds: float) -> None:
+        with self._lock:
+            if seconds > self.target_seconds:
+                self._size = max(self.min_size, self._size // 2)
+            elif seconds < self.target_seconds / 2 and batch_size >= self._size:
+                self._size = min(self.max_size, self._size + max(1, self._size // 2))
+
+    def batches(self, items: list[Any]) -> Iterable[list[Any]]:
+        """Slice lazily so each batch uses the size learned from the ones before it."""
+        offset = 0
+        while offset < len(items):
+            size = self._size
+            yield items[offset : offset + size]
+            offset += size
+
+
+Stage = tuple[str, Callable[[Any], Awaitable[Any]], int]
+
+
+def _size(item: Any) -> int:
+    return len(item) if isinstance(item, list | tuple) else 1
+
+
+async def run_stages(
+    source: Iterable[Any],
+    stages: list[Stage],
+    *,
+    queue_depth: int,
+    metrics: IngestionMetrics | None = None,
+) -> list[Any]:
+    """
+    Stream items through async stages joined by bounded queues.
+
+    Each stage is `(name, handler, concurrency)`; `concurrency` workers pull from the
+    stage's input queue and push the handler's result downstream. Queues hold at most
+    `queue_depth` items, so a slow stage stalls the ones before it instead of letting
+    work pile up in memory. The source is consumed lazily for the same reason. Results of
+    the last stage are returned in completion order; the first failure cancels the rest.
+    """
+    metrics = metrics or ingestion_metrics
+    queues = [asyncio.Queue(maxsize=queue_depth) for _ in range(len(stages) + 1)]
+    results: list[Any] = []
+
+    async def feed() -> None:
+        for item in source:
+            await queues[0].put(item)
+        for _ in range(stages[0][2]):
+            await queues[0].put(_DONE)
+
+    async def work(index: int, handler: Callable[[Any], Awaitable[Any]]) -> None:
+        inbox, outbox = queues[index], queues[index + 1]
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            name = stages[index][0]
+            metrics.observe_queue(name, inbox.qsize() + 1)
+            async with metrics.track(name, items=_size(item)):
+                result = await handler(item)
+            if index == len(stages) - 1:
+                results.append(result)
+            else:
+                await outbox.put(result)
+
+    async def stage_group(index: int, handler: Callable[[Any], Awaitable[Any]], workers: int):
+        async with asyncio.TaskGroup() as group:
+            for _ in range(workers):
+                group.create_task(work(index, handler))
+        if index < len(stages) - 1:
+            for _ in range(stages[index + 1][2]):
+                await queues[index + 1].put(_DONE)
+
+    async with asyncio.TaskGroup() as group:
+        group.create_task(feed())
+        for index, (_, handler, workers) in enumerate(stages):
+            group.create_task(stage_group(index, handler, max(1, workers)))
+    return results
+
+
+def chroma_metadata(metadata: dict[str, Any]) -> dict[str, Any]:
+    """Chroma only stores scalar metadata values and rejects None."""
+    return {
+        key: value if isinstance(value, str | int | float | bool) else str(value)
+        for key, value in metadata.items()
+        if value is not None
+    }
+
+
+async def embed_and_upsert(
+    collection: Any,
+    nodes: list[BaseNode],
+    *,
+    embed_model: str | None = None,
+    collection_name: str | None = None,
+) -> EmbeddingDedupReport:
+    """
+    Embed and write chunks as a pipeline: batches sized by `embedding_batch_sizer` are
+    embedded concurrently while earlier batches are written to Chroma, with bounded queues
+    so neither side runs ahead of the other.
+
+    `collection_name` is the logical collection, used to pick the embedding reducer.
+    """
+    reducer = get_embedding_reducer(collection_name or collection.name)
+
+    async def embed(batch: list[BaseNode]) -> tuple[list[BaseNode], EmbeddingDedupReport]:
+        start = time.perf_counter()
+        embeddings, report = await embedding_registry.aget_text_embedding_batch_with_report(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch], embed_model
+        )
+        if report.embedded:
+            embedding_batch_sizer.observe(len(batch), time.perf_counter() - start)
+        for node, embedding in zip(batch, reducer.transform(embeddings), strict=True):
+            node.embedding = embedding
+        return batch, report
+
+    async def upsert(embedded: tuple[list[BaseNode], EmbeddingDedupReport]) -> EmbeddingDedupReport:
+        batch, report = embedded
+        for i in range(0, len(batch), UPSERT_BATCH_SIZE):
+            chunk = batch[i : i + UPSERT_BATCH_SIZE]
+            await collection.upsert(
+                ids=[node.id_ for node in chunk],
+                embeddings=[node.embedding for node in chunk],
+                documents=[node.text for node in chunk],
+                metadatas=[chroma_metadata(node.metadata) for node in chunk],
+            )
+        return report
+
+    reports = await run_stages(
+        embedding_batch_sizer.batches(nodes),
+        [
+            ("embed", embed, EdgarConfig.INGESTION_EMBED_CONCURRENCY),
+            ("upsert", upsert, EdgarConfig.INGESTION_UPSERT_CONCURRENCY),
+        ],
+        queue_depth=EdgarConfig.INGESTION_QUEUE_DEPTH,
+    )
+    return EmbeddingDedupReport(
+        texts=sum(report.texts for report in reports),
+        unique_texts=sum(report.unique_texts for report in reports),
+        embedded=sum(report.embedded for report in reports),
+    )
+
+
+ingestion_metrics = IngestionMetrics()
+embedding_batch_sizer = AdaptiveBatchSizer(
+    initial=EdgarConfig.INGESTION_EMBED_BATCH_SIZE,
+    target_seconds=EdgarConfig.INGESTION_EMBED_TARGET_SECONDS,
+)
@@ -0,0 +1,238 @@
+"""Persistent background queue that ingests EDGAR filings off the workflow critical path."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from diskcache import Cache
+from fastapi.encoders import jsonable_encoder
+
+from src.agent_tools.edgar.ingestion_manifest import IngestionManifest, ingestion_manifest
+from src.agent_tools.edgar.upsert_edgar_report_impl import upsert_edgar_report_impl
+from src.models.edgar_ingestion import (
+    IngestionJob,
+    IngestionJobsOutput,
+    IngestionJobStatus,
+    IngestionRequest,
+    IngestionStatus,
+)
+from src.utils.edgar_config import EdgarConfig
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY_PREFIX = "edgar_ingestion_job:"
+ACTIVE_STATUSES = frozenset({IngestionJobStatus.QUEUED, IngestionJobStatus.RUNNING})
+
+IngestFn = Callable[[str, dict[str, Any], str], Awaitable[Any]]
+
+
+class IngestionQueue:
+    """
+    Ingestion jobs keyed by accession number, persisted in diskcache and drained by worker
+    tasks on the running event loop.
+
+    Enqueuing an accession that already has a queued or running job returns that job, so
+    concurrent workflows for the same ticker share one ingest. Jobs still active when the
+    process stopped are re-queued by `start()`, which the MCP server calls at startup; the
+    manifest repairs any chunks a half-finished ingest left behind.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        *,
+        workers: int = 2,
+        ingest: IngestFn = upsert_edgar_report_impl,
+        manifest: IngestionManifest = ingestion_manifest,
+    ):
+        self.cache_dir = cache_dir
+        self.workers = max(1, workers)
+        self.ingest = ingest
+        self.manifest = manifest
+        self._cache: Cache | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[str] | None = None
+        self._worker_tasks: list[asyncio.Task[None]] = []
+        self._finished: dict[str, asyncio.Event] = {}
+
+    @property
+    def cache(self) -> Cache:
+        if self._cache is None:
+            self._cache = Cache(self.cache_dir)
+        return self._cache
+
+    def get(self, accession_number: str) -> IngestionJob | None:
+        payload = self.cache.get(self._job_key(accession_number))
+        if not payload:
+            return None
+        return IngestionJob.model_validate(payload)
+
+    async def enqueue(
+        self, requests: Iterable[IngestionRequest], collection_name: str
+    ) -> IngestionJobsOutput:
+        self.start()
+        output = IngestionJobsOutput()
+        for request in requests:
+            accession_number = request.metadata.get("accession_number")
+            if not accession_number:
+                raise ValueError("metadata.accession_number is required")
+            existing = self.get(accession_number)
+            if existing is not None and existing.status in ACTIVE_STATUSES:
+                output.jobs.append(existing)
+                continue
+
+            job = IngestionJob(
+                accession_number=accession_number,
+                href=request.href,
+                collection_name=collection_name,
+                metadata=request.metadata,
+                attempts=existing.attempts if existing else 0,
+                enqueued_at=datetime.now(UTC),
+            )
+            self._save(job)
+            self._submit(accession_number)
+            output.jobs.append(job)
+            logger.info("Queued ingestion for accession %s", accession_number)
+        return output
+
+    def get_jobs(self, accession_numbers: Iterable[str]) -> IngestionJobsOutput:
+        output = IngestionJobsOutput()
+        for accession_number in dict.fromkeys(accession_numbers):
+            job = self.get(accession_number)
+            if job is None:
+                output.unknown.append(accession_number)
+            else:
+                output.jobs.append(job)
+        return output
+
+    async def wait(
+        self, accession_numbers: Iterable[str], timeout: float | None
+    ) -> IngestionJobsOutput:
+        """Wait up to `timeout` seconds for the given jobs to finish, then report their state."""
+        accession_numbers = list(dict.fromkeys(accession_numbers))
+        self.start()
+        if timeout and timeout > 0:
+            events = [
+                self._finished[accession_number].wait()
+                for accession_number in accession_numbers
+                if accession_number in self._finished
+                and not self._finished[accession_number].is_set()
+            ]
+            if events:
+                try:
+                    await asyncio.wait_for(asyncio.gather(*events), timeout)
+                except TimeoutError:
+                    logger.info("Ingestion wait budget of %.1fs exhausted", timeout)
+        return self.get_jobs(accession_numbers)
+
+    def start(self) -> None:
+        """
+        Run the workers on the current event loop, recovering persisted jobs on first start.
+
+        Safe to call repeatedly: a worker that has died is replaced on the shared queue, and
+        the others keep running.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._finished = {}
+            self._worker_tasks = []
+            self._recover()
+        for index, task in enumerate(self._worker_tasks):
+            if task.done():
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error("Ingestion worker %d died", index, exc_info=task.exception())
+                self._worker_tasks[index] = self._spawn_worker(index)
+        for index in range(len(self._worker_tasks), self.workers):
+            self._worker_tasks.append(self._spawn_worker(index))
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued and running jobs are recovered by the next `start()`."""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def _spawn_worker(self, index: int) -> asyncio.Task[None]:
+        return self._loop.create_task(self._worker(), name=f"edgar-ingestion-{index}")
+
+    def _recover(self) -> None:
+        for key in list(self.cache.iterkeys()):
+            if not str(key).startswith(JOB_KEY_PREFIX):
+                continue
+            job = IngestionJob.model_validate(self.cache.get(key))
+            if job.status in ACTIVE_STATUSES:
+                job.status = IngestionJobStatus.QUEUED
+                self._save(job)
+                self._submit(job.accession_number)
+                logger.info("Recovered ingestion job for accession %s", job.accession_number)
+
+    def _submit(self, accession_number: str) -> None:
+        event = self._finished.get(accession_number)
+        if event is None or event.is_set():
+            self._finished[accession_number] = asyncio.Event()
+        self._queue.put_nowait(accession_number)
+
+    async def _worker(self) -> None:
+        while True:
+            accession_number = await self._queue.get()
+            try:
+                await self._run(accession_number)
+            except Exception:
+                logger.exception("Ingestion worker failed on accession %s", accession_number)
+            finally:
+                event = self._finished.get(accession_number)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    async def _run(self, accession_number: str) -> None:
+        job = self.get(accession_number)
+        if job is None or job.status != IngestionJobStatus.QUEUED:
+            return
+        job.status = IngestionJobStatus.RUNNING
+        job.attempts += 1
+        job.started_at = datetime.now(UTC)
+        self._save(job)
+
+        error: str | None = None
+        try:
+            await self.ingest(job.href, job.metadata, job.collection_name)
+        except Exception as exc:
+            error = str(exc)
+
+        # The ingest path records its own outcome in the manifest.
+        entry = self.manifest.get(accession_number)
+        if error is None and (entry is None or entry.status != IngestionStatus.INGESTED):
+            error = (entry.error if entry else None) or "ingestion did not complete"
+        job.status = IngestionJobStatus.FAILED if error else IngestionJobStatus.SUCCEEDED
+        job.error = error
+        job.finished_at = datetime.now(UTC)
+        self._save(job)
+        logger.info(
+            "Ingestion job for accession %s %s",
+            accession_number,
+            job.status,
+            extra={"accession_number": accession_number, "error": error},
+        )
+
+    def _save(self, job: IngestionJob) -> None:
+        self.cache.set(
+            self._job_key(job.accession_number), jsonable_encoder(job, exclude_none=True)
+        )
+
+    @staticmethod
+    def _job_key(accession_number: str) -> str:
+        return f"{JOB_KEY_PREFIX}{accession_number}"
+
+
+ingestion_queue = IngestionQueue(
+    os.getenv("EDGAR_INGESTION_QUEUE_DIR", "./.edgar_ingestion_queue"),
+    workers=EdgarConfig.INGESTION_WORKERS,
+)
@@ -4,11 +4,19 @@ from typing import Any
 
 from fastapi.logger import logger
 
+from src.agent_tools.edgar.ingestion_pipeline import embedding_batch_sizer, ingestion_metrics
+from src.agent_tools.edgar.ingestion_queue import ingestion_queue
 from src.agent_tools.edgar.search_reports_impl import search_reports_impl
-from src.agent_tools.edgar.upsert_edgar_report_impl import upsert_edgar_report_impl
+from src.agent_tools.edgar.upsert_edgar_report_impl import (
+    plan_edgar_ingestion_impl,
+    upsert_edgar_report_impl,
+)
+from src.models.edgar_ingestion import IngestionJobsOutput, IngestionPlan, IngestionRequest
 from src.models.rag_retrieve import SearchReportsInput, SearchReportsOutput
 
 collection_name = "edgar_filings"
+# Upper bound on how long a single get_ingestion_jobs call may block.
+MAX_INGESTION_WAIT_SECONDS = 120.0
 
 
 def register_tools(mcp_server: Any) -> None:
@@ -42,3 +50,58 @@ def register_tools(mcp_server: Any) -> None:
         )
 
         return await upsert_edgar_report_impl(href, metadata, collection_name)
+
+    @mcp_server.tool()
+    async def plan_edgar_ingestion(accession_numbers: list[str]) -> IngestionPlan:
+        """
+        Report which EDGAR accessions still need `upsert_edgar_report`.
+        Answered from the local ingestion manifest; does not query ChromaDB. Filings ingested
+        with another embedding model, reduction or collection are reported as partial.
+        """
+        logger.info(
+            "[tool] plan_edgar_ingestion invoked",
+            extra={"accessions": len(accession_numbers)},
+        )
+
+        return plan_edgar_ingestion_impl(accession_numbers, collection_name)
+
+    @mcp_server.tool()
+    async def enqueue_edgar_reports(filings: list[IngestionRequest]) -> IngestionJobsOutput:
+        """
+        Queue EDGAR filings for background ingestion into ChromaDB and return immediately.
+        Filings that already have a queued or running job are not queued twice.
+        """
+        logger.info(
+            "[tool] enqueue_edgar_reports invoked",
+            extra={"filings": len(filings), "collection": collection_name},
+        )
+
+        return await ingestion_queue.enqueue(filings, collection_name)
+
+    @mcp_server.tool()
+    async def get_ingestion_jobs(
+        accession_numbers: list[str], wait_seconds: float = 0
+    ) -> IngestionJobsOutput:
+        """
+        Report background ingestion jobs for the given accessions.
+        With `wait_seconds`, block up to that long for unfinished jobs before reporting.
+        """
+        logger.info(
+            "[tool] get_ingestion_jobs invoked",
+            extra={"accessions": len(accession_numbers), "wait_seconds": wait_seconds},
+        )
+
+        return await ingestion_queue.wait(
+            accession_numbers, min(wait_seconds, MAX_INGESTION_WAIT_SECONDS)
+        )
+
+    @mcp_server.tool()
+    async def get_ingestion_metrics() -> dict[str, Any]:
+        """
+        Per-stage ingestion throughput (fetch, parse, embed, upsert, index) since startup,
+        plus the current adaptive embedding batch size.
+        """
+        return {
+            "stages": ingestion_metrics.stats(),
+            "embed_batch_size": embedding_batch_sizer.size,
+        }
@@ -1,16 +1,131 @@
 from __future__ import annotations
 
+import asyncio
+from typing import Any
+
 import aiohttp
 from fastapi.logger import logger
-from llama_index.core import Document, StorageContext, VectorStoreIndex
+from llama_index.core import Document
 from llama_index.core.node_parser import HTMLNodeParser, SentenceSplitter
-from llama_index.vector_stores.chroma import ChromaVectorStore
 
-from clients.chroma_client import ChromaClient
+from clients.chroma_client import chroma_client
+from clients.embedding_registry import default_embed_model_name
 from src.agent_tools.edgar.edgar_client import EdgarClient
+from src.agent_tools.edgar.filing_segmenter import NO_STATEMENT, PREAMBLE_SECTION
+from src.agent_tools.edgar.ingestion_manifest import IngestionManifest, ingestion_manifest
+from src.agent_tools.edgar.ingestion_pipeline import embed_and_upsert, ingestion_metrics
+from src.agent_tools.rag.embedding_reduction import get_embedding_reducer
+from src.agent_tools.rag.fulltext_index import fulltext_index
+from src.models.edgar_ingestion import IngestionManifestEntry, IngestionPlan, IngestionStatus
 from src.utils.edgar_config import EdgarConfig
 
-chroma_client = ChromaClient()
+# Chunks shorter than this are page furniture (page numbers, stray table cells).
+MIN_CHUNK_CHARS = 50
+
+# Filing-specific metadata kept out of the embedded text, so boilerplate repeated across
+# a company's filings embeds identically and is served from the embedding cache.
+FILING_SPECIFIC_METADATA_KEYS = [
+    "accession_number",
+    "filing_date",
+    "report_date",
+    "source",
+    "chunk_index",
+    "collection_name",
+]
+
+
+def embedding_fingerprint(collection_name: str, embed_model: str | None = None) -> str:
+    """Embedding model plus reduction spec; chunks built under another value can't be queried."""
+    model = embed_model or default_embed_model_name()
+    spec = get_embedding_reducer(collection_name).spec
+    return model if spec == "none" else f"{model}+{spec}"
+
+
+def is_outdated(entry: IngestionManifestEntry, collection_name: str) -> bool:
+    """Whether an ingested entry was built for another model, reduction or collection."""
+    return IngestionManifest.is_outdated(
+        entry,
+        collection_name=collection_name,
+        embed_model=embedding_fingerprint(collection_name),
+        stored_collection=chroma_client.route(collection_name, entry.ticker),
+    )
+
+
+def plan_edgar_ingestion_impl(accession_numbers: list[str], collection_name: str) -> IngestionPlan:
+    """
+    Report which accessions still need ingesting, answered from the local manifest alone.
+
+    :param accession_numbers: accessions of the filings a workflow is about to use
+    :param collection_name: logical collection the filings are ingested into
+    """
+    plan = ingestion_manifest.plan(
+        accession_numbers, is_outdated=lambda entry: is_outdated(entry, collection_name)
+    )
+    logger.info(
+        "[plan_edgar_ingestion] %d pending, %d partial, %d in progress, %d ingested",
+        len(plan.pending),
+        len(plan.partial),
+        len(plan.in_progress),
+        len(plan.ingested),
+    )
+    return plan
+
+
+async def _index_fulltext(
+    collection_name: str, accession: str, chunks: list[tuple[str, str, dict[str, Any]]]
+) -> None:
+    """Mirror chunks into the keyword index; a failure here must not fail the ingest."""
+    try:
+        await asyncio.to_thread(fulltext_index.add_chunks, collection_name, accession, chunks)
+    except Exception as exc:
+        logger.warning(
+            "[upsert_edgar_report] full-text indexing failed for accession %s: %s",
+            accession,
+            exc,
+        )
+
+
+async def _delete_previous_chunks(entry: IngestionManifestEntry) -> None:
+    """Remove an accession's chunks from the collection an earlier ingest wrote them to."""
+    try:
+        previous = await chroma_client.get_collection(entry.stored_collection)
+        await previous.delete(where={"accession_number": entry.accession_number})
+    except Exception as exc:
+        logger.warning(
+            "[upsert_edgar_report] could not clear accession %s from %s: %s",
+            entry.accession_number,
+            entry.stored_collection,
+            exc,
+        )
+
+
+def _parse_filing(
+    content: str, href: str, metadata: dict[str, Any], accession: str
+) -> tuple[list[Any], int]:
+    """HTML → section-tagged chunks; CPU-bound, so callers run it off the event loop."""
+    doc = Document(text=content, extra_info=metadata | {"source": href})
+
+    parser = HTMLNodeParser(tags=["span", "td", "div"])
+    raw_nodes = parser.get_nodes_from_documents([doc])
+    outline = EdgarClient._normalize_html_nodes(raw_nodes, metadata.get("form"))
+
+    splitter = SentenceSplitter(chunk_size=512, chunk_overlap=64)
+    nodes = splitter.get_nodes_from_documents(outline.nodes)
+
+    # Drop fragments too short to carry meaning; the splitter already bounds chunk length.
+    nodes = [n for n in nodes if len(n.text) >= MIN_CHUNK_CHARS]
+
+    for i, node in enumerate(nodes):
+        node.metadata = metadata | {
+            "source": href,
+            "chunk_index": i,
+            "section": node.metadata.get("section", PREAMBLE_SECTION),
+            "section_title": node.metadata.get("section_title", ""),
+            "statement_type": node.metadata.get("statement_type", NO_STATEMENT),
+        }
+        node.id_ = f"{accession}:{i}"
+        node.excluded_embed_metadata_keys = FILING_SPECIFIC_METADATA_KEYS
+    return nodes, len(outline.sections)
 
 
 async def upsert_edgar_report_impl(href: str, metadata: dict, collection_name: str):
@@ -23,6 +138,10 @@ async def upsert_edgar_report_impl(href: str, metadata: dict, collection_name: s
     :param href: full SEC filing document URL
     :param collection_name: target Chroma collection (e.g. 'edgar_filings')
     :param metadata: normalized filing metadata (ticker, cik, form, filing_date, accession_number, ...)
+
+    The ingestion manifest is consulted first: completed accessions return without any Chroma
+    round-trip, and accessions left `ingesting`/`failed` have their chunks deleted and rebuilt.
+    Every write bumps the manifest's content version so cached retrievals are invalidated.
     """
     logger.info(
         "[upsert_edgar_report] start",
@@ -32,67 +151,142 @@ async def upsert_edgar_report_impl(href: str, metadata: dict, collection_name: s
             "metadata_keys": list(metadata.keys()),
         },
     )
+    accession = metadata.get("accession_number")
+    ticker = metadata.get("ticker")
+    embed_model = default_embed_model_name()
     try:
-        accession = metadata.get("accession_number")
         if not accession:
             raise ValueError("metadata.accession_number is required")
-        client = chroma_client.get_client()
-        collection = client.get_or_create_collection(name=collection_name)
 
-        existing = collection.get(
-            where={"accession_number": accession},
-            limit=1,
+        entry = ingestion_manifest.get(accession)
+        outdated = (
+            entry is not None
+            and entry.status == IngestionStatus.INGESTED
+            and is_outdated(entry, collection_name)
         )
-        if existing and existing.get("ids"):
+        if entry is not None and entry.status == IngestionStatus.INGESTED and not outdated:
             logger.info(
-                "[upsert_edgar_report] accession %s already ingested, skipping",
+                "[upsert_edgar_report] accession %s already ingested (%d chunks), skipping",
                 accession,
+                entry.chunk_count,
             )
             return
+        if entry is not None and not outdated and not IngestionManifest.is_stale(entry):
+            logger.info("[upsert_edgar_report] accession %s is being ingested, skipping", accession)
+            return
+
+        stored_collection = chroma_client.route(collection_name, ticker)
+        collection = await chroma_client.get_collection(stored_collection, create=True)
+
+        if entry is None:
+            # Filings ingested before the manifest existed are recorded on first sight.
+            existing = await collection.get(
+                where={"accession_number": accession}, include=["documents", "metadatas"]
+            )
+            if existing and existing.get("ids"):
+                await _index_fulltext(
+                    collection_name,
+                    accession,
+                    list(
+                        zip(
+                            existing["ids"],
+                            existing.get("documents") or [""] * len(existing["ids"]),
+                            existing.get("metadatas") or [{}] * len(existing["ids"]),
+                            strict=True,
+                        )
+                    ),
+                )
+                ingestion_manifest.mark_ingested(
+                    accession,
+                    chunk_count=len(existing["ids"]),
+                    collection_name=collection_name,
+                    stored_collection=stored_collection,
+                    ticker=ticker,
+                )
+                # The keyword index now covers these chunks, which changes hybrid results.
+                ingestion_manifest.bump_content_version(collection_name, ticker)
+                logger.info(
+                    "[upsert_edgar_report] accession %s already ingested, recorded in manifest",
+                    accession,
+                )
+                return
+        else:
+            logger.info(
+                "[upsert_edgar_report] repairing %s ingest of accession %s",
+                "outdated" if outdated else entry.status,
+                accession,
+            )
+            await collection.delete(where={"accession_number": accession})
+            if entry.stored_collection and entry.stored_collection != stored_collection:
+                await _delete_previous_chunks(entry)
+            ingestion_manifest.bump_content_version(collection_name, ticker)
+            if entry.collection_name != collection_name:
+                ingestion_manifest.bump_content_version(entry.collection_name, ticker)
+
+        ingestion_manifest.mark_ingesting(
+            accession,
+            collection_name=collection_name,
+            embed_model=embedding_fingerprint(collection_name, embed_model),
+            stored_collection=stored_collection,
+            ticker=ticker,
+        )
 
-        async with aiohttp.ClientSession(headers=EdgarConfig.HEADERS) as session:
+        async with (
+            ingestion_metrics.track("fetch"),
+            aiohttp.ClientSession(headers=EdgarConfig.HEADERS) as session,
+        ):
             content = await EdgarClient.get_filing_content(href, session)
 
         if not content:
             logger.warning("[upsert_edgar_report] empty content for %s", href)
+            ingestion_manifest.mark_failed(accession, "empty filing content")
             return
 
-        doc = Document(text=content, extra_info=metadata | {"source": href})
-
-        parser = HTMLNodeParser(tags=["span", "td", "div"])
-        raw_nodes = parser.get_nodes_from_documents([doc])
-        cleaned_nodes = EdgarClient._normalize_html_nodes(raw_nodes)
-
-        splitter = SentenceSplitter(chunk_size=512, chunk_overlap=64)
-        nodes = splitter.get_nodes_from_documents(cleaned_nodes)
-
-        # Defensive length filter
-        MAX_LEN, MIN_LEN = 1200, 50
-        nodes = [n for n in nodes if MIN_LEN <= len(n.text) <= MAX_LEN]
+        async with ingestion_metrics.track("parse"):
+            nodes, section_count = await asyncio.to_thread(
+                _parse_filing, content, href, metadata, accession
+            )
 
         if not nodes:
             logger.warning("[upsert_edgar_report] no valid nodes for %s", href)
+            ingestion_manifest.mark_failed(accession, "no valid nodes")
             return
 
-        for i, node in enumerate(nodes):
-            node.metadata = metadata | {
-                "source": href,
-                "chunk_index": i,
-            }
-            node.id_ = f"{accession}:{i}"
-
-        vector_store = ChromaVectorStore(chroma_collection=collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        index = VectorStoreIndex(nodes=[], storage_context=storage_context)
+        # Chunks repeated within the filing or seen in an earlier filing reuse their cached
+        # embedding and only get this filing's metadata.
+        dedup = await embed_and_upsert(
+            collection, nodes, embed_model=embed_model, collection_name=collection_name
+        )
+        logger.info(
+            "[upsert_edgar_report] accession %s: embedded %d of %d chunks (%.0f%% deduplicated)",
+            accession,
+            dedup.embedded,
+            dedup.texts,
+            dedup.dedup_ratio * 100,
+        )
+        async with ingestion_metrics.track("index", items=len(nodes)):
+            await _index_fulltext(
+                collection_name,
+                accession,
+                [(node.id_, node.text, node.metadata) for node in nodes],
+            )
 
-        BATCH_SIZE = 64
-        for i in range(0, len(nodes), BATCH_SIZE):
-            index.insert_nodes(nodes[i : i + BATCH_SIZE])
+        ingestion_manifest.mark_ingested(
+            accession,
+            chunk_count=len(nodes),
+            collection_name=collection_name,
+            embed_model=embedding_fingerprint(collection_name, embed_model),
+            stored_collection=stored_collection,
+            ticker=ticker,
+            reused_embeddings=dedup.reused,
+        )
+        ingestion_manifest.bump_content_version(collection_name, ticker)
 
         logger.info(
-            "[upsert_edgar_report] ingested %d nodes for accession %s",
+            "[upsert_edgar_report] ingested %d nodes for accession %s across %d sections",
             len(nodes),
             accession,
+            section_count,
         )
 
         logger.info(
@@ -110,3 +304,5 @@ async def upsert_edgar_report_impl(href: str, metadata: dict, collection_name: s
             href,
             exc_info=exc,
         )
+        if accession:
+            ingestion_manifest.mark_failed(accession, str(exc))
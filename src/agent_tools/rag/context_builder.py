@@ -1,8 +1,18 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
+from dataclasses import dataclass, field
 from typing import Any
 
+from src.utils.tokenizer import Tokenizer, get_tokenizer
+
+# Splitter overlap is 64 tokens; anything longer than this is not overlap.
+MAX_OVERLAP_CHARS = 600
+MIN_OVERLAP_CHARS = 16
+# A truncated block shorter than this is more noise than evidence.
+MIN_PARTIAL_BLOCK_TOKENS = 48
+SEPARATOR_TOKENS = 2
+
 
 def normalize_company_name(value: str | None) -> str | None:
     if value is None:
@@ -45,17 +55,193 @@ def flatten_chroma_query_results(results: dict[str, Any]) -> list[dict[str, Any]
     return matches
 
 
-def build_rag_context(matches: list[dict[str, Any]], *, max_chars: int = 8000) -> str:
+def split_chroma_query_results(results: dict[str, Any]) -> list[list[dict[str, Any]]]:
+    """One ranked match list per query embedding of a batched Chroma `query`."""
+    results = results or {}
+    per_query: list[list[dict[str, Any]]] = []
+    for index in range(len(results.get("ids") or [])):
+        row: dict[str, Any] = {}
+        for name in ("ids", "documents", "metadatas", "distances"):
+            values = results.get(name) or []
+            row[name] = [values[index]] if index < len(values) else []
+        per_query.append(flatten_chroma_query_results(row))
+    return per_query
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[dict[str, Any]]], *, top_k: int, k: int = 60
+) -> list[dict[str, Any]]:
+    """
+    Fuse ranked match lists by reciprocal rank: score(id) = sum of 1 / (k + rank).
+
+    The first list's copy of a match wins so vector distances are kept when available; the
+    fused score is stored under `score` and ranks are renumbered from 1.
+    """
+    fused: dict[Any, dict[str, Any]] = {}
+    scores: dict[Any, float] = {}
+    for matches in ranked_lists:
+        for position, match in enumerate(matches, start=1):
+            match_id = match.get("id")
+            if match_id is None:
+                continue
+            fused.setdefault(match_id, match)
+            scores[match_id] = scores.get(match_id, 0.0) + 1.0 / (k + position)
+
+    ordered = sorted(fused, key=lambda match_id: scores[match_id], reverse=True)[:top_k]
+    return [
+        fused[match_id] | {"rank": rank, "score": round(scores[match_id], 6)}
+        for rank, match_id in enumerate(ordered, start=1)
+    ]
+
+
+def _chunk_index(match: dict[str, Any]) -> int | None:
+    chunk_index = (match.get("metadata") or {}).get("chunk_index")
+    return chunk_index if isinstance(chunk_index, int) else None
+
+
+def _document_key(match: dict[str, Any]) -> str | None:
+    metadata = match.get("metadata") or {}
+    key = metadata.get("accession_number") or metadata.get("source") or metadata.get("file_name")
+    return str(key) if key else None
+
+
+def _strip_overlap(previous: str, current: str) -> str:
+    """Drop the prefix of `current` that repeats the tail of `previous` (splitter overlap)."""
+    longest = min(len(previous), len(current), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:].lstrip()
+    return current
+
+
+@dataclass
+class ContextBlock:
+    """One or more adjacent chunks of a document, cited together."""
+
+    rank: int
+    metadata: dict[str, Any]
+    text: str
+    ids: list[Any] = field(default_factory=list)
+    first_chunk: int | None = None
+    last_chunk: int | None = None
+
+    def citation(self) -> str:
+        metadata = self.metadata
+        parts = [
+            str(metadata[key])
+            for key in ("ticker", "form", "filing_date")
+            if metadata.get(key) not in (None, "")
+        ]
+        if not parts:
+            source = metadata.get("source_file") or metadata.get("file_name")
+            parts = [str(source)] if source else [str(self.ids[0])]
+        section = metadata.get("section_title") or metadata.get("section")
+        if section:
+            parts.append(str(section))
+        if metadata.get("page_label"):
+            parts.append(f"p.{metadata['page_label']}")
+        if self.first_chunk is not None:
+            chunks = (
+                f"#{self.first_chunk}"
+                if self.first_chunk == self.last_chunk
+                else f"#{self.first_chunk}-{self.last_chunk}"
+            )
+            parts.append(chunks)
+        return f"[{self.rank}] " + " | ".join(parts)
+
+
+def merge_adjacent_matches(matches: list[dict[str, Any]]) -> list[ContextBlock]:
+    """
+    Collapse retrieved chunks into citation blocks.
+
+    Chunks of the same document with consecutive `chunk_index` values are stitched together
+    with the splitter overlap removed, exact duplicate texts are dropped, and blocks are
+    ordered by the best rank among their chunks and renumbered from 1.
+    """
+    blocks: list[ContextBlock] = []
+    runs: dict[str, list[dict[str, Any]]] = {}
+    for position, raw_match in enumerate(matches, start=1):
+        if not raw_match.get("document"):
+            continue
+        match = raw_match | {"rank": raw_match.get("rank") or position}
+        key = _document_key(match)
+        if key is None or _chunk_index(match) is None:
+            blocks.append(
+                ContextBlock(
+                    rank=match["rank"],
+                    metadata=match.get("metadata") or {},
+                    text=match["document"],
+                    ids=[match.get("id")],
+                )
+            )
+        else:
+            runs.setdefault(key, []).append(match)
+
+    for doc_matches in runs.values():
+        doc_matches.sort(key=_chunk_index)
+        block: ContextBlock | None = None
+        for match in doc_matches:
+            chunk_index = _chunk_index(match)
+            if block is not None and chunk_index == block.last_chunk:
+                block.rank = min(block.rank, match["rank"])
+                continue
+            if block is not None and chunk_index == block.last_chunk + 1:
+                block.text = f"{block.text} {_strip_overlap(block.text, match['document'])}"
+                block.rank = min(block.rank, match["rank"])
+                block.ids.append(match.get("id"))
+                block.last_chunk = chunk_index
+                continue
+            block = ContextBlock(
+                rank=match["rank"],
+                metadata=match.get("metadata") or {},
+                text=match["document"],
+                ids=[match.get("id")],
+                first_chunk=chunk_index,
+                last_chunk=chunk_index,
+            )
+            blocks.append(block)
+
+    blocks.sort(key=lambda block: block.rank)
+    seen: set[str] = set()
+    unique: list[ContextBlock] = []
+    for block in blocks:
+        fingerprint = " ".join(block.text.split())
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        block.rank = len(unique) + 1
+        unique.append(block)
+    return unique
+
+
+def build_rag_context(
+    matches: list[dict[str, Any]],
+    *,
+    max_chars: int = 8000,
+    max_tokens: int | None = None,
+    tokenizer: Tokenizer | None = None,
+) -> str:
+    """
+    Pack matches into a prompt-ready context of compact citations and merged chunk text.
+
+    Blocks are added best-first until `max_tokens` (counted with `tokenizer`, by default the
+    agents' model) is spent; the block that crosses the budget is truncated if a useful
+    amount still fits. `max_chars` stays as a hard cap on the result.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    remaining = max_tokens
     parts: list[str] = []
-    total_chars = 0
-    for match in matches:
-        chunk = (
-            f"[{match.get('rank')}] id={match.get('id')} distance={match.get('distance')} "
-            f"meta={match.get('metadata')}\n{match.get('document') or ''}"
-        )
-        parts.append(chunk)
-        total_chars += len(chunk)
-        if total_chars >= max_chars:
-            break
-    context = "\n\n---\n\n".join(parts)
+    for block in merge_adjacent_matches(matches):
+        header = block.citation()
+        text = block.text.strip()
+        if remaining is not None:
+            cost = tokenizer.count(f"{header}\n{text}") + SEPARATOR_TOKENS
+            if cost > remaining:
+                budget = remaining - tokenizer.count(header) - SEPARATOR_TOKENS
+                if budget >= MIN_PARTIAL_BLOCK_TOKENS:
+                    parts.append(f"{header}\n{tokenizer.truncate(text, budget)}...")
+                break
+            remaining -= cost
+        parts.append(f"{header}\n{text}")
+    context = "\n\n".join(parts)
     return context[:max_chars]
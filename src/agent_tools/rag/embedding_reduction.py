@@ -0,0 +1,238 @@
+"""Optional dimensionality reduction applied to stored chunk vectors and their queries."""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REDUCTION_KINDS = ("none", "matryoshka", "pca")
+
+
+def parse_reduction_spec(spec: str | None) -> tuple[str, int | None]:
+    """`none`, `matryoshka:<dims>` or `pca:<dims>` → (kind, dims)."""
+    kind, _, dims = (spec or "none").strip().lower().partition(":")
+    if kind not in REDUCTION_KINDS:
+        raise ValueError(f"Unsupported embedding reduction '{spec}'; expected {REDUCTION_KINDS}")
+    if kind == "none":
+        return kind, None
+    if not dims.isdigit() or int(dims) <= 0:
+        raise ValueError(
+            f"Embedding reduction '{spec}' needs a positive dimension, e.g. {kind}:256"
+        )
+    return kind, int(dims)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class EmbeddingReducer:
+    """Identity transform; subclasses map full-size embeddings to fewer dimensions."""
+
+    spec = "none"
+
+    def transform(self, embeddings: list[list[float]]) -> list[list[float]]:
+        return embeddings
+
+    def transform_one(self, embedding: list[float]) -> list[float]:
+        (reduced,) = self.transform([embedding])
+        return reduced
+
+
+class MatryoshkaReducer(EmbeddingReducer):
+    """Keep the leading dimensions and re-normalise (for Matryoshka-trained models)."""
+
+    def __init__(self, dims: int):
+        self.dims = dims
+        self.spec = f"matryoshka:{dims}"
+
+    def transform(self, embeddings: list[list[float]]) -> list[list[float]]:
+        if not len(embeddings):
+            return []
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.shape[1] < self.dims:
+            raise ValueError(f"Cannot truncate {vectors.shape[1]}-d embeddings to {self.dims}")
+        return _normalize_rows(vectors[:, : self.dims]).tolist()
+
+
+class PcaReducer(EmbeddingReducer):
+    """Project onto the top principal components fitted on a sample of the collection."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.dims = components.shape[0]
+        self.spec = f"pca:{self.dims}"
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, dims: int) -> PcaReducer:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if dims > min(vectors.shape):
+            raise ValueError(f"PCA to {dims} dims needs at least {dims} sample vectors")
+        mean = vectors.mean(axis=0)
+        _, _, components = np.linalg.svd(vectors - mean, full_matrices=False)
+        return cls(mean, components[:dims])
+
+    @classmethod
+    def load(cls, path: Path) -> PcaReducer:
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"])
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, mean=self.mean, components=self.components)
+
+    def transform(self, embeddings: list[list[float]]) -> list[list[float]]:
+        if not len(embeddings):
+            return []
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        return ((vectors - self.mean) @ self.components.T).tolist()
+
+
+def reduction_dir() -> Path:
+    return Path(os.getenv("RAG_EMBED_REDUCTION_DIR", "./.rag_embedding_reduction"))
+
+
+def pca_path(collection_name: str, dims: int) -> Path:
+    return reduction_dir() / f"{collection_name}.pca{dims}.npz"
+
+
+def reduced_collections() -> set[str]:
+    names = os.getenv("RAG_EMBED_REDUCTION_COLLECTIONS", "edgar_filings")
+    return {name.strip() for name in names.split(",") if name.strip()}
+
+
+def storage_collection_name(collection_name: str) -> str:
+    """
+    Chroma collection holding a logical collection's vectors under the current reduction.
+
+    Chroma fixes a collection's dimension on the first insert, so reduced vectors go to a
+    collection of their own (`edgar_filings-pca256`) and filings are rebuilt into it, rather
+    than failing to upsert into the full-size one.
+    """
+    kind, dims = parse_reduction_spec(os.getenv("RAG_EMBED_REDUCTION"))
+    if kind == "none" or collection_name not in reduced_collections():
+        return collection_name
+    return f"{collection_name}-{kind}{dims}"
+
+
+@lru_cache(maxsize=32)
+def get_embedding_reducer(collection_name: str) -> EmbeddingReducer:
+    """
+    Reducer for a logical collection, from `RAG_EMBED_REDUCTION`.
+
+    Only collections listed in `RAG_EMBED_REDUCTION_COLLECTIONS` are reduced, so ingestion
+    and retrieval of one collection always agree. PCA projections are read from
+    `RAG_EMBED_REDUCTION_DIR`; fit one with `src/scripts/embedding_reduction_report.py`.
+    """
+    kind, dims = parse_reduction_spec(os.getenv("RAG_EMBED_REDUCTION"))
+    if kind == "none" or collection_name not in reduced_collections():
+        return EmbeddingReducer()
+    if kind == "matryoshka":
+        return MatryoshkaReducer(dims)
+    path = pca_path(collection_name, dims)
+    if not path.exists():
+        raise ValueError(
+            f"No PCA projection at {path}; fit it with "
+            "`python ./src/scripts/embedding_reduction_report.py --fit-pca`"
+        )
+    logger.info("Loaded PCA projection %s for %s", path, collection_name)
+    return PcaReducer.load(path)
+
+
+@dataclass
+class ReductionResult:
+    spec: str
+    dims: int
+    recall_at_k: float
+    bytes_per_vector: int
+    size_ratio: float
+    search_ms_per_query: float
+
+    def as_row(self) -> dict[str, Any]:
+        return {
+            "spec": self.spec,
+            "dims": self.dims,
+            "recall_at_k": round(self.recall_at_k, 4),
+            "bytes_per_vector": self.bytes_per_vector,
+            "size_ratio": round(self.size_ratio, 4),
+            "search_ms_per_query": round(self.search_ms_per_query, 4),
+        }
+
+
+def _top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> tuple[np.ndarray, float]:
+    """Exact top-k by squared L2 (Chroma's default space) and the mean time per query."""
+    start = time.perf_counter()
+    distances = (
+        (corpus**2).sum(axis=1)[None, :]
+        - 2.0 * queries @ corpus.T
+        + (queries**2).sum(axis=1)[:, None]
+    )
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    elapsed_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+    return top, elapsed_ms
+
+
+def recall_report(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    reducers: list[EmbeddingReducer],
+    *,
+    k: int = 10,
+) -> list[ReductionResult]:
+    """
+    Compare exact top-k neighbours of `queries` in reduced spaces against the full space.
+
+    recall@k is the average share of each query's full-dimension top-k that the reduced
+    search also returns; the first row is the full-dimension baseline.
+    """
+    corpus = np.asarray(corpus, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, len(corpus))
+    full_dims = corpus.shape[1]
+    baseline, baseline_ms = _top_k(corpus, queries, k)
+    results = [
+        ReductionResult(
+            spec="none",
+            dims=full_dims,
+            recall_at_k=1.0,
+            bytes_per_vector=full_dims * 4,
+            size_ratio=1.0,
+            search_ms_per_query=baseline_ms,
+        )
+    ]
+    expected = [set(row) for row in baseline.tolist()]
+    for reducer in reducers:
+        reduced_corpus = np.asarray(reducer.transform(corpus), dtype=np.float32)
+        reduced_queries = np.asarray(reducer.transform(queries), dtype=np.float32)
+        found, elapsed_ms = _top_k(reduced_corpus, reduced_queries, k)
+        recall = float(
+            np.mean(
+                [
+                    len(want & set(got)) / k
+                    for want, got in zip(expected, found.tolist(), strict=True)
+                ]
+            )
+        )
+        dims = reduced_corpus.shape[1]
+        results.append(
+            ReductionResult(
+                spec=reducer.spec,
+                dims=dims,
+                recall_at_k=recall,
+                bytes_per_vector=dims * 4,
+                size_ratio=dims / full_dims,
+                search_ms_per_query=elapsed_ms,
+            )
+        )
+    return results
@@ -2,18 +2,25 @@ from __future__ import annotations
 
 import asyncio
 import os
-from typing import Literal
+from typing import Any, Literal
 
-from chromadb import Collection
+from chromadb.api.models.AsyncCollection import AsyncCollection
+from diskcache import Cache
 from dotenv import load_dotenv
 from fastapi.logger import logger
-from llama_index.core.embeddings.utils import resolve_embed_model
 
-from clients.chroma_client import ChromaClient
+from clients.chroma_client import chroma_client
+from clients.embedding_registry import default_embed_model_name, embedding_registry
+from src.agent_tools.edgar.ingestion_manifest import ingestion_manifest
 from src.agent_tools.rag.context_builder import flatten_chroma_query_results
-from src.models.rag_retrieve import FinancialStatementOutput
-
-chroma_client = ChromaClient()
+from src.agent_tools.rag.embedding_reduction import get_embedding_reducer
+from src.models.edgar_ingestion import IngestionManifestEntry, IngestionStatus
+from src.models.rag_retrieve import (
+    FinancialStatementOutput,
+    FinancialStatementsOutput,
+    StatementType,
+)
+from src.utils.cache import CacheConfig, cache_key
 
 STATEMENT_KEYWORDS: dict[str, list[str]] = {
     "income_statement": [
@@ -34,6 +41,12 @@ STATEMENT_KEYWORDS: dict[str, list[str]] = {
     ],
 }
 
+STATEMENT_TYPES: tuple[StatementType, ...] = (
+    "income_statement",
+    "balance_sheet",
+    "cash_flow_statement",
+)
+
 load_dotenv()
 
 
@@ -45,16 +58,220 @@ def _sort_key(match: dict[str, object | None]) -> object:
     return match.get("rank", 0)
 
 
+def _statement_cache_key(entry: IngestionManifestEntry, statement_type: str) -> str:
+    """Key a statement by the ingest that wrote its chunks, so a rebuilt filing misses."""
+    return cache_key(
+        "ChromaDB",
+        "extract_financial_statement",
+        {
+            "accession_number": entry.accession_number,
+            "statement_type": statement_type,
+            "ingested_at": entry.ingested_at.isoformat() if entry.ingested_at else None,
+            "embed_model": entry.embed_model,
+            "stored_collection": entry.stored_collection,
+        },
+    )
+
+
+def _split_query_rows(raw_results: dict[str, Any], rows: int) -> list[dict[str, Any]]:
+    """Split a multi-embedding Chroma query result into one result dict per query."""
+    split: list[dict[str, Any]] = []
+    for row in range(rows):
+        row_result: dict[str, Any] = {}
+        for key in ("ids", "documents", "metadatas", "distances"):
+            values = (raw_results or {}).get(key) or []
+            row_result[key] = [values[row]] if row < len(values) else []
+        split.append(row_result)
+    return split
+
+
+async def _get_tagged_statement_chunks(
+    collections: list[AsyncCollection], accession_number: str, statement_types: list[str]
+) -> dict[str, list[dict[str, Any]]]:
+    """Read the chunks tagged with the requested statement types in one metadata lookup."""
+    type_filter: dict[str, Any] = (
+        {"statement_type": statement_types[0]}
+        if len(statement_types) == 1
+        else {"statement_type": {"$in": statement_types}}
+    )
+    raw_results = await asyncio.gather(
+        *(
+            collection.get(
+                where={"$and": [{"accession_number": accession_number}, type_filter]},
+                include=["documents", "metadatas"],
+            )
+            for collection in collections
+        )
+    )
+
+    grouped: dict[str, list[dict[str, Any]]] = {}
+    for raw in raw_results:
+        for match in flatten_chroma_query_results(raw):
+            statement_type = (match.get("metadata") or {}).get("statement_type")
+            grouped.setdefault(statement_type, []).append(match)
+    return {key: sorted(matches, key=_sort_key) for key, matches in grouped.items()}
+
+
+async def _query_statement_chunks(
+    collections: list[AsyncCollection], accession_number: str, statement_types: list[str]
+) -> dict[str, list[dict[str, Any]]]:
+    """Vector fallback for untagged filings: one Chroma query with a row per statement type."""
+    query_texts = [
+        f"{' or '.join(STATEMENT_KEYWORDS[statement_type])} for accession {accession_number}"
+        for statement_type in statement_types
+    ]
+    query_kwargs: dict[str, list[list[float]] | list[str]] = {}
+    reducer = get_embedding_reducer("edgar_filings")
+    embed_model_name = os.getenv("RAG_EMBED_MODEL")
+    if not embed_model_name and reducer.spec != "none":
+        # Chroma's own query_texts embedding would not match reduced stored vectors.
+        embed_model_name = default_embed_model_name()
+    if embed_model_name:
+        query_kwargs["query_embeddings"] = reducer.transform(
+            list(
+                await asyncio.gather(
+                    *(
+                        embedding_registry.aget_query_embedding(query_text, embed_model_name)
+                        for query_text in query_texts
+                    )
+                )
+            )
+        )
+        logger.info("[extract_financial_statement] using embed model %s", embed_model_name)
+    else:
+        query_kwargs["query_texts"] = query_texts
+        logger.info("[extract_financial_statement] falling back to query_texts for %r", query_texts)
+
+    raw_results = await asyncio.gather(
+        *(
+            collection.query(
+                where={"accession_number": accession_number},
+                include=["documents", "metadatas", "distances"],
+                n_results=100,
+                **query_kwargs,
+            )
+            for collection in collections
+        )
+    )
+
+    matches_by_type: dict[str, list[dict[str, Any]]] = {}
+    # Only the shard holding the filing returns rows; the others come back empty.
+    per_collection = [_split_query_rows(raw, len(statement_types)) for raw in raw_results]
+    for statement_type, rows in zip(
+        statement_types, zip(*per_collection, strict=True), strict=True
+    ):
+        matches = sorted(
+            (match for row in rows for match in flatten_chroma_query_results(row)),
+            key=_sort_key,
+        )
+        logger.info(
+            "[extract_financial_statement] selected %d chunks for %s",
+            len(matches),
+            statement_type,
+            extra={
+                "accession_number": accession_number,
+                "statement_type": statement_type,
+                "selected": len(matches),
+            },
+        )
+        matches_by_type[statement_type] = matches
+    return matches_by_type
+
+
+async def _statement_collections(
+    entry: IngestionManifestEntry | None, ticker: str | None
+) -> list[AsyncCollection]:
+    """
+    Collections that can hold the filing's chunks.
+
+    Sharded deployments route by the ticker the ingestion manifest recorded, else the
+    caller's; with neither, every shard is searched.
+    """
+    ticker = (entry.ticker if entry else None) or ticker
+    return await chroma_client.get_query_collections_or_raise(
+        "edgar_filings", cache=None, ticker=ticker
+    )
+
+
+async def _extract_statements(
+    accession_number: str,
+    statement_types: list[str],
+    cache: Cache | None,
+    ticker: str | None = None,
+) -> list[FinancialStatementOutput]:
+    entry = ingestion_manifest.get(accession_number)
+    # Chunks are upserted in batches while an ingest runs, and a repair rewrites them; only a
+    # finished ingest gives a statement that can be cached.
+    if entry is None or entry.status != IngestionStatus.INGESTED:
+        cache = None
+    outputs: dict[str, FinancialStatementOutput] = {}
+    pending: list[str] = []
+    for statement_type in statement_types:
+        cached = cache.get(_statement_cache_key(entry, statement_type)) if cache else None
+        if isinstance(cached, dict):
+            logger.info(
+                "[extract_financial_statement] using cached %s for accession %s",
+                statement_type,
+                accession_number,
+            )
+            outputs[statement_type] = FinancialStatementOutput.model_validate(cached)
+        else:
+            pending.append(statement_type)
+
+    if pending:
+        collections = await _statement_collections(entry, ticker)
+        tagged = await _get_tagged_statement_chunks(collections, accession_number, pending)
+        for statement_type in pending:
+            matches = tagged.get(statement_type)
+            if not matches:
+                continue
+            output = _build_statement_output(accession_number, statement_type, matches, "metadata")
+            outputs[statement_type] = output
+            if cache is not None:
+                cache.set(
+                    _statement_cache_key(entry, statement_type),
+                    output.model_dump(),
+                    expire=CacheConfig.FINANCIAL_STATEMENT_CACHE_TTL_SECONDS,
+                )
+
+        untagged = [statement_type for statement_type in pending if statement_type not in outputs]
+        if untagged:
+            logger.info(
+                "[extract_financial_statement] no tagged chunks for %s in accession %s, "
+                "using vector query",
+                untagged,
+                accession_number,
+            )
+            queried = await _query_statement_chunks(collections, accession_number, untagged)
+            for statement_type in untagged:
+                outputs[statement_type] = _build_statement_output(
+                    accession_number, statement_type, queried[statement_type], "vector"
+                )
+
+    return [outputs[statement_type] for statement_type in statement_types]
+
+
 async def extract_financial_statement_impl(
     accession_number: str,
-    statement_type: Literal["income_statement", "balance_sheet", "cash_flow_statement"],
+    statement_type: StatementType,
+    *,
+    ticker: str | None = None,
+    cache: Cache | None = None,
 ) -> FinancialStatementOutput:
     """
     Extract fundamental financial statements from "edgar_filings" vector database.
 
+    Chunks tagged with `statement_type` at ingestion are read directly by metadata, with no
+    embedding call or ANN search. Once the filing's ingest has finished, the result is
+    cached until the filing is re-ingested. Filings ingested before statement tagging fall
+    back to a vector query.
+
     Args:
         accession_number: The accession number of the filing.
         statement_type: The type of financial statement to extract.
+        ticker: The filer's ticker, used to find the shard when the filing is not in the
+            ingestion manifest.
+        cache: Optional cache for metadata lookups.
 
     Returns:
         FinancialStatementOutput containing the extracted statement and metadata, including:
@@ -63,6 +280,7 @@ async def extract_financial_statement_impl(
         - `statement_text`: The concatenated text of the financial statement.
         - `chunks_returned`: The number of document chunks that form the statement.
         - `matches_examined`: The total number of matches examined from the query.
+        - `lookup_mode`: `metadata` for the tagged fast path, `vector` for the fallback.
     """
     logger.info(
         "[extract_financial_statement] start for accession %s statement %s",
@@ -70,54 +288,52 @@ async def extract_financial_statement_impl(
         statement_type,
         extra={"accession_number": accession_number, "statement_type": statement_type},
     )
+    (output,) = await _extract_statements(accession_number, [statement_type], cache, ticker)
+    return output
 
-    collection: Collection = await chroma_client.get_collection_or_raise(
-        collection_name="edgar_filings", cache=None
-    )
 
-    query_text = (
-        f"{' or '.join(STATEMENT_KEYWORDS[statement_type])} for accession {accession_number}"
-    )
-    query_kwargs: dict[str, list[list[float]] | list[str]] = {}
-    embed_model_name = os.getenv("RAG_EMBED_MODEL")
-    if embed_model_name:
-        embed_model = resolve_embed_model(embed_model_name)
-        query_embedding = await asyncio.to_thread(
-            embed_model.get_query_embedding,
-            query_text,
-        )
-        query_kwargs["query_embeddings"] = [query_embedding]
-        logger.info("[extract_financial_statement] using embed model %s", embed_model_name)
-    else:
-        query_kwargs["query_texts"] = [query_text]
-        logger.info("[extract_financial_statement] falling back to query_texts for %r", query_text)
-
-    raw_results = await asyncio.to_thread(
-        collection.query,
-        where={"accession_number": accession_number},
-        include=["documents", "metadatas", "distances"],
-        n_results=100,
-        **query_kwargs,
-    )
+async def extract_financial_statements_impl(
+    accession_number: str,
+    statement_types: list[StatementType] | None = None,
+    *,
+    ticker: str | None = None,
+    cache: Cache | None = None,
+) -> FinancialStatementsOutput:
+    """
+    Extract several financial statements of one filing from a single read of its chunks.
 
-    matches = sorted(flatten_chroma_query_results(raw_results), key=_sort_key)
+    Args:
+        accession_number: The accession number of the filing.
+        statement_types: Statement types to extract; defaults to all three.
+        ticker: The filer's ticker, used to find the shard when the filing is not in the
+            ingestion manifest.
+        cache: Optional cache for metadata lookups.
+
+    Returns:
+        FinancialStatementsOutput with one FinancialStatementOutput per requested type, in
+        request order, and the number of chunks behind each statement.
+    """
+    requested = list(dict.fromkeys(statement_types or STATEMENT_TYPES))
     logger.info(
-        "[extract_financial_statement] retrieved %d matches for accession %s",
-        len(matches),
+        "[extract_financial_statements] start for accession %s statements %s",
         accession_number,
-        extra={"accession_number": accession_number, "matches": len(matches)},
+        requested,
+        extra={"accession_number": accession_number, "statement_types": requested},
     )
-
-    logger.info(
-        "[extract_financial_statement] selected %d chunks for %s",
-        len(matches),
-        statement_type,
-        extra={
-            "accession_number": accession_number,
-            "statement_type": statement_type,
-            "selected": len(matches),
-        },
+    statements = await _extract_statements(accession_number, requested, cache, ticker)
+    return FinancialStatementsOutput(
+        accession_number=accession_number,
+        statements=statements,
+        chunk_counts={output.statement_type: output.chunks_returned for output in statements},
     )
+
+
+def _build_statement_output(
+    accession_number: str,
+    statement_type: str,
+    matches: list[dict[str, Any]],
+    lookup_mode: Literal["metadata", "vector"],
+) -> FinancialStatementOutput:
     document_parts = [match["document"] for match in matches if match.get("document")]
     statement_text = "\n".join(document_parts)
 
@@ -139,4 +355,5 @@ async def extract_financial_statement_impl(
         statement_text=statement_text.strip(),
         chunks_returned=len(matches),
         matches_examined=len(matches),
+        lookup_mode=lookup_mode,
     )
@@ -0,0 +1,303 @@
+"""Local SQLite FTS5 index over filing chunks, kept alongside the Chroma collection."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Words too common in filings to carry any ranking signal.
+STOPWORDS = frozenset(
+    [
+        "a",
+        "an",
+        "and",
+        "are",
+        "as",
+        "at",
+        "be",
+        "by",
+        "for",
+        "from",
+        "how",
+        "in",
+        "is",
+        "it",
+        "of",
+        "on",
+        "or",
+        "that",
+        "the",
+        "to",
+        "was",
+        "what",
+        "with",
+    ]
+)
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Phrases the FTS tokenizer matches the way a substring search would, give or take case and
+# stemming; anything with punctuation is left to Chroma's `$contains`.
+PLAIN_PHRASE_RE = re.compile(r"[\w\s]+", re.UNICODE)
+# Bound on SQL parameters per statement, below SQLite's default limit.
+MAX_SQL_PARAMS = 500
+
+# FTS5 UNINDEXED columns can only be filtered by scanning every row, so per-accession
+# bookkeeping (chunk count, and the FTS rowids to delete on re-index) lives in an ordinary
+# table keyed on (collection, accession_number).
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    document,
+    chunk_id UNINDEXED,
+    collection UNINDEXED,
+    accession_number UNINDEXED,
+    metadata UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS indexed_accessions (
+    collection TEXT NOT NULL,
+    accession_number TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    chunk_rowids TEXT NOT NULL,
+    PRIMARY KEY (collection, accession_number)
+) WITHOUT ROWID;
+"""
+# Index files written before `indexed_accessions` existed are backfilled once.
+BACKFILL_ACCESSIONS = """
+INSERT INTO indexed_accessions
+SELECT collection, accession_number, COUNT(*), json_group_array(rowid)
+FROM chunks GROUP BY collection, accession_number
+"""
+
+
+def build_match_query(text: str) -> str | None:
+    """Turn free text into an FTS5 OR-query of quoted terms; None when nothing is left."""
+    terms = [term for term in TOKEN_RE.findall(text.lower()) if term not in STOPWORDS]
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+def build_phrase_query(phrase: str) -> str | None:
+    phrase = phrase.strip()
+    if not phrase:
+        return None
+    return '"' + phrase.replace('"', '""') + '"'
+
+
+def _where_sql(where: dict[str, Any] | None) -> tuple[list[str], list[Any]] | None:
+    """
+    Translate a Chroma metadata filter to SQL over the JSON metadata column.
+
+    Only equality, `$eq`, `$in` and `$and` are supported; anything else returns None so the
+    caller can fall back to Chroma.
+    """
+    clauses: list[str] = []
+    params: list[Any] = []
+    for key, value in (where or {}).items():
+        if key == "$and":
+            for sub_filter in value:
+                translated = _where_sql(sub_filter)
+                if translated is None:
+                    return None
+                clauses.extend(translated[0])
+                params.extend(translated[1])
+            continue
+        if key.startswith("$"):
+            return None
+
+        path = f'$."{key}"'
+        if isinstance(value, dict):
+            if set(value) == {"$eq"}:
+                clauses.append("json_extract(metadata, ?) = ?")
+                params.extend([path, value["$eq"]])
+            elif set(value) == {"$in"} and value["$in"]:
+                placeholders = ", ".join("?" for _ in value["$in"])
+                clauses.append(f"json_extract(metadata, ?) IN ({placeholders})")
+                params.extend([path, *value["$in"]])
+            else:
+                return None
+        else:
+            clauses.append("json_extract(metadata, ?) = ?")
+            params.extend([path, value])
+    return clauses, params
+
+
+class FullTextIndex:
+    """
+    BM25 keyword search over the same chunks that are embedded in Chroma.
+
+    Rows are keyed by Chroma chunk id, so keyword hits can be fused with vector hits or used
+    to restrict a vector query to `ids=` instead of a `where_document` collection scan.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path)
+        if not self._initialized:
+            with connection:
+                connection.executescript(SCHEMA)
+                has_bookkeeping = connection.execute(
+                    "SELECT 1 FROM indexed_accessions LIMIT 1"
+                ).fetchone()
+                if not has_bookkeeping:
+                    connection.execute(BACKFILL_ACCESSIONS)
+            self._initialized = True
+        return connection
+
+    def add_chunks(
+        self,
+        collection: str,
+        accession_number: str,
+        chunks: Iterable[tuple[str, str, dict[str, Any]]],
+    ) -> int:
+        """Replace the indexed chunks of one accession with `(chunk_id, document, metadata)`."""
+        rows = [
+            (document, chunk_id, collection, accession_number, json.dumps(metadata, default=str))
+            for chunk_id, document, metadata in chunks
+            if document
+        ]
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "DELETE FROM chunks WHERE rowid IN (SELECT value FROM json_each(("
+                    "SELECT chunk_rowids FROM indexed_accessions "
+                    "WHERE collection = ? AND accession_number = ?)))",
+                    (collection, accession_number),
+                )
+                rowids = [
+                    connection.execute(
+                        "INSERT INTO chunks (document, chunk_id, collection, accession_number, "
+                        "metadata) VALUES (?, ?, ?, ?, ?)",
+                        row,
+                    ).lastrowid
+                    for row in rows
+                ]
+                connection.execute(
+                    "INSERT OR REPLACE INTO indexed_accessions VALUES (?, ?, ?, ?)",
+                    (collection, accession_number, len(rowids), json.dumps(rowids)),
+                )
+        finally:
+            connection.close()
+        logger.info("Indexed %d chunks for accession %s", len(rows), accession_number)
+        return len(rows)
+
+    def indexed_counts(self, collection: str, accession_numbers: Iterable[str]) -> dict[str, int]:
+        """Number of indexed chunks for each of the accessions that have been indexed."""
+        accession_numbers = list(accession_numbers)
+        counts: dict[str, int] = {}
+        connection = self._connect()
+        try:
+            for start in range(0, len(accession_numbers), MAX_SQL_PARAMS):
+                batch = accession_numbers[start : start + MAX_SQL_PARAMS]
+                placeholders = ", ".join("?" for _ in batch)
+                counts.update(
+                    connection.execute(
+                        "SELECT accession_number, chunk_count FROM indexed_accessions "
+                        f"WHERE collection = ? AND accession_number IN ({placeholders})",
+                        [collection, *batch],
+                    ).fetchall()
+                )
+        finally:
+            connection.close()
+        return counts
+
+    def covers(
+        self, collection: str, where: dict[str, Any] | None, expected: Mapping[str, int]
+    ) -> bool:
+        """
+        Whether the index holds every chunk in the filter scope.
+
+        `expected` maps each accession in the scope to its chunk count in Chroma; an empty
+        scope is not covered, since the collection may hold chunks nothing recorded.
+        """
+        if not expected or _where_sql(where) is None:
+            return False
+        indexed = self.indexed_counts(collection, expected)
+        return all(indexed.get(accession, 0) >= count for accession, count in expected.items())
+
+    def search(
+        self,
+        collection: str,
+        query: str,
+        *,
+        where: dict[str, Any] | None = None,
+        phrase: str | None = None,
+        limit: int = 20,
+    ) -> list[dict[str, Any]] | None:
+        """
+        BM25-ranked chunks for `query`, optionally required to contain `phrase`.
+
+        Returns matches shaped like `flatten_chroma_query_results`, with `score` holding the
+        BM25 score (lower is better), or None when the filter cannot be evaluated locally.
+        """
+        translated = _where_sql(where)
+        match_query = build_match_query(query)
+        phrase_query = build_phrase_query(phrase) if phrase else None
+        if translated is None:
+            return None
+        if match_query and phrase_query:
+            match_query = f"({match_query}) AND {phrase_query}"
+        match_query = match_query or phrase_query
+        if not match_query:
+            return []
+
+        clauses, params = translated
+        sql = " AND ".join(["chunks MATCH ?", "collection = ?", *clauses])
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                f"SELECT chunk_id, document, metadata, bm25(chunks) AS score FROM chunks "
+                f"WHERE {sql} ORDER BY score LIMIT ?",
+                [match_query, collection, *params, limit],
+            ).fetchall()
+        finally:
+            connection.close()
+        return [
+            {
+                "rank": index + 1,
+                "id": chunk_id,
+                "distance": None,
+                "score": score,
+                "document": document,
+                "metadata": json.loads(metadata),
+            }
+            for index, (chunk_id, document, metadata, score) in enumerate(rows)
+        ]
+
+    def match_ids(
+        self,
+        collection: str,
+        phrase: str,
+        where: dict[str, Any] | None = None,
+        *,
+        expected: Mapping[str, int],
+        limit: int,
+    ) -> list[str] | None:
+        """
+        Chunk ids whose text contains `phrase` as whole words (case-insensitive, stemmed).
+
+        Returns None when the caller should fall back to a Chroma `where_document` substring
+        scan: the phrase has punctuation, the index does not cover the scope, or more than
+        `limit` chunks match and the id list would be too long to pass to Chroma.
+        """
+        if not PLAIN_PHRASE_RE.fullmatch(phrase) or not self.covers(collection, where, expected):
+            return None
+        matches = self.search(collection, "", where=where, phrase=phrase, limit=limit + 1)
+        if matches is None or len(matches) > limit:
+            return None
+        return [match["id"] for match in matches]
+
+
+fulltext_index = FullTextIndex(
+    os.getenv("RAG_FULLTEXT_INDEX_PATH", "./.rag_fulltext_index.sqlite3")
+)
@@ -0,0 +1,301 @@
+"""In-process exact vector search over the chunks of the most-queried tickers."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from functools import reduce
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from src.agent_tools.edgar.ingestion_manifest import ingestion_manifest
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+RECORDS_FILE = "records.json"
+SUPPORTED_SPACES = ("l2", "ip", "cosine")
+
+# Loads every chunk of (collection, ticker) from Chroma: ids, embeddings, documents,
+# metadatas and the collection's distance space.
+ShardLoader = Callable[[str, str], Awaitable[dict[str, Any]]]
+VersionSource = Callable[[str, str | None], int]
+
+
+@dataclass
+class HotShard:
+    version: int
+    space: str
+    ids: list[str]
+    documents: list[str]
+    metadatas: list[dict[str, Any]]
+    embeddings: np.ndarray
+    norms: np.ndarray
+
+    def __post_init__(self) -> None:
+        self._columns: dict[str, np.ndarray] = {}
+
+    def column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(len(self.metadatas), dtype=object)
+            column[:] = [metadata.get(key) for metadata in self.metadatas]
+            self._columns[key] = column
+        return column
+
+    def mask(self, where: dict[str, Any] | None) -> np.ndarray | None:
+        """Boolean row mask for a Chroma metadata filter; None when it can't be evaluated."""
+        masks: list[np.ndarray] = []
+        for key, value in (where or {}).items():
+            if key == "$and":
+                for sub_filter in value:
+                    sub_mask = self.mask(sub_filter)
+                    if sub_mask is None:
+                        return None
+                    masks.append(sub_mask)
+                continue
+            if key.startswith("$"):
+                return None
+            column = self.column(key)
+            if isinstance(value, dict):
+                if set(value) == {"$eq"}:
+                    masks.append(column == value["$eq"])
+                elif set(value) == {"$in"}:
+                    wanted = set(value["$in"])
+                    masks.append(
+                        np.fromiter((item in wanted for item in column), bool, len(column))
+                    )
+                else:
+                    return None
+            else:
+                masks.append(column == value)
+        if not masks:
+            return np.ones(len(self.ids), dtype=bool)
+        return reduce(np.logical_and, masks).astype(bool)
+
+    def distances(self, query: np.ndarray) -> np.ndarray:
+        """Distances in the collection's space, so results match a Chroma query."""
+        scores = self.embeddings @ query
+        if self.space == "ip":
+            return 1.0 - scores
+        if self.space == "cosine":
+            query_norm = float(np.linalg.norm(query)) or 1.0
+            return 1.0 - scores / (self.norms * query_norm)
+        return self.norms**2 + float(query @ query) - 2.0 * scores
+
+
+class HotVectorCache:
+    """
+    Exact NumPy search over the chunks of the most-queried tickers.
+
+    Every retrieval scoped to one ticker counts as a hit; once a ticker has been asked for
+    `promote_after` times and ranks among the top `max_tickers`, its embeddings are pulled
+    from Chroma once and written as a contiguous float32 `.npy` that is memory-mapped back,
+    so later searches are a dot product instead of an HTTP round trip and the shards survive
+    restarts. Each shard records the manifest content version it was built from; a version
+    bump makes the shard stale and it is rebuilt in the background.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | None,
+        *,
+        version_source: VersionSource,
+        max_tickers: int = 50,
+        promote_after: int = 3,
+    ):
+        self.cache_dir = cache_dir
+        self.max_tickers = max_tickers
+        self.promote_after = promote_after
+        self._version_source = version_source
+        self._hits: Counter[tuple[str, str]] = Counter()
+        self._shards: dict[tuple[str, str], HotShard] = {}
+        self._loading: set[tuple[str, str]] = set()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.cache_dir) and self.max_tickers > 0
+
+    def _version(self, collection_name: str, ticker: str) -> int:
+        return self._version_source(collection_name, ticker)
+
+    def search(
+        self,
+        collection_name: str,
+        ticker: str,
+        query_embeddings: list[list[float]],
+        *,
+        n_results: int,
+        where: dict[str, Any] | None = None,
+        ids: list[str] | None = None,
+        where_document: dict[str, Any] | None = None,
+    ) -> dict[str, Any] | None:
+        """
+        Answer a Chroma-style query from a hot shard, or None on a miss.
+
+        The result has Chroma's nested `query` shape, one row per query embedding, so callers
+        treat both paths alike.
+        """
+        if not self.enabled:
+            return None
+        key = (collection_name, ticker.upper())
+        with self._lock:
+            self._hits[key] += 1
+        shard = self._current_shard(key)
+        if shard is None:
+            return None
+
+        mask = shard.mask(where)
+        if mask is None:
+            return None
+        if ids is not None:
+            wanted = set(ids)
+            mask &= np.fromiter((chunk_id in wanted for chunk_id in shard.ids), bool, len(mask))
+        if where_document is not None:
+            if set(where_document) != {"$contains"}:
+                return None
+            needle = where_document["$contains"]
+            mask &= np.fromiter((needle in doc for doc in shard.documents), bool, len(mask))
+
+        candidates = np.flatnonzero(mask)
+        results: dict[str, list[list[Any]]] = {
+            "ids": [],
+            "documents": [],
+            "metadatas": [],
+            "distances": [],
+        }
+        for query_embedding in query_embeddings:
+            if candidates.size:
+                query = np.asarray(query_embedding, dtype=np.float32)
+                distances = shard.distances(query)[candidates]
+                top = min(n_results, candidates.size)
+                best = np.argpartition(distances, top - 1)[:top]
+                order = best[np.argsort(distances[best], kind="stable")]
+                rows = candidates[order].tolist()
+                row_distances = distances[order].tolist()
+            else:
+                rows, row_distances = [], []
+            results["ids"].append([shard.ids[row] for row in rows])
+            results["documents"].append([shard.documents[row] for row in rows])
+            results["metadatas"].append([shard.metadatas[row] for row in rows])
+            results["distances"].append(row_distances)
+        return results
+
+    def schedule_promotion(self, collection_name: str, ticker: str, loader: ShardLoader) -> None:
+        """Build the shard in the background if the ticker has become hot."""
+        if not self.enabled:
+            return
+        key = (collection_name, ticker.upper())
+        with self._lock:
+            if key in self._loading or self._hits[key] < self.promote_after:
+                return
+            hottest = {hot_key for hot_key, _ in self._hits.most_common(self.max_tickers)}
+            if key not in hottest:
+                return
+            self._loading.add(key)
+        task = asyncio.get_running_loop().create_task(self._promote(key, loader))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hot_tickers": sorted(
+                    f"{collection}:{ticker}" for collection, ticker in self._shards
+                ),
+                "chunks": sum(len(shard.ids) for shard in self._shards.values()),
+                "tracked_tickers": len(self._hits),
+            }
+
+    def _current_shard(self, key: tuple[str, str]) -> HotShard | None:
+        version = self._version(*key)
+        shard = self._shards.get(key)
+        if shard is not None and shard.version == version:
+            return shard
+        if shard is None:
+            # Shards built by an earlier process are picked up from disk.
+            shard = self._read_shard(key, version)
+            if shard is not None:
+                with self._lock:
+                    self._shards[key] = shard
+                return shard
+        return None
+
+    async def _promote(self, key: tuple[str, str], loader: ShardLoader) -> None:
+        try:
+            version = self._version(*key)
+            payload = await loader(*key)
+            shard = await asyncio.to_thread(self._write_shard, key, version, payload)
+            with self._lock:
+                self._shards[key] = shard
+                self._evict()
+            logger.info("Hot vector shard %s:%s loaded (%d chunks)", *key, len(shard.ids))
+        except Exception as exc:
+            logger.warning("Failed to load hot vector shard %s:%s: %s", *key, exc)
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+
+    def _evict(self) -> None:
+        while len(self._shards) > self.max_tickers:
+            coldest = min(self._shards, key=lambda shard_key: self._hits[shard_key])
+            self._shards.pop(coldest)
+            shutil.rmtree(self._shard_root(coldest), ignore_errors=True)
+
+    def _shard_root(self, key: tuple[str, str]) -> Path:
+        collection_name, ticker = key
+        return Path(self.cache_dir) / collection_name / ticker
+
+    def _write_shard(self, key: tuple[str, str], version: int, payload: dict[str, Any]) -> HotShard:
+        space = payload.get("space") or "l2"
+        if space not in SUPPORTED_SPACES:
+            raise ValueError(f"Unsupported distance space {space}")
+        root = self._shard_root(key)
+        shutil.rmtree(root, ignore_errors=True)
+        directory = root / f"v{version}"
+        directory.mkdir(parents=True)
+        embeddings = np.ascontiguousarray(payload["embeddings"], dtype=np.float32)
+        np.save(directory / EMBEDDINGS_FILE, embeddings)
+        records = {
+            "space": space,
+            "ids": list(payload["ids"]),
+            "documents": list(payload["documents"]),
+            "metadatas": list(payload["metadatas"]),
+        }
+        (directory / RECORDS_FILE).write_text(json.dumps(records))
+        return self._read_shard(key, version)
+
+    def _read_shard(self, key: tuple[str, str], version: int) -> HotShard | None:
+        directory = self._shard_root(key) / f"v{version}"
+        if not (directory / RECORDS_FILE).exists():
+            return None
+        records = json.loads((directory / RECORDS_FILE).read_text())
+        embeddings = np.load(directory / EMBEDDINGS_FILE, mmap_mode="r")
+        return HotShard(
+            version=version,
+            space=records["space"],
+            ids=records["ids"],
+            documents=records["documents"],
+            metadatas=records["metadatas"],
+            embeddings=embeddings,
+            norms=np.linalg.norm(embeddings, axis=1) if len(embeddings) else np.zeros(0),
+        )
+
+
+hot_vector_cache = HotVectorCache(
+    os.getenv("RAG_HOT_CACHE_DIR", "./.rag_hot_vectors"),
+    version_source=ingestion_manifest.content_version,
+    max_tickers=int(os.getenv("RAG_HOT_CACHE_TICKERS", "50")),
+    promote_after=int(os.getenv("RAG_HOT_CACHE_PROMOTE_AFTER", "3")),
+)
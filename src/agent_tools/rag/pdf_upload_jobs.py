@@ -0,0 +1,260 @@
+"""Background parsing and indexing of uploaded PDFs, spooled to disk off the request path."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from functools import lru_cache
+from pathlib import Path
+
+from diskcache import Cache
+from fastapi import UploadFile
+from fastapi.encoders import jsonable_encoder
+from llama_cloud_services import LlamaParse
+from llama_index.core.node_parser import SentenceSplitter
+
+from clients.chroma_client import chroma_client
+from src.agent_tools.edgar.ingestion_manifest import ingestion_manifest
+from src.agent_tools.edgar.ingestion_pipeline import embed_and_upsert, ingestion_metrics
+from src.models.edgar_ingestion import IngestionJobStatus
+from src.models.rag_upload import PdfUploadJob
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY_PREFIX = "rag_upload_job:"
+ACTIVE_STATUSES = frozenset({IngestionJobStatus.QUEUED, IngestionJobStatus.RUNNING})
+SPOOL_CHUNK_BYTES = 1024 * 1024
+PDF_CHUNK_SIZE = 256
+
+# Parses and indexes a spooled upload; returns (pages, chunks indexed).
+IndexFn = Callable[[PdfUploadJob], Awaitable[tuple[int, int]]]
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=1)
+def get_llama_parser() -> LlamaParse:
+    """One LlamaParse client per process, so its HTTP session is reused across uploads."""
+    api_key = os.getenv("LLAMA_CLOUD_API_KEY")
+    if not api_key:
+        raise ValueError("LLAMA_CLOUD_API_KEY is not set.")
+    return LlamaParse(api_key=api_key, num_workers=4, verbose=True, language="en")
+
+
+async def index_pdf(job: PdfUploadJob) -> tuple[int, int]:
+    async with ingestion_metrics.track("pdf_parse"):
+        result = await get_llama_parser().aparse(
+            job.spool_path, extra_info={"file_name": job.file_name}
+        )
+    documents = result.get_markdown_documents(split_by_page=True)
+
+    splitter = SentenceSplitter(chunk_size=PDF_CHUNK_SIZE)
+    nodes = await asyncio.to_thread(splitter.get_nodes_from_documents, documents)
+    for i, node in enumerate(nodes):
+        # Stable ids, so a job re-run after a restart overwrites its partial chunks.
+        node.id_ = f"{job.job_id}:{i}"
+        node.metadata = (node.metadata or {}) | {
+            "source_file": job.file_name,
+            "domain": job.domain,
+            "corpus": job.corpus,
+            "company_name": job.company_name,
+        }
+        # Page chunks are embedded as plain text, as before the upload became a job.
+        node.excluded_embed_metadata_keys = list(node.metadata)
+
+    collection = await chroma_client.get_collection(
+        chroma_client.route(job.collection_name), create=True
+    )
+    await embed_and_upsert(collection, nodes, collection_name=job.collection_name)
+    ingestion_manifest.bump_content_version(job.collection_name)
+    return len(documents), len(nodes)
+
+
+class PdfUploadJobs:
+    """
+    Upload jobs keyed by id, persisted in diskcache and run as tasks on the event loop.
+
+    The request handler only streams the upload into `spool_dir` and records a job; parsing,
+    chunking and embedding happen in the background, at most `workers` at a time. The spool
+    file is removed once the job finishes. Jobs still active when the process stopped are
+    re-run by `start()`, which the API calls at startup, if their spool file survived, and
+    are otherwise marked failed.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        spool_dir: str,
+        *,
+        workers: int = 2,
+        max_bytes: int | None = None,
+        index: IndexFn = index_pdf,
+    ):
+        self.cache_dir = cache_dir
+        self.spool_dir = Path(spool_dir)
+        self.workers = max(1, workers)
+        self.max_bytes = max_bytes
+        self.index = index
+        self._cache: Cache | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._finished: dict[str, asyncio.Event] = {}
+
+    @property
+    def cache(self) -> Cache:
+        if self._cache is None:
+            self._cache = Cache(self.cache_dir)
+        return self._cache
+
+    def get(self, job_id: str) -> PdfUploadJob | None:
+        payload = self.cache.get(self._job_key(job_id))
+        if not payload:
+            return None
+        return PdfUploadJob.model_validate(payload)
+
+    async def submit(
+        self,
+        file: UploadFile,
+        *,
+        collection_name: str,
+        domain: str,
+        corpus: str,
+        company_name: str | None,
+    ) -> PdfUploadJob:
+        """Stream the upload to a spool file and queue it for indexing."""
+        self.start()
+        job_id = uuid.uuid4().hex
+        spool_path = self.spool_dir / f"{job_id}.pdf"
+        size_bytes = await self._spool(file, spool_path)
+        job = PdfUploadJob(
+            job_id=job_id,
+            file_name=file.filename or spool_path.name,
+            collection_name=collection_name,
+            spool_path=str(spool_path),
+            domain=domain,
+            corpus=corpus,
+            company_name=company_name,
+            size_bytes=size_bytes,
+            enqueued_at=datetime.now(UTC),
+        )
+        self._save(job)
+        self._start(job_id)
+        logger.info("Queued PDF upload %s (%d bytes) for %s", job_id, size_bytes, collection_name)
+        return job
+
+    async def wait(self, job_id: str, timeout: float | None) -> PdfUploadJob | None:
+        """Wait up to `timeout` seconds for the job to finish, then report its state."""
+        self.start()
+        event = self._finished.get(job_id)
+        if timeout and timeout > 0 and event is not None and not event.is_set():
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except TimeoutError:
+                logger.info("PDF upload job %s still running after %.1fs", job_id, timeout)
+        return self.get(job_id)
+
+    async def _spool(self, file: UploadFile, path: Path) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size_bytes = 0
+        try:
+            with path.open("wb") as spool:
+                while chunk := await file.read(SPOOL_CHUNK_BYTES):
+                    size_bytes += len(chunk)
+                    if self.max_bytes and size_bytes > self.max_bytes:
+                        raise UploadTooLargeError(
+                            f"Upload exceeds the {self.max_bytes} byte limit."
+                        )
+                    await asyncio.to_thread(spool.write, chunk)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return size_bytes
+
+    def start(self) -> None:
+        """Bind to the current event loop, resuming jobs a previous run left unfinished."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.workers)
+        self._finished = {}
+        for key in list(self.cache.iterkeys()):
+            if not str(key).startswith(JOB_KEY_PREFIX):
+                continue
+            job = PdfUploadJob.model_validate(self.cache.get(key))
+            if job.status not in ACTIVE_STATUSES:
+                continue
+            if Path(job.spool_path).exists():
+                job.status = IngestionJobStatus.QUEUED
+                self._save(job)
+                self._start(job.job_id)
+                logger.info("Recovered PDF upload job %s", job.job_id)
+            else:
+                job.status = IngestionJobStatus.FAILED
+                job.error = "spooled upload was lost before indexing finished"
+                job.finished_at = datetime.now(UTC)
+                self._save(job)
+
+    async def stop(self) -> None:
+        """Cancel running jobs; they stay active on disk and resume on the next `start()`."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, job_id: str) -> None:
+        self._finished[job_id] = asyncio.Event()
+        task = self._loop.create_task(self._run(job_id), name=f"pdf-upload-{job_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id: str) -> None:
+        try:
+            async with self._slots:
+                job = self.get(job_id)
+                if job is None or job.status != IngestionJobStatus.QUEUED:
+                    return
+                job.status = IngestionJobStatus.RUNNING
+                job.started_at = datetime.now(UTC)
+                self._save(job)
+                try:
+                    job.pages, job.chunks_indexed = await self.index(job)
+                    job.status = IngestionJobStatus.SUCCEEDED
+                except Exception as exc:
+                    logger.exception("PDF upload job %s failed", job_id)
+                    job.status = IngestionJobStatus.FAILED
+                    job.error = str(exc)
+                job.finished_at = datetime.now(UTC)
+                self._save(job)
+                Path(job.spool_path).unlink(missing_ok=True)
+        finally:
+            event = self._finished.get(job_id)
+            if event is not None:
+                event.set()
+
+    def _save(self, job: PdfUploadJob) -> None:
+        self.cache.set(self._job_key(job.job_id), jsonable_encoder(job, exclude_none=True))
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"{JOB_KEY_PREFIX}{job_id}"
+
+
+def _max_upload_bytes() -> int | None:
+    limit_mb = int(os.getenv("RAG_UPLOAD_MAX_MB", "200"))
+    return limit_mb * 1024 * 1024 if limit_mb > 0 else None
+
+
+pdf_upload_jobs = PdfUploadJobs(
+    os.getenv("RAG_UPLOAD_JOBS_DIR", "./.rag_upload_jobs"),
+    os.getenv("RAG_UPLOAD_SPOOL_DIR", "./.rag_upload_spool"),
+    workers=int(os.getenv("RAG_UPLOAD_WORKERS", "2")),
+    max_bytes=_max_upload_bytes(),
+)
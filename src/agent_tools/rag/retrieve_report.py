@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-from typing import Any, Literal
+from typing import Any
 
 from diskcache import Cache
 from fastapi.logger import logger
 
-from src.agent_tools.rag.extract_financial_statements_impl import extract_financial_statement_impl
+from src.agent_tools.rag.extract_financial_statements_impl import (
+    extract_financial_statement_impl,
+    extract_financial_statements_impl,
+)
 from src.agent_tools.rag.retrieve_report_impl import _retrieve_report
-from src.models.rag_retrieve import FinancialStatementOutput, RAGRetrieveInput
+from src.models.rag_retrieve import (
+    FinancialStatementOutput,
+    FinancialStatementsOutput,
+    RAGRetrieveInput,
+    StatementType,
+)
 
 
 def register_tools(mcp_server: Any, *, cache: Cache) -> None:
@@ -18,14 +26,17 @@ def register_tools(mcp_server: Any, *, cache: Cache) -> None:
         Agent-friendly output:
         - `matches`: ranked list of chunks with `document`, `metadata`, `distance`
         - `context`: pre-formatted text block suitable to paste into an LLM prompt
+
+        Results are cached until new chunks are ingested for the collection or ticker.
         """
 
-        return await _retrieve_report(input)
+        return await _retrieve_report(input, cache=cache)
 
     @mcp_server.tool()
     async def extract_financial_statement(
         accession_number: str,
-        statement_type: Literal["income_statement", "balance_sheet", "cash_flow_statement"],
+        statement_type: StatementType,
+        ticker: str | None = None,
     ) -> FinancialStatementOutput:
         """
         Extracts a specific financial statement (income statement, balance sheet, or cash flow statement)
@@ -35,10 +46,38 @@ def register_tools(mcp_server: Any, *, cache: Cache) -> None:
         Args:
             accession_number: The accession number of the SEC filing.
             statement_type: The type of financial statement to extract.
+            ticker: The filer's ticker symbol, if known.
         """
 
         logger.info(
-            "[tool] extract_financial_statements invoked",
+            "[tool] extract_financial_statement invoked",
             extra={"accession_number": accession_number, "statement_type": statement_type},
         )
-        return await extract_financial_statement_impl(accession_number, statement_type)
+        return await extract_financial_statement_impl(
+            accession_number, statement_type, ticker=ticker, cache=cache
+        )
+
+    @mcp_server.tool()
+    async def extract_financial_statements(
+        accession_number: str,
+        statement_types: list[StatementType] | None = None,
+        ticker: str | None = None,
+    ) -> FinancialStatementsOutput:
+        """
+        Extracts several financial statements (income statement, balance sheet, cash flow
+        statement) from one SEC filing in a single round-trip, identified by its accession
+        number. Prefer this over repeated `extract_financial_statement` calls.
+
+        Args:
+            accession_number: The accession number of the SEC filing.
+            statement_types: Statement types to extract. Defaults to all three.
+            ticker: The filer's ticker symbol, if known.
+        """
+
+        logger.info(
+            "[tool] extract_financial_statements invoked",
+            extra={"accession_number": accession_number, "statement_types": statement_types},
+        )
+        return await extract_financial_statements_impl(
+            accession_number, statement_types, ticker=ticker, cache=cache
+        )
@@ -1,17 +1,36 @@
 from __future__ import annotations
 
 import asyncio
-import os
+import hashlib
+from array import array
 from datetime import UTC, datetime
+from functools import partial
 from typing import Any
 
-from llama_index.core.embeddings.utils import resolve_embed_model
+from diskcache import Cache
+from fastapi.logger import logger
 
-from clients.chroma_client import ChromaClient
-from src.agent_tools.rag.context_builder import build_rag_context, flatten_chroma_query_results
+from clients.chroma_client import chroma_client
+from clients.embedding_registry import default_embed_model_name, embedding_registry
+from src.agent_tools.edgar.filing_segmenter import SECTION_TOPICS
+from src.agent_tools.edgar.ingestion_manifest import ingestion_manifest
+from src.agent_tools.rag.context_builder import (
+    build_rag_context,
+    reciprocal_rank_fusion,
+    split_chroma_query_results,
+)
+from src.agent_tools.rag.embedding_reduction import get_embedding_reducer
+from src.agent_tools.rag.fulltext_index import fulltext_index
+from src.agent_tools.rag.hot_vector_cache import hot_vector_cache
 from src.models.rag_retrieve import RAGRetrieveInput
+from src.utils.cache import CacheConfig, cache_key
+from src.utils.tokenizer import get_tokenizer
 
-chroma_client = ChromaClient()
+# Each ranker contributes this many candidates per requested chunk before fusion.
+HYBRID_CANDIDATE_FACTOR = 4
+MAX_HYBRID_CANDIDATES = 100
+# Above this many keyword matches, `document_contains` is left to Chroma's document scan.
+MAX_KEYWORD_IDS = 500
 
 
 def validate_if_domain_edgar(domain: str, filters: dict[str, Any] | None) -> None:
@@ -44,11 +63,241 @@ def normalize_edgar_filters(filters: dict[str, Any]) -> dict[str, Any]:
     return normalized
 
 
-async def _retrieve_report(input_data: RAGRetrieveInput) -> dict[str, Any]:
+def _filter_ticker(filters: dict[str, Any] | None) -> str | None:
+    """The single ticker a filter is scoped to, if any."""
+    ticker = filters.get("ticker") if isinstance(filters, dict) else None
+    if isinstance(ticker, dict):
+        ticker = ticker.get("$eq")
+    return ticker if isinstance(ticker, str) else None
+
+
+def _retrieval_queries(input_data: RAGRetrieveInput) -> list[str]:
+    """The primary query followed by distinct, non-empty sub-queries."""
+    sub_queries = (query.strip() for query in input_data.sub_queries)
+    return list(dict.fromkeys([input_data.query.strip(), *filter(None, sub_queries)]))
+
+
+def _section_scoped_filters(filters: dict[str, Any] | None, sections: list[str]) -> dict[str, Any]:
+    """`filters` narrowed to chunks from the filing sections that carry `sections` topics."""
+    section_ids = list(dict.fromkeys(sid for topic in sections for sid in SECTION_TOPICS[topic]))
+    scope = {"section": {"$in": section_ids}}
+    if not filters:
+        return scope
+    return {"$and": [*({key: value} for key, value in filters.items()), scope]}
+
+
+def _merge_by_distance(
+    rankings: list[list[dict[str, Any]]], *, n_results: int
+) -> list[dict[str, Any]]:
+    """Merge per-shard rankings of one query into a single ranking by vector distance."""
+    matches = [match for ranking in rankings for match in ranking]
+    matches.sort(key=lambda match: match["distance"] if match["distance"] is not None else 1e9)
+    return [match | {"rank": rank} for rank, match in enumerate(matches[:n_results], start=1)]
+
+
+def _rank_per_query(
+    raw_results: list[dict[str, Any]], *, n_results: int
+) -> list[list[dict[str, Any]]]:
+    """One vector ranking per query, merged across shards when several were searched."""
+    per_collection = [split_chroma_query_results(raw) for raw in raw_results]
+    if len(per_collection) == 1:
+        return per_collection[0]
+    return [
+        _merge_by_distance(list(rankings), n_results=n_results)
+        for rankings in zip(*per_collection, strict=True)
+    ]
+
+
+def _indexed_scope(collection_name: str, ticker: str | None) -> dict[str, int]:
+    """
+    Chunk counts the full-text index must hold to answer for the collection (or ticker).
+
+    Empty when the manifest has an accession mid-ingest or failed, whose chunks may be in
+    Chroma without being indexed.
+    """
+    scope = ingestion_manifest.scope(collection_name, ticker)
+    counts = {accession: count for accession, count in scope.items() if count is not None}
+    return counts if len(counts) == len(scope) else {}
+
+
+def _keyword_rankings(
+    collection_name: str,
+    queries: list[str],
+    filters: dict[str, Any] | None,
+    phrase: str | None,
+    limit: int,
+    *,
+    expected: dict[str, int],
+) -> list[list[dict[str, Any]]] | None:
+    """BM25 ranking per query, or None when the full-text index doesn't cover the scope."""
+    if not fulltext_index.covers(collection_name, filters, expected):
+        return None
+    rankings: list[list[dict[str, Any]]] = []
+    for query in queries:
+        matches = fulltext_index.search(
+            collection_name, query, where=filters, phrase=phrase, limit=limit
+        )
+        if matches is None:
+            return None
+        rankings.append(matches)
+    return rankings
+
+
+async def _load_hot_shard(collection_name: str, ticker: str) -> dict[str, Any]:
+    collection = await chroma_client.get_collection_or_raise(
+        collection_name, cache=None, ticker=ticker
+    )
+    payload = await collection.get(
+        where={"ticker": ticker}, include=["embeddings", "documents", "metadatas"]
+    )
+    return dict(payload) | {"space": (collection.metadata or {}).get("hnsw:space", "l2")}
+
+
+def _embedding_digest(embeddings: list[list[float]]) -> str:
+    digest = hashlib.sha256()
+    for embedding in embeddings:
+        digest.update(array("d", embedding).tobytes())
+    return digest.hexdigest()
+
+
+def _retrieve_cache_key(
+    input_data: RAGRetrieveInput,
+    *,
+    collection_name: str,
+    embed_model_name: str,
+    query_embeddings: list[list[float]],
+    filters: dict[str, Any] | None,
+) -> str:
+    """
+    Key a retrieval by everything that shapes its result, including the content version.
+
+    Ticker-scoped queries key on that ticker's version so ingesting another company's filing
+    leaves them cached; anything broader keys on the whole collection's version.
+    """
+    ticker = _filter_ticker(filters)
+    return cache_key(
+        "ChromaDB",
+        "retrieve_report",
+        {
+            "collection": collection_name,
+            "content_version": ingestion_manifest.content_version(collection_name, ticker),
+            "embed_model": embed_model_name,
+            "query_embeddings": _embedding_digest(query_embeddings),
+            "filters": filters,
+            "top_k": input_data.top_k,
+            "document_contains": input_data.document_contains,
+            "sections": input_data.sections,
+            "retrieval_mode": input_data.retrieval_mode,
+            "max_context_chars": input_data.max_context_chars,
+            "max_context_tokens": input_data.max_context_tokens,
+        },
+    )
+
+
+async def _search(
+    input_data: RAGRetrieveInput,
+    *,
+    collection_name: str,
+    collections: list[Any],
+    queries: list[str],
+    query_embeddings: list[list[float]],
+    where: dict[str, Any] | None,
+    ticker: str | None,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """Vector (and for hybrid, BM25) search fused to `top_k`; also reports the keyword path."""
+    hybrid = input_data.retrieval_mode == "hybrid"
+    keyword_filter = None
+    keyword_ids: list[str] | None = None
+    where_document = None
+    expected: dict[str, int] = {}
+    if input_data.document_contains or hybrid:
+        expected = await asyncio.to_thread(_indexed_scope, collection_name, ticker)
+    if input_data.document_contains:
+        keyword_ids = await asyncio.to_thread(
+            partial(
+                fulltext_index.match_ids,
+                collection_name,
+                input_data.document_contains,
+                where,
+                expected=expected,
+                limit=MAX_KEYWORD_IDS,
+            )
+        )
+        if keyword_ids is None:
+            keyword_filter = "chroma"
+            where_document = {"$contains": input_data.document_contains}
+        else:
+            keyword_filter = "fulltext"
+
+    n_candidates = input_data.top_k
+    if hybrid:
+        n_candidates = min(input_data.top_k * HYBRID_CANDIDATE_FACTOR, MAX_HYBRID_CANDIDATES)
+
+    matches: list[dict[str, Any]] = []
+    if keyword_ids != []:
+        query_kwargs: dict[str, Any] = {}
+        if keyword_ids is not None:
+            query_kwargs["ids"] = keyword_ids
+
+        hot_results = None
+        if ticker:
+            hot_results = hot_vector_cache.search(
+                collection_name,
+                ticker,
+                query_embeddings,
+                n_results=n_candidates,
+                where=where,
+                ids=keyword_ids,
+                where_document=where_document,
+            )
+        if hot_results is not None:
+            raw_results = [hot_results]
+        else:
+            raw_results = await asyncio.gather(
+                *(
+                    collection.query(
+                        query_embeddings=query_embeddings,
+                        n_results=n_candidates,
+                        where=where,
+                        where_document=where_document,
+                        include=["documents", "metadatas", "distances"],
+                        **query_kwargs,
+                    )
+                    for collection in collections
+                )
+            )
+            if ticker:
+                hot_vector_cache.schedule_promotion(collection_name, ticker, _load_hot_shard)
+        rankings = _rank_per_query(raw_results, n_results=n_candidates)
+
+        if hybrid:
+            keyword_rankings = await asyncio.to_thread(
+                partial(
+                    _keyword_rankings,
+                    collection_name,
+                    queries,
+                    where,
+                    input_data.document_contains,
+                    n_candidates,
+                    expected=expected,
+                )
+            )
+            rankings.extend(keyword_rankings or [])
+        # Vector rankings come first so fused matches keep their distances.
+        if len(rankings) == 1:
+            matches = rankings[0][: input_data.top_k]
+        else:
+            matches = reciprocal_rank_fusion(rankings, top_k=input_data.top_k)
+    return matches, keyword_filter
+
+
+async def _retrieve_report(
+    input_data: RAGRetrieveInput, *, cache: Cache | None = None
+) -> dict[str, Any]:
     if not input_data.query or not input_data.query.strip():
         raise ValueError("query is required")
 
-    embed_model_name = os.getenv("RAG_EMBED_MODEL")
+    embed_model_name = default_embed_model_name()
     collection_name = input_data.collection or "edgar_filings"
 
     filters = input_data.filters
@@ -59,39 +308,75 @@ async def _retrieve_report(input_data: RAGRetrieveInput) -> dict[str, Any]:
 
     validate_if_domain_edgar(input_data.domain, filters)
 
-    collection = await chroma_client.get_collection_or_raise(
-        collection_name=collection_name, cache=None
-    )
+    queries = _retrieval_queries(input_data)
+    query_embeddings = await embedding_registry.aget_query_embeddings(queries, embed_model_name)
+    # Stored vectors may be reduced; queries go through the same transform.
+    query_embeddings = get_embedding_reducer(collection_name).transform(query_embeddings)
+    key = None
+    if cache is not None:
+        key = _retrieve_cache_key(
+            input_data,
+            collection_name=collection_name,
+            embed_model_name=embed_model_name,
+            query_embeddings=query_embeddings,
+            filters=filters,
+        )
+        cached = cache.get(key)
+        if isinstance(cached, dict):
+            logger.info("[retrieve_report] using cached result for %s", collection_name)
+            return cached
 
-    embed_model = resolve_embed_model(embed_model_name)
-    query_embedding = await asyncio.to_thread(embed_model.get_query_embedding, input_data.query)
+    ticker = _filter_ticker(filters)
+    collections = await chroma_client.get_query_collections_or_raise(
+        collection_name, cache=None, ticker=ticker
+    )
 
-    where_document = None
-    if input_data.document_contains:
-        where_document = {"$contains": input_data.document_contains}
-
-    raw_results = await asyncio.to_thread(
-        collection.query,
-        query_embeddings=[query_embedding],
-        n_results=input_data.top_k,
-        where=filters,
-        where_document=where_document,
-        include=["documents", "metadatas", "distances"],
+    sections = list(dict.fromkeys(input_data.sections or [])) or None
+    search = partial(
+        _search,
+        input_data,
+        collection_name=collection_name,
+        collections=collections,
+        queries=queries,
+        query_embeddings=query_embeddings,
+        ticker=ticker,
     )
+    matches: list[dict[str, Any]] = []
+    keyword_filter = None
+    if sections:
+        matches, keyword_filter = await search(where=_section_scoped_filters(filters, sections))
+        if not matches:
+            # Chunks ingested before section tagging only match the unscoped search.
+            logger.info("[retrieve_report] nothing in sections %s, searching all", sections)
+            sections = None
+    if not sections:
+        matches, keyword_filter = await search(where=filters)
 
-    matches = flatten_chroma_query_results(raw_results)
-    context = build_rag_context(matches, max_chars=input_data.max_context_chars)
+    tokenizer = get_tokenizer()
+    context = build_rag_context(
+        matches,
+        max_chars=input_data.max_context_chars,
+        max_tokens=input_data.max_context_tokens,
+        tokenizer=tokenizer,
+    )
 
     response: dict[str, Any] = {
         "collection": collection_name,
         "query": input_data.query,
+        "queries": queries,
         "embed_model": embed_model_name,
         "top_k": input_data.top_k,
         "num_matches": len(matches),
         "filters": filters,
         "document_contains": input_data.document_contains,
+        "keyword_filter": keyword_filter,
+        "sections": sections,
+        "retrieval_mode": input_data.retrieval_mode,
         "matches": matches,
         "context": context,
+        "context_tokens": tokenizer.count(context),
         "timestamp": datetime.now(UTC).isoformat(),
     }
+    if cache is not None:
+        cache.set(key, response, expire=CacheConfig.RETRIEVE_REPORT_CACHE_TTL_SECONDS)
     return response
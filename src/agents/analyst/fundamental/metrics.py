@@ -0,0 +1,246 @@
+"""Concept x period matrix over reported line items, with metrics computed across all periods."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.models.fundamentals import FundamentalDTO
+
+from .ratios import RATIO_LIBRARY, safe_divide
+
+# Canonical concept -> reported XBRL concepts (or labels), in order of preference.
+CONCEPT_ALIASES: dict[str, tuple[str, ...]] = {
+    "revenue": (
+        "Revenues",
+        "RevenueFromContractWithCustomerExcludingAssessedTax",
+        "SalesRevenueNet",
+        "SalesRevenueGoodsNet",
+    ),
+    "gross_profit": ("GrossProfit",),
+    "operating_income": ("OperatingIncomeLoss",),
+    "net_income": ("NetIncomeLoss", "NetIncomeLossAvailableToCommonStockholdersBasic"),
+    "operating_cash_flow": (
+        "NetCashProvidedByUsedInOperatingActivities",
+        "NetCashProvidedByUsedInOperatingActivitiesContinuingOperations",
+    ),
+    "capital_expenditure": ("PaymentsToAcquirePropertyPlantAndEquipment",),
+    "interest_expense": ("InterestExpense", "InterestExpenseDebt", "InterestExpenseNonoperating"),
+    "income_tax": ("IncomeTaxExpenseBenefit",),
+    "pretax_income": (
+        "IncomeLossFromContinuingOperationsBeforeIncomeTaxesExtraordinaryItemsNoncontrollingInterest",
+        "IncomeLossFromContinuingOperationsBeforeIncomeTaxesMinorityInterestAndIncomeLossFromEquityMethodInvestments",
+    ),
+    "current_assets": ("AssetsCurrent",),
+    "current_liabilities": ("LiabilitiesCurrent",),
+    "inventory": ("InventoryNet",),
+    "cash": (
+        "CashAndCashEquivalentsAtCarryingValue",
+        "CashCashEquivalentsRestrictedCashAndRestrictedCashEquivalents",
+    ),
+    "equity": (
+        "StockholdersEquity",
+        "StockholdersEquityIncludingPortionAttributableToNoncontrollingInterest",
+    ),
+    "long_term_debt": ("LongTermDebtNoncurrent", "LongTermDebt"),
+    "short_term_debt": ("LongTermDebtCurrent", "DebtCurrent", "CommercialPaper"),
+}
+
+GROWTH_CONCEPTS = ("revenue", "operating_income", "net_income", "operating_cash_flow")
+FISCAL_QUARTERS = range(1, 5)
+# Periods shown in the prompt table, most recent last.
+TABLE_PERIODS = 8
+# Table rows: (label, series or concept, unit); rows empty in every shown period are dropped.
+TABLE_ROWS: tuple[tuple[str, str, str], ...] = (
+    ("Revenue", "revenue", "amount"),
+    ("Net Income", "net_income", "amount"),
+    ("Operating Cash Flow", "operating_cash_flow", "amount"),
+    *((ratio.label, name, ratio.unit) for name, ratio in RATIO_LIBRARY.items()),
+    ("Revenue Growth YoY", "revenue_growth_yoy", "growth"),
+    ("Revenue Growth QoQ", "revenue_growth_qoq", "growth"),
+    ("Net Income Growth YoY", "net_income_growth_yoy", "growth"),
+    ("Operating Cash Flow Growth YoY", "operating_cash_flow_growth_yoy", "growth"),
+    ("Operating Margin Change YoY", "operating_margin_delta_yoy", "pp"),
+    ("Net Margin Change YoY", "net_margin_delta_yoy", "pp"),
+)
+
+
+def _alias_index() -> dict[str, tuple[int, int]]:
+    """Lower-cased alias -> (concept row, preference); earlier aliases win."""
+    index: dict[str, tuple[int, int]] = {}
+    for row, aliases in enumerate(CONCEPT_ALIASES.values()):
+        for preference, alias in enumerate(aliases):
+            index.setdefault(alias.lower(), (row, preference))
+    return index
+
+
+ALIAS_INDEX = _alias_index()
+CONCEPT_ROWS = {concept: row for row, concept in enumerate(CONCEPT_ALIASES)}
+
+
+def _change(values: np.ndarray, prior: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(absolute delta, relative growth) of each column against its `prior` column (-1: none)."""
+    has_prior = prior >= 0
+    previous = np.where(has_prior, values[..., prior], np.nan)
+    delta = values - previous
+    return delta, safe_divide(delta, np.abs(previous))
+
+
+CELL_FORMATS = {
+    "percent": lambda value: f"{value * 100:.2f}%",
+    "growth": lambda value: f"{value * 100:+.2f}%",
+    "pp": lambda value: f"{value * 100:+.2f} pp",
+    "multiple": lambda value: f"{value:.2f}",
+}
+AMOUNT_SUFFIXES = ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K"))
+
+
+def _format_cell(value: float, unit: str) -> str:
+    if not np.isfinite(value):
+        return "n/a"
+    if unit in CELL_FORMATS:
+        return CELL_FORMATS[unit](value)
+    for threshold, suffix in AMOUNT_SUFFIXES:
+        if abs(value) >= threshold:
+            return f"{value / threshold:,.2f}{suffix}"
+    return f"{value:,.0f}"
+
+
+@dataclass(frozen=True)
+class Period:
+    year: int
+    quarter: int
+    form: str
+    filed_date: str
+    accession_number: str
+
+    @property
+    def label(self) -> str:
+        return f"FY{self.year}Q{self.quarter}"
+
+
+@dataclass
+class FundamentalMetrics:
+    """
+    Reported concepts and derived metrics for every period of one company.
+
+    `values` is a (concept x period) matrix in `CONCEPT_ALIASES` order; `series` holds every
+    derived metric as one array per name, aligned with `periods` (NaN where not computable).
+    """
+
+    periods: list[Period]
+    values: np.ndarray
+    series: dict[str, np.ndarray] = field(default_factory=dict)
+
+    @classmethod
+    def from_fundamentals(cls, fundamentals: FundamentalDTO) -> FundamentalMetrics:
+        entries = sorted(fundamentals.data, key=lambda entry: (entry.year, entry.quarter))
+        values = np.full((len(CONCEPT_ALIASES), len(entries)), np.nan)
+        preference = np.full(values.shape, np.iinfo(np.int64).max)
+        for column, entry in enumerate(entries):
+            for item in entry.report.all_items():
+                if item.value is None:
+                    continue
+                match = ALIAS_INDEX.get(item.concept.lower()) or ALIAS_INDEX.get(item.label.lower())
+                if match is None:
+                    continue
+                row, rank = match
+                if rank < preference[row, column]:
+                    values[row, column] = item.value
+                    preference[row, column] = rank
+        periods = [
+            Period(
+                year=entry.year,
+                quarter=entry.quarter,
+                form=entry.form,
+                filed_date=entry.filed_date,
+                accession_number=entry.access_number,
+            )
+            for entry in entries
+        ]
+        metrics = cls(periods=periods, values=values)
+        metrics.series = metrics._derive()
+        return metrics
+
+    def concept(self, name: str) -> np.ndarray:
+        return self.values[CONCEPT_ROWS[name]]
+
+    def _prior_columns(self) -> tuple[np.ndarray, np.ndarray]:
+        """Column of the same quarter a year earlier, and of the preceding quarter (-1: none)."""
+        column_of = {(p.year, p.quarter): index for index, p in enumerate(self.periods)}
+        year_ago = [column_of.get((p.year - 1, p.quarter), -1) for p in self.periods]
+        quarter_ago = [
+            column_of.get((p.year, p.quarter - 1) if p.quarter > 1 else (p.year - 1, 4), -1)
+            if p.quarter in FISCAL_QUARTERS
+            else -1
+            for p in self.periods
+        ]
+        return np.asarray(year_ago, dtype=int), np.asarray(quarter_ago, dtype=int)
+
+    def _derive(self) -> dict[str, np.ndarray]:
+        series = {name: ratio.compute(self.concept) for name, ratio in RATIO_LIBRARY.items()}
+        if not self.periods:
+            return series
+
+        year_ago, quarter_ago = self._prior_columns()
+        growth_rows = [CONCEPT_ROWS[concept] for concept in GROWTH_CONCEPTS]
+        for suffix, prior in (("yoy", year_ago), ("qoq", quarter_ago)):
+            _, growth = _change(self.values[growth_rows], prior)
+            for concept, row in zip(GROWTH_CONCEPTS, growth, strict=True):
+                series[f"{concept}_growth_{suffix}"] = row
+        margins = np.vstack([series[name] for name in ("operating_margin", "net_margin")])
+        margin_delta, _ = _change(margins, year_ago)
+        series["operating_margin_delta_yoy"], series["net_margin_delta_yoy"] = margin_delta
+        return series
+
+    def summary_table(self, max_periods: int = TABLE_PERIODS) -> str:
+        """Markdown table with one row per metric and one column per recent period."""
+        columns = list(range(len(self.periods)))[-max_periods:]
+        if not columns:
+            return ""
+        header = [f"{self.periods[c].label} ({self.periods[c].form})" for c in columns]
+        lines = [
+            "| Metric | " + " | ".join(header) + " |",
+            "|---" * (len(columns) + 1) + "|",
+        ]
+        for label, name, unit in TABLE_ROWS:
+            row = self.series[name] if name in self.series else self.concept(name)
+            shown = row[columns]
+            if np.isnan(shown).all():
+                continue
+            cells = [_format_cell(float(value), unit) for value in shown]
+            lines.append(f"| {label} | " + " | ".join(cells) + " |")
+        lines.append("Returns use period earnings over period-end balances; not annualised.")
+        return "\n".join(lines)
+
+
+class MetricsCache:
+    """Computed metrics per ticker, keyed by the accessions they were computed from."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, frozenset[str]], FundamentalMetrics] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fundamentals: FundamentalDTO) -> FundamentalMetrics:
+        key = (
+            fundamentals.symbol.upper(),
+            frozenset(entry.access_number for entry in fundamentals.data),
+        )
+        with self._lock:
+            metrics = self._entries.get(key)
+            if metrics is not None:
+                self._entries.move_to_end(key)
+                return metrics
+        metrics = FundamentalMetrics.from_fundamentals(fundamentals)
+        with self._lock:
+            self._entries[key] = metrics
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return metrics
+
+
+metrics_cache = MetricsCache()
@@ -9,10 +9,12 @@ from clients.model_client import ModelClient
 from src.agents.base_agent import BaseAgent
 from src.agents.base_pipeline import BasePipeline, BasePipelineNode
 from src.models.fundamental_analyst import FundamentalAnalystOutput
-from src.models.fundamentals import FinancialReportLineItem
 from src.models.retrieval_agent import RetrievalAgentOutput
+from src.utils.tokenizer import get_tokenizer
 
+from .metrics import FundamentalMetrics, metrics_cache
 from .prompt import format_user_prompt, get_system_prompt
+from .prompt_budget import budget_prompt_sections
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,10 @@ logger = logging.getLogger(__name__)
 @dataclass
 class FundamentalAnalystPipelineState:
     retrieval_output: RetrievalAgentOutput
+    metrics: FundamentalMetrics | None = None
     metrics_summary: str = ""
+    filings_context: str = ""
+    prompt_tokens: int = 0
     analysis: FundamentalAnalystOutput | None = None
     citations: list[str] = field(default_factory=list)
     internal_thought: str = ""
@@ -81,77 +86,14 @@ class CalculateMetricsNode(FundamentalAnalystPipelineNode):
             state.metrics_summary = "No structured financial reports available for calculation."
             return
 
-        summary_lines = []
-        # Sort data by year and quarter to show trends
-        sorted_entries = sorted(reports.data, key=lambda x: (x.year, x.quarter))
+        # Concepts are pivoted once into a concept x period matrix and every metric is
+        # computed across all periods; repeat runs over the same filings reuse the result.
+        # The prompt gets one compact metric x period table rather than a dump per period.
+        state.metrics = metrics_cache.get(reports)
+        state.metrics_summary = state.metrics.summary_table()
 
-        for entry in sorted_entries:
-            period = f"FY{entry.year}Q{entry.quarter}"
-            summary_lines.append(
-                f"--- Period: {period} (Form {entry.form}, Filed {entry.filed_date}) ---"
-            )
-
-            # Helper to find value by common labels/concepts
-            def get_val(items: list[FinancialReportLineItem], *concepts: str) -> float | None:
-                for concept in concepts:
-                    for item in items:
-                        if (
-                            item.concept.lower() == concept.lower()
-                            or item.label.lower() == concept.lower()
-                        ):
-                            return item.value
-                return None
-
-            # Revenue
-            revenue = get_val(
-                entry.income_statement,
-                "Revenues",
-                "RevenueFromContractWithCustomerExcludingAssessedTax",
-                "SalesRevenueNet",
-                "SalesRevenueGoodsNet",
-            )
-            # Net Income
-            net_income = get_val(
-                entry.income_statement,
-                "NetIncomeLoss",
-                "NetIncomeLossAvailableToCommonStockholdersBasic",
-            )
-            # Operating Income
-            op_income = get_val(entry.income_statement, "OperatingIncomeLoss")
-            # Operating Cash Flow
-            ocf = get_val(entry.cash_flow, "NetCashProvidedByUsedInOperatingActivities")
-
-            # Calculate Margins
-            if revenue and revenue != 0:
-                if op_income is not None:
-                    summary_lines.append(f"Operating Margin: {(op_income / revenue) * 100:.2f}%")
-                if net_income is not None:
-                    summary_lines.append(f"Net Margin: {(net_income / revenue) * 100:.2f}%")
-
-            summary_lines.append(f"Revenue: {revenue}")
-            summary_lines.append(f"Net Income: {net_income}")
-            summary_lines.append(f"Operating Cash Flow: {ocf}")
-
-            # Cash Flow Quality
-            if net_income and net_income != 0 and ocf is not None:
-                summary_lines.append(f"OCF / Net Income Ratio: {ocf / net_income:.2f}")
-
-        state.metrics_summary = "\n".join(summary_lines)
-
-        # Add extra context from RAG answer (prose from filing)
-        if state.retrieval_output.answer:
-            summary_lines.append("\n### Filings Context")
-            summary_lines.append(state.retrieval_output.answer)
-
-        # Add news sentiment context
-        if state.retrieval_output.market_news:
-            summary_lines.append("\n### Recent Market News")
-            for item in state.retrieval_output.market_news:
-                summary_lines.append(
-                    f"- {item.title} ({item.source}) - Sentiment: {item.overall_sentiment_label}"
-                )
-
-        state.metrics_summary = "\n".join(summary_lines)
+        # Filing prose and news are kept apart so AnalyzeWithLLMNode can budget each section.
+        state.filings_context = state.retrieval_output.answer or ""
 
         logger.info(
             f"CalculateMetricsNode completed for {state.retrieval_output.edgar_filings.ticker}"
@@ -166,13 +108,32 @@ class AnalyzeWithLLMNode(FundamentalAnalystPipelineNode):
         ticker = state.retrieval_output.edgar_filings.ticker
         company_name = state.retrieval_output.edgar_filings.cik  # cik as fallback
 
+        tokenizer = get_tokenizer()
+        budget = budget_prompt_sections(
+            objectives=state.objectives,
+            metrics=state.metrics,
+            metrics_summary=state.metrics_summary,
+            filings_context=state.filings_context,
+            news=state.retrieval_output.market_news,
+            tokenizer=tokenizer,
+        )
         system_prompt = get_system_prompt()
         user_prompt = format_user_prompt(
             state.retrieval_output.query,
-            state.metrics_summary,
+            budget.metrics_summary(),
             company_name,
             ticker,
-            state.objectives,
+            budget.text("objectives"),
+        )
+        state.prompt_tokens = tokenizer.count(system_prompt) + tokenizer.count(user_prompt)
+        logger.info(
+            "Fundamental prompt for %s: %d tokens (%s)",
+            ticker,
+            state.prompt_tokens,
+            ", ".join(
+                f"{s.name}={s.tokens}/{s.budget}{' truncated' if s.truncated else ''}"
+                for s in budget.sections.values()
+            ),
         )
 
         content = agent.pipeline.model_client.generate_completion(
@@ -183,6 +144,7 @@ class AnalyzeWithLLMNode(FundamentalAnalystPipelineNode):
         try:
             parsed = json.loads(content)
             parsed["ticker"] = ticker
+            parsed["prompt_tokens"] = state.prompt_tokens
             state.analysis = FundamentalAnalystOutput.model_validate(parsed)
             # Add citations from edgar filings
             state.citations = [
@@ -195,6 +157,7 @@ class AnalyzeWithLLMNode(FundamentalAnalystPipelineNode):
                 health_score=0,
                 summary=f"Failed to generate valid analysis: {exc}",
                 citations=[],
+                prompt_tokens=state.prompt_tokens,
             )
 
         logger.info(f"AnalyzeWithLLMNode completed for {ticker}")
@@ -0,0 +1,181 @@
+"""Per-section token budgets for the fundamental analysis prompt."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from src.models.news_sentiments import NewsSentiment
+from src.utils.tokenizer import Tokenizer, get_tokenizer
+
+from .metrics import TABLE_PERIODS, FundamentalMetrics
+
+# Sections in priority order: tokens a section leaves unused go to later sections that overflow.
+SECTION_BUDGETS: dict[str, int] = {
+    "objectives": 250,
+    "metrics": 1200,
+    "filings": 1500,
+    "news": 300,
+}
+SECTION_HEADINGS = {
+    "metrics": "Financial Metrics",
+    "filings": "Filings Context",
+    "news": "Recent Market News",
+}
+# A partial filing block shorter than this is dropped rather than cut mid-thought.
+MIN_PARTIAL_BLOCK_TOKENS = 48
+SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+
+@dataclass
+class BudgetedSection:
+    name: str
+    text: str
+    tokens: int
+    budget: int
+    truncated: bool = False
+
+
+@dataclass
+class PromptBudget:
+    sections: dict[str, BudgetedSection]
+
+    def text(self, name: str) -> str:
+        section = self.sections.get(name)
+        return section.text if section else ""
+
+    @property
+    def tokens(self) -> int:
+        return sum(section.tokens for section in self.sections.values())
+
+    def metrics_summary(self) -> str:
+        """Metrics table plus the filing and news context, under their prompt headings."""
+        parts: list[str] = []
+        for name, heading in SECTION_HEADINGS.items():
+            if text := self.text(name):
+                parts.append(f"### {heading}\n{text}")
+        return "\n\n".join(parts)
+
+
+def _cut_at_sentence(text: str, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """Truncate to `max_tokens`, then back to the last full sentence if one is in range."""
+    cut = tokenizer.truncate(text, max_tokens)
+    if cut == text:
+        return text
+    ends = [match.end() for match in SENTENCE_END.finditer(cut)]
+    if ends and ends[-1] >= len(cut) // 2:
+        return cut[: ends[-1]]
+    return cut.rstrip() + "..."
+
+
+def fit_blocks(text: str, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """
+    Keep blank-line separated blocks in order while they fit.
+
+    Retrieval context arrives best-first, so the block that crosses the budget is cut at a
+    sentence boundary when enough of it fits, and everything after it is dropped.
+    """
+    parts: list[str] = []
+    remaining = max_tokens
+    for block in text.strip().split("\n\n"):
+        cost = tokenizer.count(block) + 1
+        if cost > remaining:
+            if remaining >= MIN_PARTIAL_BLOCK_TOKENS:
+                parts.append(_cut_at_sentence(block, remaining - 1, tokenizer))
+            break
+        parts.append(block)
+        remaining -= cost
+    return "\n\n".join(parts)
+
+
+def fit_lines(lines: list[str], max_tokens: int, tokenizer: Tokenizer, noun: str) -> str:
+    """Keep whole lines in order while they fit, noting how many were left out."""
+    if tokenizer.count("\n".join(lines)) <= max_tokens:
+        return "\n".join(lines)
+    kept: list[str] = []
+    # Room for the omission note, sized for the longest count it could report.
+    remaining = max_tokens - tokenizer.count(f"- ... {len(lines)} more {noun} omitted") - 1
+    for line in lines:
+        cost = tokenizer.count(line) + 1
+        if cost > remaining:
+            break
+        kept.append(line)
+        remaining -= cost
+    if len(kept) < len(lines):
+        kept.append(f"- ... {len(lines) - len(kept)} more {noun} omitted")
+    return "\n".join(kept)
+
+
+def fit_metrics_table(metrics: FundamentalMetrics, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """The metrics table with as many of the most recent periods as fit."""
+    table = ""
+    for periods in range(TABLE_PERIODS, 0, -1):
+        table = metrics.summary_table(max_periods=periods)
+        if tokenizer.count(table) <= max_tokens:
+            return table
+    return fit_lines(table.splitlines(), max_tokens, tokenizer, "metric rows")
+
+
+def news_lines(news: list[NewsSentiment]) -> list[str]:
+    """One line per headline, syndicated duplicates removed."""
+    seen: set[str] = set()
+    lines: list[str] = []
+    for item in news:
+        key = item.title.strip().lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(f"- {item.title} ({item.source}) - Sentiment: {item.overall_sentiment_label}")
+    return lines
+
+
+def budget_prompt_sections(
+    *,
+    objectives: str,
+    metrics: FundamentalMetrics | None,
+    metrics_summary: str,
+    filings_context: str,
+    news: list[NewsSentiment],
+    budgets: dict[str, int] | None = None,
+    tokenizer: Tokenizer | None = None,
+) -> PromptBudget:
+    """
+    Fit each prompt section into its token budget, deterministically.
+
+    Sections within budget are kept verbatim and hand their unused tokens to the sections
+    after them; an overflowing section is reduced by its own rule (fewer table periods,
+    fewer filing blocks, fewer headlines, or a sentence-boundary cut).
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    budgets = budgets or SECTION_BUDGETS
+    headlines = news_lines(news)
+    full_text = {
+        "objectives": objectives.strip(),
+        "metrics": metrics_summary.strip(),
+        "filings": filings_context.strip(),
+        "news": "\n".join(headlines),
+    }
+    fitters = {
+        "objectives": lambda text, limit: _cut_at_sentence(text, limit, tokenizer),
+        "metrics": lambda text, limit: (
+            fit_metrics_table(metrics, limit, tokenizer)
+            if metrics is not None
+            else fit_lines(text.splitlines(), limit, tokenizer, "lines")
+        ),
+        "filings": lambda text, limit: fit_blocks(text, limit, tokenizer),
+        "news": lambda text, limit: fit_lines(headlines, limit, tokenizer, "headlines"),
+    }
+
+    sections: dict[str, BudgetedSection] = {}
+    spare = 0
+    for name, budget in budgets.items():
+        text = full_text.get(name, "")
+        tokens = tokenizer.count(text)
+        limit = budget + spare
+        truncated = tokens > limit
+        if truncated:
+            text = fitters[name](text, limit)
+            tokens = tokenizer.count(text)
+        spare = max(0, limit - tokens)
+        sections[name] = BudgetedSection(name, text, tokens, budget, truncated)
+    return PromptBudget(sections)
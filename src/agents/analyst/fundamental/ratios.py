@@ -0,0 +1,98 @@
+"""Financial ratios computed column-wise over a concept x period matrix."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Literal
+
+import numpy as np
+
+# Returns a concept's row across all periods (NaN where not reported).
+ConceptRow = Callable[[str], np.ndarray]
+RatioUnit = Literal["amount", "percent", "multiple"]
+
+# Statutory US rate, used for NOPAT when a period reports no usable effective tax rate.
+DEFAULT_TAX_RATE = 0.21
+
+
+def safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    valid = np.isfinite(numerator) & np.isfinite(denominator) & (denominator != 0)
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=valid)
+
+
+def nan_sum(*rows: np.ndarray) -> np.ndarray:
+    """Element-wise sum treating NaN as 0, but NaN where every row is missing."""
+    stacked = np.vstack(rows)
+    return np.where(np.isnan(stacked).all(axis=0), np.nan, np.nansum(stacked, axis=0))
+
+
+def total_debt(concept: ConceptRow) -> np.ndarray:
+    return nan_sum(concept("long_term_debt"), concept("short_term_debt"))
+
+
+def free_cash_flow(concept: ConceptRow) -> np.ndarray:
+    """Operating cash flow less capex; NaN where capex is not reported."""
+    return concept("operating_cash_flow") - concept("capital_expenditure")
+
+
+def effective_tax_rate(concept: ConceptRow) -> np.ndarray:
+    rate = safe_divide(concept("income_tax"), concept("pretax_income"))
+    usable = np.isfinite(rate) & (rate >= 0) & (rate <= 1)
+    return np.where(usable, rate, DEFAULT_TAX_RATE)
+
+
+def roic(concept: ConceptRow) -> np.ndarray:
+    """NOPAT over invested capital (debt + equity - cash)."""
+    nopat = concept("operating_income") * (1 - effective_tax_rate(concept))
+    invested = total_debt(concept) + concept("equity") - np.nan_to_num(concept("cash"))
+    return safe_divide(nopat, np.where(invested > 0, invested, np.nan))
+
+
+def _ratio(numerator: str, denominator: str) -> Callable[[ConceptRow], np.ndarray]:
+    return lambda concept: safe_divide(concept(numerator), concept(denominator))
+
+
+@dataclass(frozen=True)
+class Ratio:
+    label: str
+    unit: RatioUnit
+    compute: Callable[[ConceptRow], np.ndarray]
+
+
+# Returns use the period's earnings over period-end balances; quarters are not annualised.
+RATIO_LIBRARY: dict[str, Ratio] = {
+    "gross_margin": Ratio("Gross Margin", "percent", _ratio("gross_profit", "revenue")),
+    "operating_margin": Ratio("Operating Margin", "percent", _ratio("operating_income", "revenue")),
+    "net_margin": Ratio("Net Margin", "percent", _ratio("net_income", "revenue")),
+    "free_cash_flow": Ratio("Free Cash Flow", "amount", free_cash_flow),
+    "fcf_margin": Ratio(
+        "FCF Margin",
+        "percent",
+        lambda concept: safe_divide(free_cash_flow(concept), concept("revenue")),
+    ),
+    "ocf_to_net_income": Ratio(
+        "OCF / Net Income", "multiple", _ratio("operating_cash_flow", "net_income")
+    ),
+    "current_ratio": Ratio(
+        "Current Ratio", "multiple", _ratio("current_assets", "current_liabilities")
+    ),
+    "quick_ratio": Ratio(
+        "Quick Ratio",
+        "multiple",
+        lambda concept: safe_divide(
+            concept("current_assets") - np.nan_to_num(concept("inventory")),
+            concept("current_liabilities"),
+        ),
+    ),
+    "debt_to_equity": Ratio(
+        "Debt / Equity",
+        "multiple",
+        lambda concept: safe_divide(total_debt(concept), concept("equity")),
+    ),
+    "interest_coverage": Ratio(
+        "Interest Coverage", "multiple", _ratio("operating_income", "interest_expense")
+    ),
+    "roe": Ratio("ROE", "percent", _ratio("net_income", "equity")),
+    "roic": Ratio("ROIC", "percent", roic),
+}
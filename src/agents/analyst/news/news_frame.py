@@ -0,0 +1,178 @@
+"""Columnar view of news articles: normalised once, aggregated with NumPy."""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+import numpy as np
+
+from src.models.news_sentiments import NewsSentiment
+
+# Alpha Vantage publishes timestamps as 20240124T123205.
+COMPACT_TIMESTAMP_LENGTH = 15
+HALF_LIFE_HOURS = 24.0
+DECAY_PER_HOUR = math.log(2) / HALF_LIFE_HOURS
+
+
+def _to_float(value: float | str) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _published_epoch(value: str) -> float:
+    """Seconds since the epoch (UTC), NaN when the timestamp cannot be read."""
+    try:
+        if len(value) == COMPACT_TIMESTAMP_LENGTH and value[8] == "T":
+            published = datetime(
+                int(value[:4]),
+                int(value[4:6]),
+                int(value[6:8]),
+                int(value[9:11]),
+                int(value[11:13]),
+                int(value[13:15]),
+                tzinfo=UTC,
+            )
+        else:
+            published = datetime.fromisoformat(value).replace(tzinfo=UTC)
+    except (ValueError, TypeError):
+        return math.nan
+    return published.timestamp()
+
+
+@dataclass
+class NewsFrame:
+    """
+    Deduplicated articles as typed columns, with ticker mentions in long format.
+
+    Article columns (`titles`, `published`, `sentiment`) are aligned by article index;
+    mention columns (`mention_article`, `mention_ticker`, `relevance`, `ticker_sentiment`)
+    hold one row per (article, ticker) pair, with tickers encoded as indexes into `tickers`.
+    """
+
+    titles: list[str]
+    published: np.ndarray
+    sentiment: np.ndarray
+    tickers: list[str]
+    mention_article: np.ndarray
+    mention_ticker: np.ndarray
+    relevance: np.ndarray
+    ticker_sentiment: np.ndarray
+    duplicates: int = 0
+    invalid_timestamps: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @classmethod
+    def from_articles(cls, articles: list[NewsSentiment]) -> NewsFrame:
+        """Drop repeated headlines and convert every field once; the only per-article loop."""
+        seen_titles: set[str] = set()
+        titles: list[str] = []
+        published: list[float] = []
+        sentiment: list[float] = []
+        ticker_codes: dict[str, int] = {}
+        mention_article: list[int] = []
+        mention_ticker: list[int] = []
+        relevance: list[float] = []
+        ticker_sentiment: list[float] = []
+        for item in articles:
+            norm_title = re.sub(r"\W+", "", item.title.lower())
+            if norm_title in seen_titles:
+                continue
+            seen_titles.add(norm_title)
+            article = len(titles)
+            titles.append(item.title)
+            published.append(_published_epoch(item.time_published))
+            sentiment.append(_to_float(item.overall_sentiment_score))
+            for ts in item.ticker_sentiment:
+                mention_article.append(article)
+                mention_ticker.append(ticker_codes.setdefault(ts.ticker, len(ticker_codes)))
+                relevance.append(_to_float(ts.relevance_score))
+                ticker_sentiment.append(_to_float(ts.ticker_sentiment_score))
+
+        published_arr = np.asarray(published, dtype=float)
+        return cls(
+            titles=titles,
+            published=published_arr,
+            sentiment=np.asarray(sentiment, dtype=float),
+            tickers=list(ticker_codes),
+            mention_article=np.asarray(mention_article, dtype=np.intp),
+            mention_ticker=np.asarray(mention_ticker, dtype=np.intp),
+            relevance=np.asarray(relevance, dtype=float),
+            ticker_sentiment=np.asarray(ticker_sentiment, dtype=float),
+            duplicates=len(articles) - len(titles),
+            invalid_timestamps=[
+                title for title, ts in zip(titles, published_arr, strict=True) if np.isnan(ts)
+            ],
+        )
+
+    def recency_weights(self, now: datetime) -> np.ndarray:
+        """Exponential decay by article age; unreadable timestamps count as just published."""
+        age_hours = (now.timestamp() - self.published) / 3600.0
+        return np.exp(-DECAY_PER_HOUR * np.nan_to_num(age_hours, nan=0.0))
+
+
+@dataclass
+class TickerAggregates:
+    """Per-ticker sums over relevant mentions, aligned with `NewsFrame.tickers`."""
+
+    score: np.ndarray
+    mean_weight: np.ndarray
+    mentions: np.ndarray
+    top_articles: list[list[int]]
+
+
+def aggregate_tickers(
+    frame: NewsFrame, weights: np.ndarray, *, min_relevance: float, top_n: int
+) -> TickerAggregates:
+    """
+    Relevance x recency weighted sentiment for every ticker in one pass.
+
+    Mentions at or below `min_relevance` are ignored; `top_articles` lists each ticker's
+    `top_n` heaviest articles, ties kept in article order.
+    """
+    relevant = frame.relevance > min_relevance
+    articles = frame.mention_article[relevant]
+    tickers = frame.mention_ticker[relevant]
+    mention_weight = frame.relevance[relevant] * weights[articles]
+    count = len(frame.tickers)
+
+    weight_sum = np.bincount(tickers, weights=mention_weight, minlength=count)
+    weighted_score = np.bincount(
+        tickers, weights=frame.ticker_sentiment[relevant] * mention_weight, minlength=count
+    )
+    mentions = np.bincount(tickers, minlength=count)
+    score = np.divide(weighted_score, weight_sum, out=np.zeros(count), where=weight_sum > 0)
+    mean_weight = np.divide(weight_sum, mentions, out=np.zeros(count), where=mentions > 0)
+
+    # Group mentions by ticker, heaviest first; rank within each group.
+    order = np.lexsort((-mention_weight, tickers))
+    grouped = tickers[order]
+    starts = np.searchsorted(grouped, grouped, side="left")
+    keep = order[np.arange(len(order)) - starts < top_n]
+    top_articles: list[list[int]] = [[] for _ in range(count)]
+    for ticker, article in zip(tickers[keep], articles[keep], strict=True):
+        top_articles[ticker].append(int(article))
+    return TickerAggregates(
+        score=score, mean_weight=mean_weight, mentions=mentions, top_articles=top_articles
+    )
+
+
+def target_sentiment(
+    frame: NewsFrame, weights: np.ndarray, ticker: str, *, min_relevance: float
+) -> float:
+    """Recency-weighted overall sentiment of the articles highly relevant to `ticker`."""
+    if ticker not in frame.tickers:
+        return 0.0
+    code = frame.tickers.index(ticker)
+    mask = (frame.mention_ticker == code) & (frame.relevance > min_relevance)
+    articles = np.unique(frame.mention_article[mask])
+    total_weight = weights[articles].sum()
+    if total_weight <= 0:
+        return 0.0
+    return float((frame.sentiment[articles] * weights[articles]).sum() / total_weight)
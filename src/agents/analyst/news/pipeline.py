@@ -1,17 +1,19 @@
 from __future__ import annotations
 
 import logging
-import math
 import re
 from dataclasses import dataclass, field
 from datetime import UTC, datetime
 
+import numpy as np
+
 from clients.model_client import ModelClient
 from src.agents.base_agent import BaseAgent
 from src.agents.base_pipeline import BasePipeline, BasePipelineNode
 from src.models.news_analyst import NewsAnalystOutput, NewsTickerRollup
 from src.models.retrieval_agent import RetrievalAgentOutput
 
+from .news_frame import NewsFrame, aggregate_tickers, target_sentiment
 from .prompt import format_synthesis_prompt
 
 logger = logging.getLogger(__name__)
@@ -19,6 +21,18 @@ logger = logging.getLogger(__name__)
 RELEVANCE_THRESHOLD = 0.8
 BULLISH_THRESHOLD = 0.25
 BEARISH_THRESHOLD = -0.25
+TOP_HEADLINES = 3
+# Rollups shown to the synthesis prompt; the full set is still returned in the output.
+MAX_PROMPT_ROLLUPS = 10
+MAX_PROMPT_HEADLINES = 5
+
+
+def _sentiment_label(score: float) -> str:
+    if score >= BULLISH_THRESHOLD:
+        return "bullish"
+    if score <= BEARISH_THRESHOLD:
+        return "bearish"
+    return "neutral"
 
 
 @dataclass
@@ -85,119 +99,45 @@ class AggregationNode(NewsAnalystPipelineNode):
             state.warnings.append("No market news items available for analysis.")
             return
 
-        # 1. Deduplication (by normalized title)
-        seen_titles = set()
-        unique_news = []
-        for item in news_items:
-            norm_title = re.sub(r"\W+", "", item.title.lower())
-            if norm_title in seen_titles:
-                continue
-            seen_titles.add(norm_title)
-            unique_news.append(item)
+        # Articles are deduplicated and normalised into typed columns once; scoring below is
+        # array arithmetic over all articles and tickers, so it scales with news_limit.
+        frame = NewsFrame.from_articles(news_items)
+        if frame.duplicates:
+            state.warnings.append(f"Deduplicated {frame.duplicates} articles.")
+        state.warnings.extend(
+            f"Invalid timestamp for article: {title}" for title in frame.invalid_timestamps
+        )
 
-        if len(unique_news) < len(news_items):
-            state.warnings.append(f"Deduplicated {len(news_items) - len(unique_news)} articles.")
+        weights = frame.recency_weights(datetime.now(UTC))
 
-        # 2. Score Calculation with Exponential Decay
+        # Overall score: only articles highly relevant to the target ticker contribute.
         target_ticker = state.retrieval_output.edgar_filings.ticker
-        now = datetime.now(UTC)
-        total_weighted_score = 0.0
-        total_weight = 0.0
-
-        ticker_data = {}  # ticker -> list of (weighted_score, weight, headline)
-
-        for item in unique_news:
-            try:
-                # Alpha Vantage format: 20240124T123205
-                pub_date = datetime.strptime(item.time_published, "%Y%m%dT%H%M%S").replace(
-                    tzinfo=UTC
-                )
-            except ValueError:
-                try:
-                    pub_date = datetime.fromisoformat(item.time_published).replace(tzinfo=UTC)
-                except Exception:
-                    state.warnings.append(f"Invalid timestamp for article: {item.title}")
-                    pub_date = now
-
-            delta_hours = (now - pub_date).total_seconds() / 3600.0
-            decay_lambda = math.log(2) / 24.0
-            recency_weight = math.exp(-decay_lambda * delta_hours)
-
-            # Ticker rollups - only care about the target ticker if highly relevant (> 0.8)
-            item_is_relevant_to_target = False
-            for ts in item.ticker_sentiment:
-                ticker = ts.ticker
-                if ticker != target_ticker:
-                    continue
-
-                try:
-                    rel_score = float(ts.relevance_score)
-                    ts_score = float(ts.ticker_sentiment_score)
-                except (ValueError, TypeError):
-                    rel_score = 0.0
-                    ts_score = 0.0
-                if rel_score > RELEVANCE_THRESHOLD:
-                    item_is_relevant_to_target = True
-                    if ticker not in ticker_data:
-                        ticker_data[ticker] = []
-
-                    # Weight by ticker-specific relevance AND recency
-                    t_weight = rel_score * recency_weight
-                    ticker_data[ticker].append((ts_score * t_weight, t_weight, item.title))
-
-            # Only contribute to overall score if the article is highly relevant to the target ticker
-            if item_is_relevant_to_target:
-                try:
-                    score = float(item.overall_sentiment_score)
-                except (ValueError, TypeError):
-                    score = 0.0
-
-                weighted_score = score * recency_weight
-                total_weighted_score += weighted_score
-                total_weight += recency_weight
-
-        # Final overall calculation
-        if total_weight > 0:
-            state.overall_score = total_weighted_score / total_weight
-        else:
-            state.overall_score = 0.0
-
-        # Mapping thresholds
-        if state.overall_score >= BULLISH_THRESHOLD:
-            state.overall_label = "bullish"
-        elif state.overall_score <= BEARISH_THRESHOLD:
-            state.overall_label = "bearish"
-        else:
-            state.overall_label = "neutral"
-
-        # Ticker rollups finalization
-        for ticker, signals in ticker_data.items():
-            t_weighted_sum = sum(s[0] for s in signals)
-            t_weight_sum = sum(s[1] for s in signals)
-            t_score = t_weighted_sum / t_weight_sum if t_weight_sum > 0 else 0.0
-
-            if t_score >= BULLISH_THRESHOLD:
-                t_label = "bullish"
-            elif t_score <= BEARISH_THRESHOLD:
-                t_label = "bearish"
-            else:
-                t_label = "neutral"
-
-            # Get top headlines for this ticker (weighted by relevance * recency)
-            sorted_signals = sorted(signals, key=lambda x: x[1], reverse=True)
-            top_h = [s[2] for s in sorted_signals[:3]]
-
-            t_avg_weight = t_weight_sum / len(signals) if signals else 0.0
+        state.overall_score = target_sentiment(
+            frame, weights, target_ticker, min_relevance=RELEVANCE_THRESHOLD
+        )
+        state.overall_label = _sentiment_label(state.overall_score)
 
+        # Rollups for every ticker mentioned with high relevance, weighted by relevance * recency.
+        aggregates = aggregate_tickers(
+            frame, weights, min_relevance=RELEVANCE_THRESHOLD, top_n=TOP_HEADLINES
+        )
+        for code in np.flatnonzero(aggregates.mentions):
+            ticker = frame.tickers[code]
+            score = float(aggregates.score[code])
             state.ticker_rollups[ticker] = NewsTickerRollup(
                 ticker=ticker,
-                sentiment_score=round(t_score, 4),
-                sentiment_label=t_label,
-                relevance_score=round(t_avg_weight, 4),
-                top_headlines=top_h,
+                sentiment_score=round(score, 4),
+                sentiment_label=_sentiment_label(score),
+                relevance_score=round(float(aggregates.mean_weight[code]), 4),
+                top_headlines=[frame.titles[article] for article in aggregates.top_articles[code]],
             )
 
-        logger.info(f"AggregationNode completed. Overall score: {state.overall_score:.4f}")
+        logger.info(
+            "AggregationNode completed over %d articles and %d tickers. Overall score: %.4f",
+            len(frame),
+            len(state.ticker_rollups),
+            state.overall_score,
+        )
 
 
 class SynthesisNode(NewsAnalystPipelineNode):
@@ -205,26 +145,27 @@ class SynthesisNode(NewsAnalystPipelineNode):
         if not isinstance(agent.pipeline, NewsAnalystPipeline):
             raise RuntimeError("SynthesisNode must be run within a NewsAnalystPipeline")
 
-        # Top 5 headlines overall (by recency weight)
-        # We didn't store overall weights in state, so we just pick from unique_news if we had them or just use ticker data
-        # Let's just use ticker rollups for the prompt context
+        # Rollups now cover every mentioned ticker, so the prompt gets the target ticker first
+        # and then the most heavily covered ones.
+        target_ticker = state.retrieval_output.edgar_filings.ticker
+        rollups = sorted(
+            state.ticker_rollups.values(),
+            key=lambda r: (r.ticker != target_ticker, -r.relevance_score, r.ticker),
+        )[:MAX_PROMPT_ROLLUPS]
         ticker_summaries = "\n".join(
-            [
-                f"- {t}: {r.sentiment_label} (score: {r.sentiment_score})"
-                for t, r in state.ticker_rollups.items()
-            ]
+            [f"- {r.ticker}: {r.sentiment_label} (score: {r.sentiment_score})" for r in rollups]
         )
 
-        # Collect top headlines from all rollups for synthesis
-        all_top_headlines = set()
-        for r in state.ticker_rollups.values():
-            all_top_headlines.update(r.top_headlines)
+        # Top headlines across the shown rollups, in rollup order
+        top_headlines = list(
+            dict.fromkeys(headline for r in rollups for headline in r.top_headlines)
+        )
 
         prompt = format_synthesis_prompt(
             state.retrieval_output.query,
             state.overall_score,
             state.overall_label,
-            list(all_top_headlines)[:5],
+            top_headlines[:MAX_PROMPT_HEADLINES],
             ticker_summaries,
         )
 
@@ -6,12 +6,14 @@ from typing import Any
 
 from pydantic import ValidationError
 
+from src.agent_tools.edgar.filing_segmenter import infer_section_topics
 from src.agents.base_agent import BaseAgent
 from src.agents.base_pipeline import BasePipeline, BasePipelineNode
 from src.models.fundamentals import FundamentalDTO
 from src.models.news_sentiments import NewsSentiment
 from src.models.rag_retrieve import (
     FinancialStatementOutput,
+    FinancialStatementsOutput,
     RAGRetrieveInput,
     SearchReportsInput,
     SearchReportsOutput,
@@ -23,6 +25,14 @@ from .exceptions import ToolExecutionError
 
 logger = logging.getLogger(__name__)
 
+STATEMENT_TYPES = ("income_statement", "balance_sheet", "cash_flow_statement")
+# Searched alongside the user's query, in the same Chroma round-trip, for broader coverage.
+RETRIEVAL_SUB_QUERIES = (
+    "{ticker} risk factors and uncertainties",
+    "{ticker} management guidance and outlook",
+    "{ticker} segment revenue and operating performance",
+)
+
 
 @dataclass
 class RetrievalPipelineState:
@@ -40,6 +50,7 @@ class RetrievalPipelineState:
     news_items: list[NewsSentiment] = field(default_factory=list)
     rag_answer: str = ""
     financial_statement: FinancialStatementOutput | None = None
+    financial_statements: FinancialStatementsOutput | None = None
     financial_reports: FundamentalDTO | None = None
     edgar_filings: SearchReportsOutput = field(init=False)
 
@@ -113,20 +124,35 @@ class UpsertFilingsNode(RetrievalPipelineNode):
 
 class RetrieveReportNode(RetrievalPipelineNode):
     async def run(self, agent: BaseAgent, state: RetrievalPipelineState) -> None:
-        retrieve_filters: dict[str, Any] = {"ticker": state.edgar_filings.ticker.upper()}
+        ticker = state.edgar_filings.ticker.upper()
+        retrieve_filters: dict[str, Any] = {"ticker": ticker}
+        sub_queries = [template.format(ticker=ticker) for template in RETRIEVAL_SUB_QUERIES]
+        # Questions with a recognisable intent search only the sections that answer them,
+        # widened to the sections the sub-queries target; anything else searches whole filings.
+        sections = None
+        if infer_section_topics(state.query):
+            sections = infer_section_topics(state.query, *sub_queries)
         logger.info(
             "starting retrieve_report",
-            extra={"query": state.query, "filters": retrieve_filters, "top_k": state.top_k},
+            extra={
+                "query": state.query,
+                "filters": retrieve_filters,
+                "sections": sections,
+                "top_k": state.top_k,
+            },
         )
         try:
             payload = RAGRetrieveInput(
                 query=state.query,
+                sub_queries=sub_queries,
+                sections=sections,
                 collection=state.collection_name,
                 domain="edgar",
                 corpus="analyst_report",
                 company_name=state.company_name,
                 top_k=state.top_k,
                 filters=retrieve_filters,
+                retrieval_mode="hybrid",
             ).model_dump()
             raw_retrieve, metadata = await agent._call_tool_with_metadata(
                 McpConfig.rag_mcp_url, "retrieve_report", payload
@@ -187,32 +213,35 @@ class ExtractFinancialStatementNode(RetrievalPipelineNode):
     async def run(self, agent: BaseAgent, state: RetrievalPipelineState) -> None:
         if not state.edgar_filings.filings:
             return
+        filing = state.edgar_filings.filings[0]
         statement_payload = {
-            "accession_number": state.edgar_filings.filings[0].accession_number,
-            "statement_type": "income_statement",
+            "accession_number": filing.accession_number,
+            "statement_types": list(STATEMENT_TYPES),
+            "ticker": filing.metadata.ticker,
         }
         try:
-            raw_statement, metadata = await agent._call_tool_with_metadata(
+            raw_statements, metadata = await agent._call_tool_with_metadata(
                 McpConfig.rag_mcp_url,
-                "extract_financial_statement",
+                "extract_financial_statements",
                 statement_payload,
             )
             state.metadata.financial_statement = metadata
-            state.financial_statement = FinancialStatementOutput.model_validate(raw_statement)
+            state.financial_statements = FinancialStatementsOutput.model_validate(raw_statements)
+            state.financial_statement = state.financial_statements.get("income_statement")
             logger.info(
-                "extract_financial_statement completed",
+                "extract_financial_statements completed",
                 extra={
                     "accession_number": statement_payload["accession_number"],
-                    "statement_type": statement_payload["statement_type"],
+                    "chunk_counts": state.financial_statements.chunk_counts,
                 },
             )
         except ToolExecutionError as exc:
             state.metadata.financial_statement = exc.metadata
-            state.warnings.append(f"extract_financial_statement failed: {exc}")
+            state.warnings.append(f"extract_financial_statements failed: {exc}")
             state.status = "partial"
         except ValidationError as exc:
             state.status = "partial"
-            state.warnings.append(f"extract_financial_statement output invalid: {exc}")
+            state.warnings.append(f"extract_financial_statements output invalid: {exc}")
 
 
 class GetFinancialReportsNode(RetrievalPipelineNode):
@@ -17,14 +17,21 @@ from src.agents.retrieval.pipeline import (
     SearchReportsNode,
     UpsertFilingsNode,
 )
+from src.models.edgar_ingestion import IngestionJobsOutput, IngestionJobStatus, IngestionPlan
 from src.models.fundamentals import FundamentalDTO
 from src.models.news_sentiments import NewsSentiment
-from src.models.rag_retrieve import FilingResult, FinancialStatementOutput, SearchReportsOutput
+from src.models.rag_retrieve import (
+    FilingResult,
+    FinancialStatementOutput,
+    FinancialStatementsOutput,
+    SearchReportsOutput,
+)
 from src.models.retrieval_agent import (
     RetrievalAgentMetadata,
     RetrievalAgentOutput,
     RetrievalAgentToolMetadata,
 )
+from src.utils.edgar_config import EdgarConfig
 from src.utils.mcp_config import McpConfig
 
 logger = logging.getLogger(__name__)
@@ -98,6 +105,7 @@ class AnalystRetrievalAgent(BaseAgent):
             metadata=state.metadata,
             warnings=state.warnings,
             financial_statement=state.financial_statement,
+            financial_statements=state.financial_statements,
             financial_reports=state.financial_reports,
         )
 
@@ -151,24 +159,94 @@ class AnalystRetrievalAgent(BaseAgent):
             return content[0]
         return result
 
+    async def _filings_to_ingest(
+        self, filings: list[FilingResult]
+    ) -> tuple[list[FilingResult], list[str]]:
+        """
+        Split filings into those still to ingest and accessions being ingested elsewhere.
+
+        Filings the ingestion manifest already covers are dropped; if the plan cannot be
+        fetched every filing is ingested.
+        """
+        if not filings:
+            return filings, []
+        try:
+            raw_plan = await self.call_mcp_tool(
+                McpConfig.rag_mcp_url,
+                "plan_edgar_ingestion",
+                {"accession_numbers": [filing.accession_number for filing in filings]},
+            )
+            plan = IngestionPlan.model_validate(self._extract_tool_result(raw_plan))
+        except Exception as exc:
+            logger.warning("plan_edgar_ingestion failed, upserting every filing: %s", exc)
+            return filings, []
+        to_ingest = set(plan.to_ingest)
+        logger.info(
+            "plan_edgar_ingestion completed",
+            extra={
+                "to_ingest": len(to_ingest),
+                "in_progress": len(plan.in_progress),
+                "ingested": len(plan.ingested),
+            },
+        )
+        return (
+            [filing for filing in filings if filing.accession_number in to_ingest],
+            plan.in_progress,
+        )
+
     async def _upsert_filings(self, filings: list[FilingResult]) -> RetrievalAgentToolMetadata:
+        """
+        Queue filings for background ingestion and wait at most the configured budget.
+
+        Filings another workflow is already ingesting are waited on within the same budget.
+        Filings still ingesting when the budget runs out are reported as warnings; retrieval
+        then proceeds against whatever is already indexed.
+        """
         start_time = datetime.now(UTC).isoformat()
         start_monotonic = time.monotonic()
         warnings: list[str] = []
-        for filing in filings:
-            metadata_dict = filing.metadata.model_dump()
+        filings, in_progress = await self._filings_to_ingest(filings)
+        if filings or in_progress:
             try:
-                await self.call_mcp_tool(
+                if filings:
+                    await self.call_mcp_tool(
+                        McpConfig.rag_mcp_url,
+                        "enqueue_edgar_reports",
+                        {
+                            "filings": [
+                                {"href": filing.href, "metadata": filing.metadata.model_dump()}
+                                for filing in filings
+                            ]
+                        },
+                    )
+                raw_jobs = await self.call_mcp_tool(
                     McpConfig.rag_mcp_url,
-                    "upsert_edgar_report",
-                    {"href": filing.href, "metadata": metadata_dict},
+                    "get_ingestion_jobs",
+                    {
+                        "accession_numbers": [
+                            *(filing.accession_number for filing in filings),
+                            *in_progress,
+                        ],
+                        "wait_seconds": EdgarConfig.INGESTION_WAIT_BUDGET_SECONDS,
+                    },
                 )
+                jobs = IngestionJobsOutput.model_validate(self._extract_tool_result(raw_jobs))
+                for job in jobs.jobs:
+                    if job.status == IngestionJobStatus.FAILED:
+                        warnings.append(f"ingestion failed for {job.accession_number}: {job.error}")
+                # In-progress ingests outside the queue (direct upserts) cannot be waited on.
+                unfinished = [*jobs.unfinished, *(a for a in jobs.unknown if a in in_progress)]
+                if unfinished:
+                    warnings.append(
+                        f"ingestion still running for {', '.join(unfinished)}; "
+                        "retrieval used already indexed filings only"
+                    )
             except Exception as exc:
-                warnings.append(f"upsert failed for {metadata_dict.get('accession_number')}: {exc}")
+                warnings.append(f"enqueue_edgar_reports failed: {exc}")
         end_time = datetime.now(UTC).isoformat()
         duration_ms = int((time.monotonic() - start_monotonic) * 1000)
         return RetrievalAgentToolMetadata(
-            tool="upsert_edgar_report",
+            tool="enqueue_edgar_reports",
             start_time=start_time,
             end_time=end_time,
             duration_ms=duration_ms,
@@ -187,6 +265,7 @@ class AnalystRetrievalAgent(BaseAgent):
         warnings: list[str],
         financial_statement: FinancialStatementOutput | None,
         financial_reports: FundamentalDTO | None,
+        financial_statements: FinancialStatementsOutput | None = None,
     ) -> RetrievalAgentOutput:
         metadata.warnings = warnings
         return RetrievalAgentOutput(
@@ -197,5 +276,6 @@ class AnalystRetrievalAgent(BaseAgent):
             market_news=market_news,
             metadata=metadata,
             financial_statement=financial_statement,
+            financial_statements=financial_statements,
             financial_reports=financial_reports,
         )
@@ -1,4 +1,7 @@
 import os
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+from typing import Any
 
 from fastapi.middleware import Middleware
 from fastmcp import FastMCP
@@ -7,8 +10,12 @@ from starlette.middleware.cors import CORSMiddleware
 
 class McpServerFactory:
     @staticmethod
-    def create_mcp_server(mcp_name: str, middleware: list[Middleware] | None = None) -> FastMCP:
-        mcp = FastMCP(mcp_name, middleware=middleware)
+    def create_mcp_server(
+        mcp_name: str,
+        middleware: list[Middleware] | None = None,
+        lifespan: Callable[[FastMCP], AbstractAsyncContextManager[Any]] | None = None,
+    ) -> FastMCP:
+        mcp = FastMCP(mcp_name, middleware=middleware, lifespan=lifespan)
         return mcp
 
     def _create_local_mcp_cors_middleware(self) -> Middleware:
@@ -16,17 +16,17 @@ logger = logging.getLogger(__name__)
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from clients.chroma_client import ChromaClient
+from clients.chroma_client import chroma_client
+from clients.embedding_registry import embedding_registry
+from src.agent_tools.rag.pdf_upload_jobs import pdf_upload_jobs
 from src.routes.rag_route import router as rag_router
 from src.routes.workflow_route import router as workflow_router
 
-chroma_client = ChromaClient()
-
 
 async def _check_chromadb() -> bool:
     try:
-        client = chroma_client.get_client()
-        await asyncio.to_thread(client.heartbeat)
+        client = await chroma_client.get_async_client()
+        await client.heartbeat()
         return True
     except Exception as exc:
         logger.warning("ChromaDB heartbeat failed", exc_info=exc)
@@ -46,7 +46,14 @@ async def lifespan(app: FastAPI):
     else:
         raise RuntimeError("ChromaDB did not become ready during startup")
 
-    yield
+    await asyncio.to_thread(embedding_registry.warm)
+    # Resume PDF uploads a previous run left queued or running.
+    pdf_upload_jobs.start()
+
+    try:
+        yield
+    finally:
+        await pdf_upload_jobs.stop()
 
 
 app = FastAPI(
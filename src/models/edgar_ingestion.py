@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from datetime import datetime
+from enum import StrEnum
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+
+class IngestionStatus(StrEnum):
+    INGESTING = "ingesting"
+    INGESTED = "ingested"
+    FAILED = "failed"
+
+
+class IngestionManifestEntry(BaseModel):
+    accession_number: str
+    status: IngestionStatus
+    collection_name: str
+    chunk_count: int = 0
+    reused_embeddings: int = Field(
+        0, description="Chunks whose embedding came from a duplicate or an earlier filing."
+    )
+    embed_model: str | None = Field(
+        None, description="Embedding model, plus the reduction spec when vectors are reduced."
+    )
+    stored_collection: str | None = Field(
+        None, description="Physical Chroma collection (shard) holding the chunks."
+    )
+    ticker: str | None = None
+    ingested_at: datetime | None = None
+    updated_at: datetime
+    error: str | None = None
+
+
+class IngestionPlan(BaseModel):
+    """Partition of a batch of accessions by what the ingestion path still has to do."""
+
+    pending: list[str] = Field(
+        default_factory=list, description="Accessions with no manifest entry."
+    )
+    partial: list[str] = Field(
+        default_factory=list,
+        description="Accessions whose last ingest failed or stalled; chunks must be repaired.",
+    )
+    in_progress: list[str] = Field(
+        default_factory=list, description="Accessions currently being ingested elsewhere."
+    )
+    ingested: list[str] = Field(
+        default_factory=list, description="Accessions fully ingested; nothing to do."
+    )
+
+    @property
+    def to_ingest(self) -> list[str]:
+        return [*self.pending, *self.partial]
+
+
+class IngestionJobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class IngestionRequest(BaseModel):
+    href: str = Field(..., description="Full SEC filing document URL.")
+    metadata: dict[str, Any] = Field(
+        ..., description="Normalized filing metadata; must include `accession_number`."
+    )
+
+
+class IngestionJob(BaseModel):
+    accession_number: str
+    href: str
+    collection_name: str
+    metadata: dict[str, Any] = Field(default_factory=dict)
+    status: IngestionJobStatus = IngestionJobStatus.QUEUED
+    attempts: int = 0
+    enqueued_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in {IngestionJobStatus.SUCCEEDED, IngestionJobStatus.FAILED}
+
+
+class IngestionJobsOutput(BaseModel):
+    jobs: list[IngestionJob] = Field(default_factory=list)
+    unknown: list[str] = Field(
+        default_factory=list, description="Requested accessions with no ingestion job."
+    )
+
+    @property
+    def unfinished(self) -> list[str]:
+        return [job.accession_number for job in self.jobs if not job.is_finished]
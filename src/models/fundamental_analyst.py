@@ -20,3 +20,6 @@ class FundamentalAnalystOutput(BaseModel):
         default_factory=list, description="Accession numbers or links to EDGAR filings"
     )
     reasoning: str | None = None
+    prompt_tokens: int | None = Field(
+        default=None, description="Tokens in the analysis prompt after section budgeting"
+    )
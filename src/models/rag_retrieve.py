@@ -3,9 +3,28 @@ from typing import Any, Literal
 from openai import BaseModel
 from pydantic import Field
 
+SectionTopic = Literal[
+    "business",
+    "risk_factors",
+    "mdna",
+    "market_risk",
+    "financial_statements",
+    "legal_proceedings",
+    "controls",
+]
+
 
 class RAGRetrieveInput(BaseModel):
     query: str = Field(..., description="Natural-language query to search for.")
+    sub_queries: list[str] = Field(
+        default_factory=list,
+        max_length=8,
+        description=(
+            "Extra queries searched alongside `query`, e.g. risks, guidance or segment "
+            "performance. All queries are embedded in one batch and sent as one Chroma query; "
+            "their rankings are fused with reciprocal rank fusion."
+        ),
+    )
     collection: str | None = Field(
         None,
         description=(
@@ -34,12 +53,40 @@ class RAGRetrieveInput(BaseModel):
     document_contains: str | None = Field(
         None,
         description=(
-            "Optional substring filter applied to document text via Chroma `where_document`."
+            "Optional phrase filter on document text. A phrase of plain words is resolved from "
+            "the local full-text index when it covers the filter scope, matching whole words "
+            "case-insensitively (so 'Impairments' matches 'impairment'); other phrases, or "
+            "scopes the index does not cover, use Chroma `where_document`, an exact substring "
+            "match."
+        ),
+    )
+    sections: list[SectionTopic] | None = Field(
+        None,
+        description=(
+            "Restrict the search to chunks from these filing sections, e.g. `mdna` (10-K Item 7 "
+            "/ 10-Q Part I Item 2), `risk_factors` (Item 1A) or `financial_statements` "
+            "(Item 8). Falls back to whole filings when nothing in scope matches."
+        ),
+    )
+    retrieval_mode: Literal["vector", "hybrid"] = Field(
+        "vector",
+        description=(
+            "`vector` ranks by embedding similarity only; `hybrid` fuses vector and BM25 "
+            "keyword ranks with reciprocal rank fusion."
         ),
     )
     max_context_chars: int = Field(
         8000, ge=0, le=50000, description="Maximum characters to include in `context`."
     )
+    max_context_tokens: int | None = Field(
+        2000,
+        ge=0,
+        le=16000,
+        description=(
+            "Token budget for `context`, counted for the agents' model. Adjacent chunks are "
+            "merged and overlap removed before packing. None disables the token budget."
+        ),
+    )
 
 
 class SearchReportsInput(BaseModel):
@@ -74,9 +121,25 @@ class SearchReportsOutput(BaseModel):
     collection_name: str
 
 
+StatementType = Literal["income_statement", "balance_sheet", "cash_flow_statement"]
+
+
 class FinancialStatementOutput(BaseModel):
     accession_number: str
-    statement_type: Literal["income_statement", "balance_sheet", "cash_flow_statement"]
+    statement_type: StatementType
     statement_text: str
     chunks_returned: int
     matches_examined: int
+    lookup_mode: Literal["metadata", "vector"] = "vector"
+
+
+class FinancialStatementsOutput(BaseModel):
+    accession_number: str
+    statements: list[FinancialStatementOutput]
+    chunk_counts: dict[str, int] = Field(default_factory=dict)
+
+    def get(self, statement_type: StatementType) -> FinancialStatementOutput | None:
+        for statement in self.statements:
+            if statement.statement_type == statement_type:
+                return statement
+        return None
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+from src.models.edgar_ingestion import IngestionJobStatus
+
+
+class PdfUploadJob(BaseModel):
+    job_id: str
+    file_name: str
+    collection_name: str
+    spool_path: str = Field(..., description="Where the upload was streamed to before parsing.")
+    domain: str
+    corpus: str
+    company_name: str | None = None
+    size_bytes: int = 0
+    status: IngestionJobStatus = IngestionJobStatus.QUEUED
+    pages: int = 0
+    chunks_indexed: int = 0
+    enqueued_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in {IngestionJobStatus.SUCCEEDED, IngestionJobStatus.FAILED}
@@ -6,7 +6,7 @@ from pydantic import BaseModel, Field
 
 from .fundamentals import FundamentalDTO
 from .news_sentiments import NewsSentiment
-from .rag_retrieve import FinancialStatementOutput, SearchReportsOutput
+from .rag_retrieve import FinancialStatementOutput, FinancialStatementsOutput, SearchReportsOutput
 
 
 class RetrievalAgentToolMetadata(BaseModel):
@@ -35,4 +35,5 @@ class RetrievalAgentOutput(BaseModel):
     market_news: list[NewsSentiment] = Field(default_factory=list)
     metadata: RetrievalAgentMetadata
     financial_statement: FinancialStatementOutput | None = None
+    financial_statements: FinancialStatementsOutput | None = None
     financial_reports: FundamentalDTO | None = None
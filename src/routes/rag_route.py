@@ -1,103 +1,95 @@
-import asyncio
+import json
+import logging
 import os
-from functools import lru_cache
+from typing import Any
 
-import chromadb
 from fastapi import APIRouter, HTTPException, UploadFile
 from fastapi.params import Form
-from llama_cloud_services import LlamaParse
-from llama_index.core.embeddings.utils import resolve_embed_model
-from llama_index.core.node_parser import SentenceSplitter
-from openai import OpenAI
+from fastapi.responses import StreamingResponse
 
-router = APIRouter(prefix="/rag", tags=["investments"])
+from clients.chroma_client import chroma_client
+from clients.embedding_registry import embedding_registry
+from clients.model_client import get_async_openai_client
+from src.agent_tools.rag.context_builder import build_rag_context, flatten_chroma_query_results
+from src.agent_tools.rag.embedding_reduction import get_embedding_reducer
+from src.agent_tools.rag.pdf_upload_jobs import UploadTooLargeError, pdf_upload_jobs
+from src.models.rag_upload import PdfUploadJob
 
+logger = logging.getLogger(__name__)
 
-@lru_cache(maxsize=1)
-def _get_chromadb_client():
-    api_key = os.getenv("CHROMA_API_KEY")
-    tenant = os.getenv("CHROMA_TENANT")
-    database = os.getenv("CHROMA_DATABASE")
-    if api_key and tenant and database:
-        return chromadb.CloudClient(api_key=api_key, tenant=tenant, database=database)
+router = APIRouter(prefix="/rag", tags=["investments"])
 
-    host = os.getenv("CHROMA_HOST") or "localhost"
-    port = int(os.getenv("CHROMA_PORT") or "8000")
-    return chromadb.HttpClient(host=host, port=port)
+# Upper bound on how long a single upload status call may block.
+MAX_UPLOAD_WAIT_SECONDS = 60.0
+CHAT_MODEL = "gpt-5-mini-2025-08-07"
+CHAT_INSTRUCTIONS = (
+    "Answer the user's question using the provided context. "
+    "If the context is insufficient, say so and ask a clarifying question."
+)
 
 
-@router.post("/upload_pdf")
+@router.post("/upload_pdf", status_code=202)
 async def upload_pdf(
     file: UploadFile,
     domain: str = "finance",
     corpus: str = "analyst_report",
     company_name: str | None = Form(None),
-):
+) -> PdfUploadJob:
+    """
+    Spool the PDF to disk and index it in the background.
+    Poll `GET /rag/upload_pdf/{job_id}` for progress.
+    """
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="File must be a PDF.")
 
-    api_key = os.getenv("LLAMA_CLOUD_API_KEY")
-    if not api_key:
+    if not os.getenv("LLAMA_CLOUD_API_KEY"):
         raise HTTPException(status_code=500, detail="LLAMA_CLOUD_API_KEY is not set.")
 
-    parser = LlamaParse(
-        api_key=api_key,  # can also be set in your env as LLAMA_CLOUD_API_KEY
-        num_workers=4,  # if multiple files passed, split in `num_workers` API calls
-        verbose=True,
-        language="en",  # optionally define a language, default=en
-    )
+    try:
+        return await pdf_upload_jobs.submit(
+            file,
+            collection_name=f"{domain}_{corpus}_{company_name}",
+            domain=domain,
+            corpus=corpus,
+            company_name=company_name,
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+
 
-    file_bytes = await file.read()
-    result = await parser.aparse(file_bytes, extra_info={"file_name": file.filename})
+@router.get("/upload_pdf/{job_id}")
+async def upload_pdf_status(job_id: str, wait_seconds: float = 0) -> PdfUploadJob:
+    """Report an upload job; with `wait_seconds`, block up to that long for it to finish."""
+    job = await pdf_upload_jobs.wait(job_id, min(wait_seconds, MAX_UPLOAD_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown upload job {job_id}.")
+    return job
 
-    markdown_documents = result.get_markdown_documents(split_by_page=True)
 
+async def _chat_context(query: str, collection_name: str, top_k: int) -> tuple[dict[str, Any], str]:
+    """Retrieve chunks for a chat turn; chat is read-only, so a missing collection is a 404."""
     try:
-        embed_model = resolve_embed_model(os.getenv("RAG_EMBED_MODEL") or "default")
-        splitter = SentenceSplitter(chunk_size=256)
-        nodes = splitter.get_nodes_from_documents(markdown_documents)
-
-        collection_name = f"{domain}_{corpus}_{company_name}"
-        client = _get_chromadb_client()
-        collection = client.get_or_create_collection(name=collection_name)
-
-        ids = [node.id_ for node in nodes]
-        documents = [node.get_content(metadata_mode="none") for node in nodes]
-        metadatas = []
-        for node in nodes:
-            safe_metadata = {}
-            for key, value in (node.metadata or {}).items():
-                if isinstance(value, (str, int, float, bool)) or value is None:
-                    safe_metadata[key] = value
-                else:
-                    safe_metadata[key] = str(value)
-            safe_metadata.update(
-                {
-                    "source_file": file.filename,
-                    "domain": domain,
-                    "corpus": corpus,
-                    "company_name": company_name,
-                }
-            )
-            metadatas.append(safe_metadata)
-
-        embeddings = await asyncio.to_thread(embed_model.get_text_embedding_batch, documents)
-        collection.upsert(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas,
-            embeddings=embeddings,
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to index into ChromaDB: {e}") from e
+        collection = await chroma_client.get_collection_or_raise(collection_name, cache=None)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e)) from e
+
+    # Repeated questions are answered from the registry's query-embedding cache.
+    query_embedding = await embedding_registry.aget_query_embedding(query)
+    # Stored vectors may be reduced; queries go through the same transform.
+    query_embeddings = get_embedding_reducer(collection_name).transform([query_embedding])
+    results = await collection.query(query_embeddings=query_embeddings, n_results=top_k)
+    return results, build_rag_context(flatten_chroma_query_results(results))
+
+
+def _openai_api_key() -> str:
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        raise HTTPException(status_code=500, detail="OPENAI_API_KEY is not set.")
+    return openai_api_key
 
-    return {
-        "collection_name": collection_name,
-        "num_chunks_indexed": len(ids),
-        "markdown_documents": markdown_documents,
-    }
+
+def _sse(payload: dict[str, Any]) -> str:
+    return f"data: {json.dumps(payload, default=str)}\n\n"
 
 
 @router.get("/chat")
@@ -108,28 +100,13 @@ async def chat(
     company_name: str | None = "",
     top_k: int = 3,
 ):
-    embed_model = resolve_embed_model(os.getenv("RAG_EMBED_MODEL") or "default")
-    query_embedding = await asyncio.to_thread(embed_model.get_query_embedding, query)
-
+    openai_api_key = _openai_api_key()
     collection_name = f"{domain}_{corpus}_{company_name}"
-    client = _get_chromadb_client()
-    collection = client.get_or_create_collection(name=collection_name)
+    results, context = await _chat_context(query, collection_name, top_k)
 
-    results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
-
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not openai_api_key:
-        raise HTTPException(status_code=500, detail="OPENAI_API_KEY is not set.")
-
-    context = _build_rag_context(results)
-    oai = OpenAI(api_key=openai_api_key)
-    response = await asyncio.to_thread(
-        oai.responses.create,
-        model="gpt-5-mini-2025-08-07",
-        instructions=(
-            "Answer the user's question using the provided context. "
-            "If the context is insufficient, say so and ask a clarifying question."
-        ),
+    response = await get_async_openai_client(openai_api_key).responses.create(
+        model=CHAT_MODEL,
+        instructions=CHAT_INSTRUCTIONS,
         input=f"Context:\n{context}\n\nUser question:\n{query}",
     )
 
@@ -140,28 +117,48 @@ async def chat(
     }
 
 
-def _build_rag_context(results: dict, max_chars: int = 8000) -> str:
-    documents = (results or {}).get("documents") or []
-    metadatas = (results or {}).get("metadatas") or []
-    distances = (results or {}).get("distances") or []
-    ids = (results or {}).get("ids") or []
-
-    docs = documents[0] if documents else []
-    metas = metadatas[0] if metadatas else []
-    dists = distances[0] if distances else []
-    doc_ids = ids[0] if ids else []
-
-    parts = []
-    total_chars = 0
-    for i, doc in enumerate(docs):
-        meta = metas[i] if i < len(metas) else None
-        dist = dists[i] if i < len(dists) else None
-        doc_id = doc_ids[i] if i < len(doc_ids) else None
-        chunk = f"[{i + 1}] id={doc_id} distance={dist} meta={meta}\n{doc}"
-        parts.append(chunk)
-        total_chars += len(chunk)
-        if total_chars >= max_chars:
-            break
-
-    context = "\n\n---\n\n".join(parts)
-    return context[:max_chars]
+@router.get("/chat/stream")
+async def chat_stream(
+    query: str,
+    domain: str = "finance",
+    corpus: str = "analyst_report",
+    company_name: str | None = "",
+    top_k: int = 3,
+):
+    """
+    Answer a chat turn as server-sent events.
+
+    Emits one `sources` event with the retrieved chunks, `delta` events as answer text is
+    generated, then `done`; a failure mid-stream is reported as an `error` event.
+    """
+    openai_api_key = _openai_api_key()
+    collection_name = f"{domain}_{corpus}_{company_name}"
+    results, context = await _chat_context(query, collection_name, top_k)
+
+    async def event_generator():
+        yield _sse({"type": "sources", "collection_name": collection_name, "results": results})
+        try:
+            stream = await get_async_openai_client(openai_api_key).responses.create(
+                model=CHAT_MODEL,
+                instructions=CHAT_INSTRUCTIONS,
+                input=f"Context:\n{context}\n\nUser question:\n{query}",
+                stream=True,
+            )
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield _sse({"type": "delta", "text": event.delta})
+            yield _sse({"type": "done"})
+        except Exception as e:
+            logger.exception("Streaming chat failed")
+            yield _sse({"type": "error", "error": str(e)})
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.get("/embeddings/stats")
+async def embedding_stats():
+    return {
+        "models": embedding_registry.stats(),
+        "cache": embedding_registry.cache_stats(),
+        "batching": embedding_registry.batch_stats(),
+    }
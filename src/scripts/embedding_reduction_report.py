@@ -0,0 +1,78 @@
+"""
+Measure recall@k of reduced-dimension embeddings against full-size ones, and fit PCA.
+
+    uv run python ./src/scripts/embedding_reduction_report.py --dims 256 512 --k 10
+    uv run python ./src/scripts/embedding_reduction_report.py --dims 256 --fit-pca
+
+Samples chunk embeddings from a full-size collection, holds some out as queries (or embeds
+`--query` texts), and compares exact top-k neighbours under Matryoshka truncation and PCA at
+each dimension. `--fit-pca` saves the fitted projections to RAG_EMBED_REDUCTION_DIR, where
+ingestion and retrieval load them when RAG_EMBED_REDUCTION=pca:<dims>.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+import numpy as np
+from dotenv import load_dotenv
+
+from clients.chroma_client import ChromaClient
+from clients.embedding_registry import embedding_registry
+from src.agent_tools.rag.embedding_reduction import (
+    MatryoshkaReducer,
+    PcaReducer,
+    pca_path,
+    recall_report,
+)
+
+
+async def _sample_embeddings(collection_name: str, sample: int) -> np.ndarray:
+    client = ChromaClient(sharding_mode="none")
+    # The full-size vectors, even when RAG_EMBED_REDUCTION already routes to a reduced copy.
+    collection = await client.get_collection(collection_name)
+    page = await collection.get(include=["embeddings"], limit=sample)
+    return np.asarray(page["embeddings"], dtype=np.float32)
+
+
+def main() -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--collection", default="edgar_filings")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--sample", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200, help="held-out chunks to query with")
+    parser.add_argument("--query", action="append", default=[], help="query text (repeatable)")
+    parser.add_argument("--fit-pca", action="store_true", help="save the fitted projections")
+    args = parser.parse_args()
+
+    embeddings = asyncio.run(_sample_embeddings(args.collection, args.sample))
+    if args.query:
+        corpus = embeddings
+        queries = np.asarray(embedding_registry.get_query_embeddings(args.query), dtype=np.float32)
+    else:
+        held_out = min(args.queries, len(embeddings) // 5)
+        corpus, queries = embeddings[held_out:], embeddings[:held_out]
+
+    reducers = []
+    for dims in args.dims:
+        reducers.append(MatryoshkaReducer(dims))
+        pca = PcaReducer.fit(corpus, dims)
+        reducers.append(pca)
+        if args.fit_pca:
+            pca.save(pca_path(args.collection, dims))
+            print(f"saved {pca_path(args.collection, dims)}", file=sys.stderr)
+
+    for result in recall_report(corpus, queries, reducers, k=args.k):
+        print(json.dumps(result.as_row()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
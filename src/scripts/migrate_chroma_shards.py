@@ -0,0 +1,146 @@
+"""
+Copy a single Chroma collection into per-ticker or hash-bucketed shards.
+
+    uv run python ./src/scripts/migrate_chroma_shards.py --mode ticker
+    uv run python ./src/scripts/migrate_chroma_shards.py --mode hash --buckets 64 --delete-source
+
+Chunks are copied with their stored embeddings, so nothing is re-embedded, and the ingestion
+manifest is pointed at each filing's shard so the servers don't rebuild it after the switch.
+Run it before switching CHROMA_SHARDING_MODE on the servers; it is idempotent (ids are
+upserted).
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from collections import Counter, defaultdict
+from typing import Any
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+from dotenv import load_dotenv
+
+from clients.chroma_client import SHARDING_MODES, ChromaClient
+from src.agent_tools.edgar.ingestion_manifest import IngestionManifest, ingestion_manifest
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate(
+    collection_name: str,
+    *,
+    mode: str,
+    buckets: int | None = None,
+    batch_size: int = 500,
+    delete_source: bool = False,
+    dry_run: bool = False,
+    manifest: IngestionManifest = ingestion_manifest,
+) -> Counter[str]:
+    source_client = ChromaClient(sharding_mode="none")
+    target_client = ChromaClient(sharding_mode=mode, shard_buckets=buckets)
+    if not target_client.sharded:
+        raise ValueError("Target mode must be a sharded mode")
+
+    source = await source_client.get_collection_or_raise(collection_name, cache=None)
+    copied: Counter[str] = Counter()
+    # accession -> (shard, ticker), for rewriting the manifest once the chunks are copied.
+    moved: dict[str, tuple[str, str]] = {}
+    offset = 0
+    while True:
+        page = await source.get(
+            include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset
+        )
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        offset += len(ids)
+
+        shards: dict[str, dict[str, list[Any]]] = defaultdict(lambda: defaultdict(list))
+        for index, chunk_id in enumerate(ids):
+            metadata = page["metadatas"][index] or {}
+            ticker = metadata.get("ticker")
+            if not ticker:
+                copied["skipped_without_ticker"] += 1
+                continue
+            shard_name = target_client.route(collection_name, ticker)
+            if accession_number := metadata.get("accession_number"):
+                moved[accession_number] = (shard_name, ticker)
+            shard = shards[shard_name]
+            shard["ids"].append(chunk_id)
+            shard["embeddings"].append(page["embeddings"][index])
+            shard["documents"].append(page["documents"][index])
+            shard["metadatas"].append(metadata)
+
+        for shard_name, batch in shards.items():
+            copied[shard_name] += len(batch["ids"])
+            if dry_run:
+                continue
+            collection = await target_client.get_collection(shard_name, create=True)
+            await collection.upsert(**batch)
+        logger.info("Copied %d chunks from %s", offset, collection_name)
+
+    if not dry_run:
+        _record_shards(manifest, collection_name, moved)
+
+    if delete_source and not dry_run and copied.get("skipped_without_ticker", 0) == 0:
+        client = await source_client.get_async_client()
+        await client.delete_collection(collection_name)
+        logger.info("Deleted source collection %s", collection_name)
+    elif delete_source:
+        logger.warning("Source collection %s kept: dry run or unrouted chunks", collection_name)
+    return copied
+
+
+def _record_shards(
+    manifest: IngestionManifest, collection_name: str, moved: dict[str, tuple[str, str]]
+) -> None:
+    """Point manifest entries at their new shard so they are not rebuilt as outdated."""
+    tickers: Counter[str] = Counter()
+    for accession_number, (shard_name, ticker) in moved.items():
+        entry = manifest.get(accession_number)
+        if entry is None or entry.collection_name != collection_name:
+            continue
+        manifest.mark_moved(accession_number, stored_collection=shard_name, ticker=ticker)
+        tickers[ticker] += 1
+    for ticker in tickers:
+        manifest.bump_content_version(collection_name, ticker)
+    logger.info("Recorded shards of %d manifest entries", tickers.total())
+
+
+def main() -> int:
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--collection", default="edgar_filings")
+    parser.add_argument(
+        "--mode",
+        choices=[mode for mode in SHARDING_MODES if mode != "none"],
+        default=os.getenv("CHROMA_SHARDING_MODE") or "ticker",
+    )
+    parser.add_argument("--buckets", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--delete-source", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    copied = asyncio.run(
+        migrate(
+            args.collection,
+            mode=args.mode,
+            buckets=args.buckets,
+            batch_size=args.batch_size,
+            delete_source=args.delete_source,
+            dry_run=args.dry_run,
+        )
+    )
+    for shard_name, count in sorted(copied.items()):
+        print(f"{shard_name}\t{count}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
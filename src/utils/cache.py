@@ -14,3 +14,5 @@ def is_rate_limited(payload: dict) -> bool:
 class CacheConfig:
     LIST_COLLECTIONS_CACHE_TTL_SECONDS = 60
     RETRIEVE_REPORT_CACHE_TTL_SECONDS = 60 * 5
+    # Filings are immutable once ingested, so extracted statements never expire.
+    FINANCIAL_STATEMENT_CACHE_TTL_SECONDS = None
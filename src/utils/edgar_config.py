@@ -12,3 +12,24 @@ class EdgarConfig:
     HEADERS: ClassVar[dict] = {
         "User-Agent": f"wealth-hub-agent {os.getenv('CONTACT_EMAIL', 'your-email@email.com')}"
     }
+    # Background ingestion: worker tasks in the MCP process, and how long a workflow waits
+    # for freshly enqueued filings before retrieving from what is already indexed.
+    INGESTION_WORKERS: ClassVar[int] = int(os.getenv("EDGAR_INGESTION_WORKERS", "2"))
+    INGESTION_WAIT_BUDGET_SECONDS: ClassVar[float] = float(
+        os.getenv("EDGAR_INGESTION_WAIT_BUDGET_SECONDS", "20")
+    )
+    # Within one filing, embedding and Chroma writes run as a pipeline of bounded queues;
+    # embedding batches start at this size and adapt to keep each call near the target.
+    INGESTION_EMBED_CONCURRENCY: ClassVar[int] = int(
+        os.getenv("EDGAR_INGESTION_EMBED_CONCURRENCY", "4")
+    )
+    INGESTION_UPSERT_CONCURRENCY: ClassVar[int] = int(
+        os.getenv("EDGAR_INGESTION_UPSERT_CONCURRENCY", "2")
+    )
+    INGESTION_QUEUE_DEPTH: ClassVar[int] = int(os.getenv("EDGAR_INGESTION_QUEUE_DEPTH", "4"))
+    INGESTION_EMBED_BATCH_SIZE: ClassVar[int] = int(
+        os.getenv("EDGAR_INGESTION_EMBED_BATCH_SIZE", "64")
+    )
+    INGESTION_EMBED_TARGET_SECONDS: ClassVar[float] = float(
+        os.getenv("EDGAR_INGESTION_EMBED_TARGET_SECONDS", "2")
+    )
@@ -0,0 +1,65 @@
+import logging
+import os
+from functools import lru_cache
+
+from src.utils.agent_model_config import AgentModelConfig
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_ENCODING = "o200k_base"
+# Rough average for English prose; only used when no tiktoken encoding can be loaded.
+APPROX_CHARS_PER_TOKEN = 4
+
+
+def default_prompt_model() -> str:
+    return os.getenv("OPENAI_MODEL") or AgentModelConfig.OPENAI_MODEL
+
+
+class Tokenizer:
+    """Counts and truncates text in tokens of a target model."""
+
+    def __init__(self, encoding=None):
+        self._encoding = encoding
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is None:
+            return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is None:
+            return text[: max_tokens * APPROX_CHARS_PER_TOKEN]
+        tokens = self._encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self._encoding.decode(tokens[:max_tokens])
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(model: str | None = None) -> Tokenizer:
+    """
+    Tokenizer for `model` (defaults to the agents' OpenAI model).
+
+    tiktoken downloads encodings on first use; when that fails (offline hosts), counts fall
+    back to a characters-per-token estimate rather than failing the request.
+    """
+    name = model or default_prompt_model()
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(name)
+        except KeyError:
+            encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+        return Tokenizer(encoding)
+    except Exception as exc:
+        logger.warning("No tiktoken encoding for %s, estimating token counts: %s", name, exc)
+        return Tokenizer()
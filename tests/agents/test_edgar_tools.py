@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import asyncio
+from datetime import UTC, datetime
 
 import pytest
 
+from clients.chroma_client import ChromaClient
 from src.agent_tools.edgar import search_reports_impl, upsert_edgar_report_impl
+from src.agent_tools.edgar.ingestion_manifest import IngestionManifest
+from src.agent_tools.rag.fulltext_index import FullTextIndex
+from src.models.edgar_ingestion import IngestionManifestEntry, IngestionStatus
 from src.models.rag_retrieve import SearchReportsInput
+from src.scripts import migrate_chroma_shards
 
 
 class DummyResponse:
@@ -88,27 +94,36 @@ def test_search_reports_respects_limit(monkeypatch):
     asyncio.run(run())
 
 
-def test_upsert_edgar_report_skips_existing_accession(monkeypatch):
+def test_upsert_edgar_report_skips_existing_accession(monkeypatch, tmp_path):
     async def run():
         class DummyCollection:
             def __init__(self) -> None:
-                self.get_called_with: dict[str, object] | None = None
-
-            def get(self, *, where: dict[str, object], limit: int):
-                self.get_called_with = {"where": where, "limit": limit}
-                return {"ids": ["already-ingested"]}
+                self.get_calls: list[dict[str, object]] = []
+
+            async def get(self, *, where: dict[str, object], include: list[str]):
+                self.get_calls.append({"where": where, "include": include})
+                return {
+                    "ids": ["ACC-EXIST:0", "ACC-EXIST:1"],
+                    "documents": ["Goodwill impairment was not required.", "Net sales grew."],
+                    "metadatas": [{"ticker": "AAPL"}, {"ticker": "AAPL"}],
+                }
 
         dummy_collection = DummyCollection()
+        client_calls: list[str] = []
+
+        class DummyChromaClient:
+            def route(self, collection_name: str, ticker: str | None = None) -> str:
+                return collection_name
 
-        class DummyClient:
-            def get_or_create_collection(self, name: str):
+            async def get_collection(self, name: str, *, create: bool = False):
+                client_calls.append(name)
                 return dummy_collection
 
-        monkeypatch.setattr(
-            upsert_edgar_report_impl.chroma_client,
-            "get_client",
-            lambda: DummyClient(),
-        )
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        index = FullTextIndex(str(tmp_path / "fulltext.sqlite3"))
+        monkeypatch.setattr(upsert_edgar_report_impl, "ingestion_manifest", manifest)
+        monkeypatch.setattr(upsert_edgar_report_impl, "fulltext_index", index)
+        monkeypatch.setattr(upsert_edgar_report_impl, "chroma_client", DummyChromaClient())
 
         async def should_not_be_called(*args, **kwargs):
             pytest.fail("Content fetch should not be invoked for already ingested accession")
@@ -127,15 +142,314 @@ def test_upsert_edgar_report_skips_existing_accession(monkeypatch):
             "report_date": "2023-12-31",
         }
 
+        # The first run backfills the manifest from Chroma; the second never reaches Chroma.
+        for _ in range(2):
+            await upsert_edgar_report_impl.upsert_edgar_report_impl(
+                href="https://example.com/ACC-EXIST",
+                metadata=metadata,
+                collection_name="edgar_filings",
+            )
+
+        assert dummy_collection.get_calls == [
+            {"where": {"accession_number": "ACC-EXIST"}, "include": ["documents", "metadatas"]}
+        ]
+        assert client_calls == ["edgar_filings"]
+        entry = manifest.get("ACC-EXIST")
+        assert entry is not None
+        assert entry.status == IngestionStatus.INGESTED
+        assert entry.chunk_count == len(["ACC-EXIST:0", "ACC-EXIST:1"])
+        # Legacy chunks are mirrored into the keyword index on first sight.
+        scope = manifest.scope("edgar_filings", "AAPL")
+        assert index.match_ids(
+            "edgar_filings", "goodwill impairment", {"ticker": "AAPL"}, expected=scope, limit=10
+        ) == ["ACC-EXIST:0"]
+
+    asyncio.run(run())
+
+
+def test_ingestion_manifest_plans_pending_and_partial_accessions(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest"))
+    manifest.mark_ingested("ACC-DONE", chunk_count=12, collection_name="edgar_filings")
+    manifest.mark_ingesting("ACC-RUNNING", collection_name="edgar_filings")
+    manifest.mark_ingesting("ACC-BROKEN", collection_name="edgar_filings")
+    manifest.mark_failed("ACC-BROKEN", "connection reset")
+
+    plan = manifest.plan(["ACC-NEW", "ACC-DONE", "ACC-RUNNING", "ACC-BROKEN", "ACC-NEW"])
+
+    assert plan.pending == ["ACC-NEW"]
+    assert plan.ingested == ["ACC-DONE"]
+    assert plan.in_progress == ["ACC-RUNNING"]
+    assert plan.partial == ["ACC-BROKEN"]
+    assert plan.to_ingest == ["ACC-NEW", "ACC-BROKEN"]
+
+
+def test_upsert_edgar_report_repairs_partial_ingest(monkeypatch, tmp_path):
+    async def run():
+        class DummyCollection:
+            def __init__(self) -> None:
+                self.deleted: list[dict[str, object]] = []
+
+            async def get(self, **kwargs):
+                pytest.fail("Manifest entry should make the existence check unnecessary")
+
+            async def delete(self, *, where: dict[str, object]):
+                self.deleted.append(where)
+
+        dummy_collection = DummyCollection()
+
+        class DummyChromaClient:
+            def route(self, collection_name: str, ticker: str | None = None) -> str:
+                return collection_name
+
+            async def get_collection(self, name: str, *, create: bool = False):
+                return dummy_collection
+
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        manifest.mark_ingesting("ACC-PART", collection_name="edgar_filings")
+        manifest.mark_failed("ACC-PART", "worker crashed")
+        monkeypatch.setattr(upsert_edgar_report_impl, "ingestion_manifest", manifest)
+        monkeypatch.setattr(upsert_edgar_report_impl, "chroma_client", DummyChromaClient())
+
+        async def empty_content(*args, **kwargs):
+            return ""
+
+        monkeypatch.setattr(
+            upsert_edgar_report_impl.EdgarClient, "get_filing_content", empty_content
+        )
+
         await upsert_edgar_report_impl.upsert_edgar_report_impl(
-            href="https://example.com/ACC-EXIST",
-            metadata=metadata,
+            href="https://example.com/ACC-PART",
+            metadata={"accession_number": "ACC-PART", "ticker": "AAPL", "form": "10-K"},
             collection_name="edgar_filings",
         )
 
-        assert dummy_collection.get_called_with == {
-            "where": {"accession_number": "ACC-EXIST"},
-            "limit": 1,
+        assert dummy_collection.deleted == [{"accession_number": "ACC-PART"}]
+        # Deleting chunks invalidates cached retrievals even though the re-ingest failed.
+        assert manifest.content_version("edgar_filings", "AAPL") == 1
+        entry = manifest.get("ACC-PART")
+        assert entry is not None
+        assert entry.status == IngestionStatus.FAILED
+        assert entry.error == "empty filing content"
+
+    asyncio.run(run())
+
+
+def test_entries_built_with_other_embedding_settings_are_rebuilt(monkeypatch, tmp_path):
+    async def run():
+        deleted: dict[str, list[dict[str, object]]] = {}
+
+        class DummyCollection:
+            def __init__(self, name: str) -> None:
+                self.name = name
+
+            async def get(self, **kwargs):
+                pytest.fail("Manifest entry should make the existence check unnecessary")
+
+            async def delete(self, *, where: dict[str, object]):
+                deleted.setdefault(self.name, []).append(where)
+
+        class ShardedChromaClient:
+            def route(self, collection_name: str, ticker: str | None = None) -> str:
+                return f"{collection_name}__{ticker.lower()}" if ticker else collection_name
+
+            async def get_collection(self, name: str, *, create: bool = False):
+                return DummyCollection(name)
+
+        monkeypatch.delenv("RAG_EMBED_REDUCTION", raising=False)
+        monkeypatch.setenv("RAG_EMBED_MODEL", "text-embedding-3-large")
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        common = {"chunk_count": 3, "collection_name": "edgar_filings", "ticker": "AAPL"}
+        manifest.mark_ingested(
+            "ACC-CURRENT",
+            embed_model="text-embedding-3-large",
+            stored_collection="edgar_filings__aapl",
+            **common,
+        )
+        manifest.mark_ingested(
+            "ACC-OLD-MODEL",
+            embed_model="text-embedding-3-small",
+            stored_collection="edgar_filings__aapl",
+            **common,
+        )
+        manifest.mark_ingested(
+            "ACC-UNSHARDED",
+            embed_model="text-embedding-3-large",
+            stored_collection="edgar_filings",
+            **common,
+        )
+        # Entries that predate these fields are not second-guessed.
+        manifest.mark_ingested("ACC-LEGACY", **common)
+        monkeypatch.setattr(upsert_edgar_report_impl, "ingestion_manifest", manifest)
+        monkeypatch.setattr(upsert_edgar_report_impl, "chroma_client", ShardedChromaClient())
+
+        plan = upsert_edgar_report_impl.plan_edgar_ingestion_impl(
+            ["ACC-CURRENT", "ACC-OLD-MODEL", "ACC-UNSHARDED", "ACC-LEGACY"], "edgar_filings"
+        )
+        assert plan.ingested == ["ACC-CURRENT", "ACC-LEGACY"]
+        assert plan.partial == ["ACC-OLD-MODEL", "ACC-UNSHARDED"]
+        assert manifest.plan(["ACC-OLD-MODEL"]).ingested == ["ACC-OLD-MODEL"]
+
+        async def empty_content(*args, **kwargs):
+            return ""
+
+        monkeypatch.setattr(
+            upsert_edgar_report_impl.EdgarClient, "get_filing_content", empty_content
+        )
+        await upsert_edgar_report_impl.upsert_edgar_report_impl(
+            href="https://example.com/ACC-UNSHARDED",
+            metadata={"accession_number": "ACC-UNSHARDED", "ticker": "AAPL", "form": "10-K"},
+            collection_name="edgar_filings",
+        )
+
+        # Chunks are cleared from the new shard and from the collection they used to live in.
+        assert deleted == {
+            "edgar_filings__aapl": [{"accession_number": "ACC-UNSHARDED"}],
+            "edgar_filings": [{"accession_number": "ACC-UNSHARDED"}],
         }
+        entry = manifest.get("ACC-UNSHARDED")
+        assert entry is not None
+        assert entry.stored_collection == "edgar_filings__aapl"
+        assert entry.status == IngestionStatus.FAILED
+
+    asyncio.run(run())
+
+
+def test_shard_migration_keeps_migrated_filings_current(monkeypatch, tmp_path):
+    async def run():
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        fingerprint = upsert_edgar_report_impl.embedding_fingerprint("edgar_filings")
+        manifest.mark_ingested(
+            "ACC-1",
+            chunk_count=2,
+            collection_name="edgar_filings",
+            embed_model=fingerprint,
+            stored_collection="edgar_filings",
+        )
+
+        class SourceCollection:
+            async def get(self, *, include, limit, offset):
+                if offset:
+                    return {"ids": []}
+                return {
+                    "ids": ["ACC-1:0", "ACC-1:1"],
+                    "embeddings": [[0.1], [0.2]],
+                    "documents": ["Net sales", "Net income"],
+                    "metadatas": [{"ticker": "AAPL", "accession_number": "ACC-1"}] * 2,
+                }
+
+        class ShardCollection:
+            def __init__(self) -> None:
+                self.upserted: list[str] = []
+
+            async def upsert(self, *, ids, embeddings, documents, metadatas):
+                self.upserted.extend(ids)
+
+        shard = ShardCollection()
+
+        class MigrationChromaClient(ChromaClient):
+            async def get_collection_or_raise(self, collection_name, *, cache, ticker=None):
+                return SourceCollection()
+
+            async def get_collection(self, name, *, create=False):
+                return shard
+
+        monkeypatch.setattr(migrate_chroma_shards, "ChromaClient", MigrationChromaClient)
+
+        dry = await migrate_chroma_shards.migrate(
+            "edgar_filings", mode="ticker", dry_run=True, manifest=manifest
+        )
+        assert manifest.get("ACC-1").stored_collection == "edgar_filings"
+        copied = await migrate_chroma_shards.migrate(
+            "edgar_filings", mode="ticker", manifest=manifest
+        )
+        assert dry == copied
+
+        # Once the servers switch to ticker sharding, the migrated filing is not rebuilt.
+        monkeypatch.setattr(
+            upsert_edgar_report_impl, "chroma_client", ChromaClient(sharding_mode="ticker")
+        )
+        entry = manifest.get("ACC-1")
+        assert entry.stored_collection == upsert_edgar_report_impl.chroma_client.route(
+            "edgar_filings", "AAPL"
+        )
+        assert shard.upserted == ["ACC-1:0", "ACC-1:1"]
+        assert not upsert_edgar_report_impl.is_outdated(entry, "edgar_filings")
+        assert manifest.content_version("edgar_filings", "AAPL") == 1
+
+    asyncio.run(run())
+
+
+def test_ingestion_manifest_lists_accessions_per_scope(tmp_path):
+    manifest = IngestionManifest(str(tmp_path / "manifest"))
+    manifest.mark_ingested("ACC-1", chunk_count=3, collection_name="edgar_filings", ticker="AAPL")
+    manifest.mark_ingesting("ACC-2", collection_name="edgar_filings", ticker="AAPL")
+    manifest.mark_ingested("ACC-3", chunk_count=5, collection_name="edgar_filings", ticker="MSFT")
+
+    assert manifest.scope("edgar_filings", "aapl") == {"ACC-1": 3, "ACC-2": None}
+    assert manifest.scope("edgar_filings") == {"ACC-1": 3, "ACC-2": None, "ACC-3": 5}
+
+    # Re-ingesting into another collection moves the accession between scopes.
+    manifest.mark_ingested("ACC-1", chunk_count=4, collection_name="other", ticker="AAPL")
+    assert manifest.scope("edgar_filings", "AAPL") == {"ACC-2": None}
+    assert manifest.scope("other", "AAPL") == {"ACC-1": 4}
+
+    # Manifests written before the scope listings are indexed once, on first use.
+    manifest.cache.clear()
+    manifest._save(
+        IngestionManifestEntry(
+            accession_number="ACC-9",
+            status=IngestionStatus.INGESTED,
+            collection_name="edgar_filings",
+            chunk_count=2,
+            ticker="NVDA",
+            updated_at=datetime.now(UTC),
+        )
+    )
+    manifest.cache.delete(manifest._scope_key("edgar_filings", "NVDA"))
+    assert manifest.scope("edgar_filings", "NVDA") == {"ACC-9": 2}
+
+
+def test_reduced_embeddings_are_stored_in_their_own_collection(monkeypatch, tmp_path):
+    async def run():
+        class ListingChromaClient(ChromaClient):
+            async def list_collection_names(self, cache=None) -> list[str]:
+                return ["edgar_filings__aapl", "edgar_filings-matryoshka256__aapl"]
+
+        client = ListingChromaClient(sharding_mode="ticker")
+        monkeypatch.setattr(upsert_edgar_report_impl, "chroma_client", client)
+        monkeypatch.setenv("RAG_EMBED_MODEL", "text-embedding-3-large")
+        monkeypatch.delenv("RAG_EMBED_REDUCTION_COLLECTIONS", raising=False)
+        monkeypatch.setenv("RAG_EMBED_REDUCTION", "matryoshka:256")
+
+        assert client.route("edgar_filings", "AAPL") == "edgar_filings-matryoshka256__aapl"
+        assert await client.list_shard_names("edgar_filings") == [
+            "edgar_filings-matryoshka256__aapl"
+        ]
+        assert ChromaClient(sharding_mode="none").route("edgar_filings") == (
+            "edgar_filings-matryoshka256"
+        )
+        # Collections outside RAG_EMBED_REDUCTION_COLLECTIONS keep their full-size vectors.
+        assert client.route("finance_analyst_report_ACME") == "finance_analyst_report_ACME"
+
+        # A filing embedded at full size must be rebuilt into the reduced collection.
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        monkeypatch.delenv("RAG_EMBED_REDUCTION")
+        manifest.mark_ingested(
+            "ACC-FULL",
+            chunk_count=3,
+            collection_name="edgar_filings",
+            ticker="AAPL",
+            embed_model=upsert_edgar_report_impl.embedding_fingerprint("edgar_filings"),
+            stored_collection=client.route("edgar_filings", "AAPL"),
+        )
+        monkeypatch.setattr(upsert_edgar_report_impl, "ingestion_manifest", manifest)
+        assert upsert_edgar_report_impl.plan_edgar_ingestion_impl(
+            ["ACC-FULL"], "edgar_filings"
+        ).ingested == ["ACC-FULL"]
+
+        monkeypatch.setenv("RAG_EMBED_REDUCTION", "matryoshka:256")
+        assert upsert_edgar_report_impl.plan_edgar_ingestion_impl(
+            ["ACC-FULL"], "edgar_filings"
+        ).partial == ["ACC-FULL"]
 
     asyncio.run(run())
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from llama_index.core.schema import MetadataMode, TextNode
+
+from clients.embedding_cache import EmbeddingCache
+from clients.embedding_registry import EmbeddingRegistry
+from src.agent_tools.edgar.upsert_edgar_report_impl import FILING_SPECIFIC_METADATA_KEYS
+
+
+class CountingEmbedModel:
+    def __init__(self) -> None:
+        self.query_calls = 0
+
+    def get_query_embedding(self, query: str) -> list[float]:
+        self.query_calls += 1
+        if query == "boom":
+            raise RuntimeError("rate limited")
+        return [float(len(query))]
+
+    def get_text_embedding_batch(self, texts: list[str]) -> list[list[float]]:
+        return [[float(len(text))] for text in texts]
+
+
+def test_embedding_registry_reuses_models_and_records_stats():
+    async def run():
+        resolved: list[str] = []
+
+        def resolver(name: str) -> CountingEmbedModel:
+            resolved.append(name)
+            return CountingEmbedModel()
+
+        registry = EmbeddingRegistry(resolver=resolver)
+        registry.warm(["local:model"])
+
+        assert await registry.aget_query_embedding("apple", "local:model") == [5.0]
+        assert await registry.aget_text_embedding_batch(["a", "bb"], "local:model") == [
+            [1.0],
+            [2.0],
+        ]
+        with pytest.raises(RuntimeError):
+            await registry.aget_query_embedding("boom", "local:model")
+
+        assert resolved == ["local:model"]
+        stats = registry.stats()["local:model"]
+        # warm-up, query, two-text batch and the failed query
+        EXPECTED_CALLS, EXPECTED_TEXTS = 4, 5
+        assert stats["calls"] == EXPECTED_CALLS
+        assert stats["texts"] == EXPECTED_TEXTS
+        assert stats["errors"] == 1
+        assert stats["avg_latency_ms"] >= 0
+
+    asyncio.run(run())
+
+
+def test_embedding_cache_serves_repeats_from_memory_then_disk(tmp_path):
+    async def run():
+        model = CountingEmbedModel()
+        cache_dir = str(tmp_path / "embeddings")
+        registry = EmbeddingRegistry(
+            resolver=lambda name: model, cache=EmbeddingCache(cache_dir, memory_size=8)
+        )
+
+        first = await registry.aget_query_embedding("Is AAPL a good investment?", "m")
+        again = await registry.aget_query_embedding("  Is AAPL a good   investment? ", "m")
+        assert first == again
+        assert model.query_calls == 1
+
+        batch = await registry.aget_text_embedding_batch(["alpha", "beta"], "m")
+        partial = await registry.aget_text_embedding_batch(["beta", "gamma!"], "m")
+        assert partial == [batch[1], [6.0]]
+        assert registry.stats()["m"]["texts"] == len(["query", "alpha", "beta", "gamma!"])
+
+        # A fresh process reads the disk tier.
+        restarted_model = CountingEmbedModel()
+        restarted = EmbeddingRegistry(
+            resolver=lambda name: restarted_model, cache=EmbeddingCache(cache_dir)
+        )
+        assert await restarted.aget_query_embedding("Is AAPL a good investment?", "m") == first
+        assert restarted_model.query_calls == 0
+        assert restarted.cache_stats()["disk_hits"] == 1
+
+    asyncio.run(run())
+
+
+class BatchingEmbedModel(CountingEmbedModel):
+    _query_engine = "text-embedding-3-small"
+    _text_engine = "text-embedding-3-small"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.batches: list[list[str]] = []
+
+    def get_text_embedding_batch(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(list(texts))
+        return super().get_text_embedding_batch(texts)
+
+
+def test_concurrent_query_embeddings_are_coalesced_into_one_batch():
+    async def run():
+        model = BatchingEmbedModel()
+        registry = EmbeddingRegistry(
+            resolver=lambda name: model, batch_window_ms=20, max_batch_size=8
+        )
+
+        queries = ["a", "bb", "ccc", "bb", "dddd"]
+        results = await asyncio.gather(
+            *(registry.aget_query_embedding(query, "m") for query in queries)
+        )
+
+        assert results == [[1.0], [2.0], [3.0], [2.0], [4.0]]
+        assert model.batches == [["a", "bb", "ccc", "dddd"]]
+        assert model.query_calls == 0
+        batching = registry.batch_stats()
+        assert batching["batches"] == 1
+        assert batching["requests"] == len(queries)
+
+    asyncio.run(run())
+
+
+def test_batched_query_errors_stay_with_their_caller():
+    async def run():
+        model = CountingEmbedModel()
+        registry = EmbeddingRegistry(resolver=lambda name: model, batch_window_ms=5)
+
+        results = await asyncio.gather(
+            registry.aget_query_embedding("boom", "m"),
+            registry.aget_query_embedding("fine", "m"),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[0], RuntimeError)
+        assert results[1] == [4.0]
+
+    asyncio.run(run())
+
+
+def test_repeated_filing_chunks_reuse_embeddings_and_report_dedup(tmp_path):
+    async def run():
+        model = CountingEmbedModel()
+        batches: list[list[str]] = []
+        embed_batch = model.get_text_embedding_batch
+
+        def recording_batch(texts: list[str]) -> list[list[float]]:
+            batches.append(texts)
+            return embed_batch(texts)
+
+        model.get_text_embedding_batch = recording_batch
+        registry = EmbeddingRegistry(
+            resolver=lambda name: model, cache=EmbeddingCache(str(tmp_path / "embeddings"))
+        )
+
+        def chunks(accession: str, *texts: str) -> list[str]:
+            nodes = []
+            for index, text in enumerate(texts):
+                node = TextNode(
+                    text=text,
+                    metadata={
+                        "ticker": "AAPL",
+                        "accession_number": accession,
+                        "chunk_index": index,
+                    },
+                )
+                node.excluded_embed_metadata_keys = FILING_SPECIFIC_METADATA_KEYS
+                nodes.append(node.get_content(metadata_mode=MetadataMode.EMBED))
+            return nodes
+
+        risk = "Our business is subject to global economic conditions."
+        _, first = await registry.aget_text_embedding_batch_with_report(
+            chunks("ACC-2023", risk, "Net sales were $383 billion.", risk), "local:model"
+        )
+        _, second = await registry.aget_text_embedding_batch_with_report(
+            chunks("ACC-2024", risk, "Net sales were $391 billion."), "local:model"
+        )
+
+        assert (first.texts, first.unique_texts, first.embedded) == (3, 2, 2)
+        # Only the changed figure is embedded for the next year's filing.
+        assert (second.texts, second.embedded, second.reused) == (2, 1, 1)
+        assert second.dedup_ratio == pytest.approx(0.5)
+        assert [len(batch) for batch in batches] == [2, 1]
+
+        # Whitespace-only variants share a cache key and are embedded once.
+        _, spacing = await registry.aget_text_embedding_batch_with_report(
+            ["Gross margin  expanded.", "Gross margin expanded.\n"], "local:model"
+        )
+        assert (spacing.unique_texts, spacing.embedded) == (1, 1)
+        assert batches[-1] == ["Gross margin  expanded."]
+
+    asyncio.run(run())
@@ -2,50 +2,235 @@ from __future__ import annotations
 
 import asyncio
 
+import pytest
+
+from clients.embedding_registry import EmbeddingRegistry
+from src.agent_tools.edgar.ingestion_manifest import IngestionManifest
 from src.agent_tools.rag import extract_financial_statements_impl
 
 
+class DummyCollection:
+    def __init__(self, tagged: dict | None = None) -> None:
+        self.query_calls: list[dict[str, object]] = []
+        self.get_calls: list[dict[str, object]] = []
+        self._tagged = tagged or {"ids": [], "documents": [], "metadatas": []}
+
+    async def get(self, *, where, include) -> dict:
+        self.get_calls.append({"where": where, "include": include})
+        return self._tagged
+
+    async def query(self, *, where, include, n_results, **kwargs) -> dict:
+        self.query_calls.append({"where": where, **kwargs})
+        return {
+            "ids": [["ACC-123:2", "ACC-123:1"]],
+            "documents": [["second chunk", "first chunk"]],
+            "metadatas": [[{"chunk_index": 2}, {"chunk_index": 1}]],
+            "distances": [[0.1, 0.2]],
+        }
+
+
+class DictCache:
+    def __init__(self) -> None:
+        self.entries: dict[str, object] = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, expire=None):
+        self.entries[key] = value
+
+
+TAGGED_INCOME = {
+    "ids": ["ACC-123:7", "ACC-123:5"],
+    "documents": ["Net income 100", "Net sales 1,000"],
+    "metadatas": [
+        {"chunk_index": 7, "statement_type": "income_statement"},
+        {"chunk_index": 5, "statement_type": "income_statement"},
+    ],
+}
+
+
+def _patch_collection(monkeypatch, dummy_collection: DummyCollection) -> None:
+    class DummyChromaClient:
+        async def get_query_collections_or_raise(self, collection_name: str, *, cache, ticker):
+            return [dummy_collection]
+
+    monkeypatch.setattr(extract_financial_statements_impl, "chroma_client", DummyChromaClient())
+
+    class DummyManifest:
+        def get(self, accession_number: str):
+            return None
+
+    monkeypatch.setattr(extract_financial_statements_impl, "ingestion_manifest", DummyManifest())
+
+
 def test_extract_financial_statement_preserves_chunk_index_order(monkeypatch):
     async def run():
-        class DummyCollection:
-            def __init__(self) -> None:
-                self.query_calls: list[dict[str, object]] = []
+        dummy_collection = DummyCollection()
+        _patch_collection(monkeypatch, dummy_collection)
+        monkeypatch.delenv("RAG_EMBED_MODEL", raising=False)
+
+        result = await extract_financial_statements_impl.extract_financial_statement_impl(
+            accession_number="ACC-123",
+            statement_type="income_statement",
+        )
+
+        EXPECTED_CHUNKS_SIZE = 2
+        assert result.chunks_returned == EXPECTED_CHUNKS_SIZE
+        assert result.statement_text == "first chunk\nsecond chunk"
+        assert result.lookup_mode == "vector"
 
-            def query(self, *, where, include, n_results, **kwargs) -> dict:
-                self.query_calls.append({"where": where, **kwargs})
-                return {}
+    asyncio.run(run())
 
-        class DummyChromaClient:
-            async def get_collection_or_raise(self, *, collection_name: str, cache=None):
-                return dummy_collection
 
-        dummy_collection = DummyCollection()
+def test_extract_financial_statement_uses_tagged_chunks_without_embedding(monkeypatch, tmp_path):
+    async def run():
+        dummy_collection = DummyCollection(tagged=TAGGED_INCOME)
+        _patch_collection(monkeypatch, dummy_collection)
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        manifest.mark_ingested("ACC-123", chunk_count=8, collection_name="edgar_filings")
+        monkeypatch.setattr(extract_financial_statements_impl, "ingestion_manifest", manifest)
+
+        def fail_resolve(_name):
+            pytest.fail("Embedding model should not be resolved for tagged statements")
+
         monkeypatch.setattr(
             extract_financial_statements_impl,
-            "chroma_client",
-            DummyChromaClient(),
+            "embedding_registry",
+            EmbeddingRegistry(resolver=fail_resolve),
         )
+        monkeypatch.setenv("RAG_EMBED_MODEL", "default")
 
-        def fake_flatten(_results: dict[str, object]) -> list[dict[str, object]]:
-            return [
-                {"document": "second chunk", "metadata": {"chunk_index": 2}},
-                {"document": "first chunk", "metadata": {"chunk_index": 1}},
-            ]
+        cache = DictCache()
+        for _ in range(2):
+            result = await extract_financial_statements_impl.extract_financial_statement_impl(
+                accession_number="ACC-123",
+                statement_type="income_statement",
+                cache=cache,
+            )
+            assert result.statement_text == "Net sales 1,000\nNet income 100"
+            assert result.lookup_mode == "metadata"
 
-        monkeypatch.setattr(
-            extract_financial_statements_impl,
-            "flatten_chroma_query_results",
-            fake_flatten,
+        assert dummy_collection.query_calls == []
+        assert dummy_collection.get_calls == [
+            {
+                "where": {
+                    "$and": [
+                        {"accession_number": "ACC-123"},
+                        {"statement_type": "income_statement"},
+                    ]
+                },
+                "include": ["documents", "metadatas"],
+            }
+        ]
+
+    asyncio.run(run())
+
+
+def test_extract_financial_statements_reads_all_types_in_one_get(monkeypatch):
+    async def run():
+        dummy_collection = DummyCollection(
+            tagged={
+                "ids": ["ACC-9:4", "ACC-9:2", "ACC-9:3"],
+                "documents": ["Total assets 500", "Net sales 1,000", "Net income 100"],
+                "metadatas": [
+                    {"chunk_index": 4, "statement_type": "balance_sheet"},
+                    {"chunk_index": 2, "statement_type": "income_statement"},
+                    {"chunk_index": 3, "statement_type": "income_statement"},
+                ],
+            }
         )
+        _patch_collection(monkeypatch, dummy_collection)
         monkeypatch.delenv("RAG_EMBED_MODEL", raising=False)
 
+        result = await extract_financial_statements_impl.extract_financial_statements_impl(
+            accession_number="ACC-9"
+        )
+
+        assert result.chunk_counts == {
+            "income_statement": 2,
+            "balance_sheet": 1,
+            "cash_flow_statement": 2,
+        }
+        income = result.get("income_statement")
+        assert income is not None
+        assert income.statement_text == "Net sales 1,000\nNet income 100"
+        assert income.lookup_mode == "metadata"
+        # The untagged cash flow statement falls back to a single vector query.
+        assert result.get("cash_flow_statement").lookup_mode == "vector"
+        assert len(dummy_collection.get_calls) == 1
+        assert len(dummy_collection.query_calls) == 1
+
+    asyncio.run(run())
+
+
+def test_extract_financial_statements_routes_by_caller_ticker_or_searches_every_shard(
+    monkeypatch,
+):
+    async def run():
+        empty = DummyCollection()
+        holder = DummyCollection(
+            tagged={
+                "ids": ["ACC-7:1"],
+                "documents": ["Net sales 1,000"],
+                "metadatas": [{"chunk_index": 1, "statement_type": "income_statement"}],
+            }
+        )
+        routed: list[str | None] = []
+
+        class ShardedChromaClient:
+            async def get_query_collections_or_raise(self, collection_name: str, *, cache, ticker):
+                routed.append(ticker)
+                return [holder] if ticker else [empty, holder]
+
+        _patch_collection(monkeypatch, empty)
+        monkeypatch.setattr(
+            extract_financial_statements_impl, "chroma_client", ShardedChromaClient()
+        )
+
+        # Not in the manifest: the caller's ticker picks the shard.
+        await extract_financial_statements_impl.extract_financial_statement_impl(
+            accession_number="ACC-7", statement_type="income_statement", ticker="MSFT"
+        )
+        # No ticker anywhere: every shard is read and the holder's chunks are found.
         result = await extract_financial_statements_impl.extract_financial_statement_impl(
-            accession_number="ACC-123",
-            statement_type="income_statement",
+            accession_number="ACC-7", statement_type="income_statement"
         )
+        assert routed == ["MSFT", None]
+        assert result.statement_text == "Net sales 1,000"
+        assert result.lookup_mode == "metadata"
+        assert len(empty.get_calls) == 1
 
-        EXPECTED_CHUNKS_SIZE = 2
-        assert result.chunks_returned == EXPECTED_CHUNKS_SIZE
-        assert result.statement_text == "first chunk\nsecond chunk"
+    asyncio.run(run())
+
+
+def test_extract_financial_statement_is_not_cached_until_ingest_finishes(monkeypatch, tmp_path):
+    async def run():
+        dummy_collection = DummyCollection(tagged=TAGGED_INCOME)
+        _patch_collection(monkeypatch, dummy_collection)
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        monkeypatch.setattr(extract_financial_statements_impl, "ingestion_manifest", manifest)
+        cache = DictCache()
+
+        async def extract():
+            return await extract_financial_statements_impl.extract_financial_statement_impl(
+                accession_number="ACC-123", statement_type="income_statement", cache=cache
+            )
+
+        # Chunks are being upserted in batches: a read now may see a partial statement.
+        manifest.mark_ingesting("ACC-123", collection_name="edgar_filings")
+        await extract()
+        assert cache.entries == {}
+
+        manifest.mark_ingested("ACC-123", chunk_count=8, collection_name="edgar_filings")
+        await extract()
+        await extract()
+        assert len(cache.entries) == 1
+        assert len(dummy_collection.get_calls) == len(["ingesting", "ingested"])
+
+        # A repair re-ingests the filing; the statement cached from the old chunks is not used.
+        manifest.mark_ingested("ACC-123", chunk_count=8, collection_name="edgar_filings")
+        await extract()
+        assert len(dummy_collection.get_calls) == len(["ingesting", "ingested", "repaired"])
 
     asyncio.run(run())
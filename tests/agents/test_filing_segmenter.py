@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from llama_index.core.schema import TextNode
+
+from src.agent_tools.edgar.filing_segmenter import (
+    NO_STATEMENT,
+    PREAMBLE_SECTION,
+    infer_section_topics,
+    segment_filing,
+)
+from src.agent_tools.edgar.upsert_edgar_report_impl import _parse_filing
+
+LEGACY_MAX_TEXT_LEN = 5000
+BODY = "The company designs, manufactures and markets smartphones and personal computers. " * 2
+
+
+def _nodes(*texts: str) -> list[TextNode]:
+    return [TextNode(text=text) for text in texts]
+
+
+def test_segment_filing_builds_item_tree_and_tags_statements():
+    raw_nodes = _nodes(
+        "Item 1. Business 3 Item 1A. Risk Factors 9 Item 7. Management's Discussion 21 "
+        "Item 8. Financial Statements 30",
+        "Item 1. Business",
+        BODY,
+        "ITEM 1A. RISK FACTORS",
+        "Risk: " + BODY,
+        "Item 7. Management's Discussion and Analysis of Financial Condition",
+        "MD&A: " + BODY,
+        "Item 8. Financial Statements and Supplementary Data",
+        "CONSOLIDATED STATEMENTS OF OPERATIONS",
+        "Net sales 391,035 383,285",
+        "CONSOLIDATED BALANCE SHEETS",
+        "Total assets 364,980 352,583",
+        "Notes to Consolidated Financial Statements",
+        "Note 1: " + BODY,
+    )
+
+    outline = segment_filing(raw_nodes, "10-K")
+
+    assert [s.section_id for s in outline.sections] == [
+        PREAMBLE_SECTION,
+        "item_1",
+        "item_1a",
+        "item_7",
+        "item_8",
+    ]
+    item_8 = outline.section("item_8")
+    assert item_8 is not None
+    assert [s.statement_type for s in item_8.statements] == ["income_statement", "balance_sheet"]
+
+    tags = [(n.metadata["section"], n.metadata["statement_type"]) for n in outline.nodes]
+    assert tags == [
+        (PREAMBLE_SECTION, NO_STATEMENT),
+        ("item_1", NO_STATEMENT),
+        ("item_1a", NO_STATEMENT),
+        ("item_7", NO_STATEMENT),
+        ("item_8", "income_statement"),
+        ("item_8", "income_statement"),
+        ("item_8", "balance_sheet"),
+        ("item_8", "balance_sheet"),
+        ("item_8", NO_STATEMENT),
+    ]
+    assert outline.section("item_7").title.startswith("Management's Discussion")
+
+
+def test_segment_filing_keeps_long_nodes_and_qualifies_10q_parts():
+    long_text = "Revenue grew across every segment. " * 300
+    raw_nodes = _nodes(
+        "PART I",
+        "Item 2. Management's Discussion and Analysis",
+        long_text,
+        "PART II",
+        "Item 1A. Risk Factors",
+        "Risk: " + BODY,
+    )
+
+    outline = segment_filing(raw_nodes, "10-Q")
+
+    assert [n.metadata["section"] for n in outline.nodes] == [
+        "part_i_item_2",
+        "part_ii_item_1a",
+    ]
+    assert len(outline.nodes[0].text) > LEGACY_MAX_TEXT_LEN
+
+
+def test_infer_section_topics_maps_question_intent_to_sections():
+    assert infer_section_topics("What risks did NVIDIA flag?") == ["risk_factors"]
+    assert infer_section_topics("How did gross margin and guidance change?") == ["mdna"]
+    assert infer_section_topics("Summarize the balance sheet", "AAPL risk factors") == [
+        "risk_factors",
+        "financial_statements",
+    ]
+    assert infer_section_topics("Tell me about Apple") == []
+
+
+def test_parse_filing_keeps_every_chunk_of_a_long_narrative_section():
+    sentences = [f"Risk {i}: supply constraints could reduce our margins." for i in range(100)]
+    narrative = " ".join(sentences)
+    html = (
+        "<html><body>"
+        "<div>Item 7. Management's Discussion and Analysis of Financial Condition</div>"
+        f"<div>{narrative}</div>"
+        "</body></html>"
+    )
+
+    nodes, _ = _parse_filing(
+        html, "https://sec.example/filing.htm", {"form": "10-K"}, "0000000000-24-000001"
+    )
+
+    assert len(nodes) > 1
+    text = " ".join(node.text for node in nodes)
+    assert all(sentence in text for sentence in sentences)
@@ -1,10 +1,13 @@
 import json
 from unittest.mock import MagicMock
 
+import numpy as np
 import pytest
 
 from clients.model_client import ModelClient
 from src.agents.analyst.fundamental.fundamental_analyst_agent import FundamentalAnalystAgent
+from src.agents.analyst.fundamental.metrics import MetricsCache
+from src.agents.analyst.fundamental.prompt_budget import budget_prompt_sections
 from src.models.fundamental_analyst import FundamentalAnalystOutput
 from src.models.fundamentals import (
     FinancialReportEntry,
@@ -12,8 +15,10 @@ from src.models.fundamentals import (
     FinancialReportSection,
     FundamentalDTO,
 )
+from src.models.news_sentiments import NewsSentiment
 from src.models.rag_retrieve import EdgarSearchMetaData, FilingResult, SearchReportsOutput
 from src.models.retrieval_agent import RetrievalAgentMetadata, RetrievalAgentOutput
+from src.utils.tokenizer import Tokenizer
 
 
 @pytest.fixture
@@ -119,5 +124,195 @@ async def test_fundamental_analyst_agent_process(mock_retrieval_output):
     # Extract the actual call arguments for AnalyzeWithLLMNode
     call_args = mock_model_client.generate_completion.call_args_list[1]
     user_msg = call_args.kwargs["prompt"]
-    assert "Net Margin: 10.00%" in user_msg
-    assert "OCF / Net Income Ratio: 1.20" in user_msg
+    assert "| Metric | FY2021Q4 (10-K) |" in user_msg
+    assert "| Net Margin | 10.00% |" in user_msg
+    assert "| OCF / Net Income | 1.20 |" in user_msg
+    # Ratios whose inputs were never reported are left out of the table.
+    assert "Current Ratio" not in user_msg
+    assert "### Filings Context\nApple is doing well." in user_msg
+    assert result.prompt_tokens and result.prompt_tokens > 0
+
+
+def _entry(year: int, quarter: int, accession: str, **values: float) -> FinancialReportEntry:
+    concepts = {
+        "revenue": ("ic", "RevenueFromContractWithCustomerExcludingAssessedTax"),
+        "legacy_revenue": ("ic", "SalesRevenueNet"),
+        "operating_income": ("ic", "OperatingIncomeLoss"),
+        "net_income": ("ic", "NetIncomeLoss"),
+        "ocf": ("cf", "NetCashProvidedByUsedInOperatingActivities"),
+        "capex": ("cf", "PaymentsToAcquirePropertyPlantAndEquipment"),
+        "interest": ("ic", "InterestExpense"),
+        "tax": ("ic", "IncomeTaxExpenseBenefit"),
+        "pretax": (
+            "ic",
+            "IncomeLossFromContinuingOperationsBeforeIncomeTaxesExtraordinaryItemsNoncontrollingInterest",
+        ),
+        "current_assets": ("bs", "AssetsCurrent"),
+        "current_liabilities": ("bs", "LiabilitiesCurrent"),
+        "inventory": ("bs", "InventoryNet"),
+        "cash": ("bs", "CashAndCashEquivalentsAtCarryingValue"),
+        "equity": ("bs", "StockholdersEquity"),
+        "long_term_debt": ("bs", "LongTermDebtNoncurrent"),
+        "short_term_debt": ("bs", "LongTermDebtCurrent"),
+    }
+    report = FinancialReportSection()
+    for name, value in values.items():
+        section, concept = concepts[name]
+        getattr(report, section).append(
+            FinancialReportLineItem(concept=concept, unit="USD", label=name, value=value)
+        )
+    return FinancialReportEntry(
+        accessNumber=accession,
+        symbol="AAPL",
+        cik="0000320193",
+        year=year,
+        quarter=quarter,
+        form="10-Q",
+        startDate="",
+        endDate="",
+        filedDate=f"{year}-0{quarter}-28",
+        acceptedDate=f"{year}-0{quarter}-28",
+        report=report,
+    )
+
+
+def test_metrics_engine_computes_growth_across_periods_and_caches_by_accessions():
+    fundamentals = FundamentalDTO(
+        cik="0000320193",
+        symbol="AAPL",
+        data=[
+            _entry(2023, 2, "ACC-3", revenue=1320, operating_income=330, net_income=264),
+            _entry(2022, 2, "ACC-1", revenue=1000, legacy_revenue=1, operating_income=200),
+            _entry(2023, 1, "ACC-2", revenue=1200, net_income=240, ocf=300),
+        ],
+    )
+    cache = MetricsCache()
+    metrics = cache.get(fundamentals)
+
+    assert [period.label for period in metrics.periods] == ["FY2022Q2", "FY2023Q1", "FY2023Q2"]
+    # The preferred alias wins over a synonym reported alongside it.
+    np.testing.assert_allclose(metrics.concept("revenue"), [1000, 1200, 1320])
+    np.testing.assert_allclose(metrics.series["revenue_growth_yoy"], [np.nan, np.nan, 0.32])
+    np.testing.assert_allclose(metrics.series["revenue_growth_qoq"], [np.nan, np.nan, 0.1])
+    np.testing.assert_allclose(metrics.series["operating_margin_delta_yoy"], [np.nan, np.nan, 0.05])
+    np.testing.assert_allclose(metrics.series["ocf_to_net_income"], [np.nan, 1.25, np.nan])
+
+    table = metrics.summary_table()
+    assert "| Metric | FY2022Q2 (10-Q) | FY2023Q1 (10-Q) | FY2023Q2 (10-Q) |" in table
+    assert "| Revenue Growth YoY | n/a | n/a | +32.00% |" in table
+    assert "| Operating Margin Change YoY | n/a | n/a | +5.00 pp |" in table
+    assert "| Net Income | n/a | 240 | 264 |" in table
+    assert "| Revenue | 1.00K | 1.20K | 1.32K |" in table
+    assert "Debt / Equity" not in table
+    assert "FY2022Q2" not in metrics.summary_table(max_periods=2)
+
+    reordered = fundamentals.model_copy(update={"data": list(reversed(fundamentals.data))})
+    assert cache.get(reordered) is metrics
+    newer = fundamentals.model_copy(
+        update={"data": [*fundamentals.data, _entry(2023, 3, "ACC-4", revenue=1400)]}
+    )
+    assert cache.get(newer) is not metrics
+
+
+def test_ratio_library_reads_balance_sheet_concepts():
+    fundamentals = FundamentalDTO(
+        cik="0000320193",
+        symbol="AAPL",
+        data=[
+            _entry(
+                2023,
+                4,
+                "ACC-1",
+                revenue=1000,
+                operating_income=200,
+                net_income=150,
+                ocf=180,
+                capex=30,
+                interest=20,
+                tax=40,
+                pretax=200,
+                current_assets=600,
+                current_liabilities=300,
+                inventory=150,
+                cash=100,
+                equity=1000,
+                long_term_debt=400,
+                short_term_debt=100,
+            )
+        ],
+    )
+    metrics = MetricsCache().get(fundamentals)
+
+    expected = {
+        "current_ratio": 2.0,
+        "quick_ratio": 1.5,
+        "debt_to_equity": 0.5,
+        "interest_coverage": 10.0,
+        "roe": 0.15,
+        # NOPAT 200 * (1 - 0.2) over invested capital 400 + 100 + 1000 - 100
+        "roic": 160 / 1400,
+        "free_cash_flow": 150.0,
+        "fcf_margin": 0.15,
+    }
+    for name, value in expected.items():
+        np.testing.assert_allclose(metrics.series[name], [value])
+
+    table = metrics.summary_table()
+    assert "| Current Ratio | 2.00 |" in table
+    assert "| Debt / Equity | 0.50 |" in table
+    assert "| ROIC | 11.43% |" in table
+    assert "| Interest Coverage | 10.00 |" in table
+    assert "| Free Cash Flow | 150 |" in table
+
+
+def _news(title: str) -> NewsSentiment:
+    return NewsSentiment(
+        title=title,
+        source="Wire",
+        url="https://example.com",
+        summary="",
+        topics=[],
+        overall_sentiment_score=0.1,
+        overall_sentiment_label="Neutral",
+        ticker_sentiment=[],
+        time_published="20240101T000000",
+    )
+
+
+def test_prompt_budget_fits_each_section_and_passes_spare_tokens_on():
+    tokenizer = Tokenizer()  # characters-per-token estimate, deterministic offline
+    filings = "\n\n".join(f"[{i}] AAPL | 10-K | Item 7\n" + "Sales grew. " * 40 for i in range(5))
+    news = [_news(f"Headline {i}") for i in range(30)] + [_news("headline 0")]
+    budgets = {"objectives": 50, "metrics": 100, "filings": 300, "news": 60}
+
+    budget = budget_prompt_sections(
+        objectives="Assess liquidity.",
+        metrics=None,
+        metrics_summary="| Metric | FY2024Q1 (10-Q) |",
+        filings_context=filings,
+        news=news,
+        budgets=budgets,
+        tokenizer=tokenizer,
+    )
+
+    filings_section = budget.sections["filings"]
+    assert filings_section.truncated
+    # Unused objective and metric tokens are handed on to the filing context.
+    assert budgets["filings"] < filings_section.tokens <= sum(budgets.values())
+    assert filings_section.text.startswith("[0] AAPL")
+    assert filings_section.text.endswith("Sales grew.")
+    news_section = budget.sections["news"]
+    assert news_section.truncated
+    assert news_section.text.endswith("more headlines omitted")
+    assert news_section.text.count("Headline 0 ") == 1
+    assert budget.tokens <= sum(budgets.values())
+    assert budget.metrics_summary().startswith("### Financial Metrics\n| Metric |")
+    assert budget == budget_prompt_sections(
+        objectives="Assess liquidity.",
+        metrics=None,
+        metrics_summary="| Metric | FY2024Q1 (10-Q) |",
+        filings_context=filings,
+        news=news,
+        budgets=budgets,
+        tokenizer=tokenizer,
+    )
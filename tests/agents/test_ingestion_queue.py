@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+
+from src.agent_tools.edgar.ingestion_manifest import IngestionManifest
+from src.agent_tools.edgar.ingestion_pipeline import (
+    AdaptiveBatchSizer,
+    IngestionMetrics,
+    run_stages,
+)
+from src.agent_tools.edgar.ingestion_queue import IngestionQueue
+from src.models.edgar_ingestion import IngestionJobStatus, IngestionRequest
+
+
+def _request(accession_number: str) -> IngestionRequest:
+    return IngestionRequest(
+        href=f"https://edgar/{accession_number}",
+        metadata={"accession_number": accession_number, "ticker": "AAPL"},
+    )
+
+
+def test_ingestion_queue_dedupes_and_reports_partial_coverage(tmp_path):
+    async def run():
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        release_slow = asyncio.Event()
+        ingest_calls: list[str] = []
+
+        async def fake_ingest(href: str, metadata: dict, collection_name: str) -> None:
+            accession_number = metadata["accession_number"]
+            ingest_calls.append(accession_number)
+            if accession_number == "ACC-SLOW":
+                await release_slow.wait()
+            manifest.mark_ingested(accession_number, chunk_count=3, collection_name=collection_name)
+
+        queue = IngestionQueue(
+            str(tmp_path / "queue"), workers=2, ingest=fake_ingest, manifest=manifest
+        )
+
+        await queue.enqueue([_request("ACC-FAST"), _request("ACC-SLOW")], "edgar_filings")
+        duplicate = await queue.enqueue([_request("ACC-SLOW")], "edgar_filings")
+        assert duplicate.jobs[0].status == IngestionJobStatus.QUEUED
+
+        report = await queue.wait(["ACC-FAST", "ACC-SLOW", "ACC-NONE"], timeout=0.2)
+        statuses = {job.accession_number: job.status for job in report.jobs}
+        assert statuses == {
+            "ACC-FAST": IngestionJobStatus.SUCCEEDED,
+            "ACC-SLOW": IngestionJobStatus.RUNNING,
+        }
+        assert report.unfinished == ["ACC-SLOW"]
+        assert report.unknown == ["ACC-NONE"]
+
+        release_slow.set()
+        report = await queue.wait(["ACC-SLOW"], timeout=1)
+        assert report.jobs[0].status == IngestionJobStatus.SUCCEEDED
+        assert sorted(ingest_calls) == ["ACC-FAST", "ACC-SLOW"]
+
+    asyncio.run(run())
+
+
+def test_ingestion_queue_marks_job_failed_when_manifest_not_ingested(tmp_path):
+    async def run():
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+
+        async def failing_ingest(href: str, metadata: dict, collection_name: str) -> None:
+            manifest.mark_ingesting(metadata["accession_number"], collection_name=collection_name)
+            manifest.mark_failed(metadata["accession_number"], "empty filing content")
+
+        queue = IngestionQueue(
+            str(tmp_path / "queue"), workers=1, ingest=failing_ingest, manifest=manifest
+        )
+        await queue.enqueue([_request("ACC-BAD")], "edgar_filings")
+        report = await queue.wait(["ACC-BAD"], timeout=1)
+
+        job = report.jobs[0]
+        assert job.status == IngestionJobStatus.FAILED
+        assert job.error == "empty filing content"
+        assert job.attempts == 1
+
+    asyncio.run(run())
+
+
+def test_ingestion_queue_recovers_unfinished_jobs_on_restart(tmp_path):
+    async def enqueue_only():
+        async def never_called(*args, **kwargs) -> None:
+            raise AssertionError("first process should not run the job")
+
+        queue = IngestionQueue(str(tmp_path / "queue"), workers=1, ingest=never_called)
+        # Stop the workers before they pick the job up, as if the process died.
+        queue.start()
+        for task in queue._worker_tasks:
+            task.cancel()
+        await queue.enqueue([_request("ACC-RECOVER")], "edgar_filings")
+
+    async def restart():
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+
+        async def fake_ingest(href: str, metadata: dict, collection_name: str) -> None:
+            manifest.mark_ingested(
+                metadata["accession_number"], chunk_count=1, collection_name=collection_name
+            )
+
+        queue = IngestionQueue(
+            str(tmp_path / "queue"), workers=1, ingest=fake_ingest, manifest=manifest
+        )
+        # Startup alone resumes the job; nobody has to enqueue or wait first.
+        queue.start()
+        for _ in range(100):
+            job = queue.get("ACC-RECOVER")
+            if job is not None and job.is_finished:
+                break
+            await asyncio.sleep(0.01)
+        assert job.status == IngestionJobStatus.SUCCEEDED
+        await queue.stop()
+
+    asyncio.run(enqueue_only())
+    asyncio.run(restart())
+
+
+def test_ingestion_queue_replaces_only_dead_workers(tmp_path):
+    async def run():
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        release = asyncio.Event()
+
+        async def blocking_ingest(href: str, metadata: dict, collection_name: str) -> None:
+            await release.wait()
+            manifest.mark_ingested(
+                metadata["accession_number"], chunk_count=1, collection_name=collection_name
+            )
+
+        queue = IngestionQueue(
+            str(tmp_path / "queue"), workers=2, ingest=blocking_ingest, manifest=manifest
+        )
+        queue.start()
+        shared_queue = queue._queue
+        survivor, doomed = queue._worker_tasks
+        doomed.cancel()
+        await asyncio.sleep(0)
+
+        await queue.enqueue([_request("ACC-1"), _request("ACC-2")], "edgar_filings")
+        assert queue._queue is shared_queue
+        assert queue._worker_tasks[0] is survivor
+        assert not queue._worker_tasks[1].done()
+
+        release.set()
+        report = await queue.wait(["ACC-1", "ACC-2"], timeout=1)
+        assert {job.status for job in report.jobs} == {IngestionJobStatus.SUCCEEDED}
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+MIN_BATCH, INITIAL_BATCH, MAX_BATCH = 8, 16, 32
+
+
+def test_adaptive_batch_sizer_tracks_embedding_latency():
+    sizer = AdaptiveBatchSizer(
+        initial=INITIAL_BATCH, min_size=MIN_BATCH, max_size=MAX_BATCH, target_seconds=1.0
+    )
+
+    sizer.observe(INITIAL_BATCH, 0.1)
+    assert sizer.size == INITIAL_BATCH + INITIAL_BATCH // 2
+    sizer.observe(sizer.size, 0.1)
+    sizer.observe(sizer.size, 0.1)
+    assert sizer.size == MAX_BATCH
+
+    for _ in range(3):
+        sizer.observe(sizer.size, 2.0)
+    assert sizer.size == MIN_BATCH
+
+    batches = []
+    for batch in sizer.batches(list(range(20))):
+        batches.append(batch)
+        sizer.observe(len(batch), 0.1)
+    assert [len(batch) for batch in batches] == [8, 12]
+
+
+def test_run_stages_bounds_queues_and_records_stage_metrics():
+    queue_depth = 2
+    batches = [[index] * 3 for index in range(10)]
+
+    async def run():
+        metrics = IngestionMetrics()
+        produced: list[int] = []
+        release_upsert = asyncio.Event()
+
+        def source():
+            for batch in batches:
+                produced.append(batch[0])
+                yield batch
+
+        async def embed(batch):
+            return [value * 10 for value in batch]
+
+        async def upsert(batch):
+            await release_upsert.wait()
+            return batch[0]
+
+        task = asyncio.create_task(
+            run_stages(
+                source(),
+                [("embed", embed, 2), ("upsert", upsert, 1)],
+                queue_depth=queue_depth,
+                metrics=metrics,
+            )
+        )
+        await asyncio.sleep(0.05)
+        # With the upsert stalled, only a couple of queues' worth of batches get pulled.
+        assert len(produced) < len(batches)
+
+        release_upsert.set()
+        results = await task
+        assert sorted(results) == [index * 10 for index in range(len(batches))]
+        return metrics.stats()
+
+    stats = asyncio.run(run())
+    assert stats["embed"]["items"] == sum(len(batch) for batch in batches)
+    assert stats["upsert"]["batches"] == len(batches)
+    assert stats["upsert"]["max_in_flight"] == 1
+    assert stats["upsert"]["max_queue_depth"] <= queue_depth
+    assert stats["embed"]["errors"] == 0
@@ -4,7 +4,10 @@ import asyncio
 from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock
 
+import numpy as np
+
 from src.agents.analyst.news.news_analyst_agent import NewsAnalystAgent
+from src.agents.analyst.news.news_frame import NewsFrame, aggregate_tickers
 from src.agents.analyst.news.pipeline import AggregationNode, NewsAnalystPipelineState
 from src.models.news_sentiments import NewsSentiment, NewsTickerSentiment
 from src.models.retrieval_agent import RetrievalAgentMetadata, RetrievalAgentOutput
@@ -122,23 +125,71 @@ def test_aggregation_logic():
 
         # Verify relevance and ticker filtering
         # 1. 'Irrelevant News' (relevance 0.5) skipped.
-        # 2. 'NVIDIA Breakthrough' (wrong ticker NVDA) skipped.
-        # 3. AAPL rollup based on Item #1 (Item #2 is duplicate).
+        # 2. AAPL rollup based on Item #1 (Item #2 is duplicate).
+        # 3. 'NVIDIA Breakthrough' gets its own NVDA rollup but no say in the AAPL score.
         RELEVANCE_THRESHOLD = 0.8
         assert "AAPL" in state.ticker_rollups
         assert state.ticker_rollups["AAPL"].sentiment_label == "bullish"
         assert state.ticker_rollups["AAPL"].sentiment_score == RELEVANCE_THRESHOLD
 
-        # 'NVDA' or 'SPY' shouldn't be here
-        assert "NVDA" not in state.ticker_rollups
+        assert state.overall_score == RELEVANCE_THRESHOLD
+
+        # Every highly relevant ticker gets a rollup; unmentioned ones don't
+        assert state.ticker_rollups["NVDA"].top_headlines == ["NVIDIA Breakthrough"]
         assert "SPY" not in state.ticker_rollups
 
-        # Only AAPL headlines should be in the rollups
-        all_headlines = []
-        for r in state.ticker_rollups.values():
-            all_headlines.extend(r.top_headlines)
-        assert "Irrelevant News" not in all_headlines
-        assert "NVIDIA Breakthrough" not in all_headlines
-        assert "Apple releases new iPhone" in all_headlines
+        # Only relevant AAPL headlines should be in the AAPL rollup
+        aapl_headlines = state.ticker_rollups["AAPL"].top_headlines
+        assert "Irrelevant News" not in aapl_headlines
+        assert "NVIDIA Breakthrough" not in aapl_headlines
+        assert aapl_headlines == ["Apple releases new iPhone"]
 
     asyncio.run(run())
+
+
+def test_news_frame_aggregates_every_ticker_in_one_pass():
+    def article(title: str, published: str, *mentions: tuple[str, str, str]) -> NewsSentiment:
+        return NewsSentiment(
+            title=title,
+            source="Wire",
+            url=title,
+            summary="",
+            topics=[],
+            overall_sentiment_score="not-a-number",
+            overall_sentiment_label="Neutral",
+            ticker_sentiment=[
+                NewsTickerSentiment(
+                    ticker=ticker,
+                    relevance_score=relevance,
+                    ticker_sentiment_score=score,
+                    ticker_sentiment_label="",
+                )
+                for ticker, relevance, score in mentions
+            ],
+            time_published=published,
+        )
+
+    now = datetime(2024, 1, 2, tzinfo=UTC)
+    frame = NewsFrame.from_articles(
+        [
+            article("A", "20240101T000000", ("MSFT", "0.9", "0.5"), ("AAPL", "0.9", "-0.5")),
+            article("B", "2024-01-02T00:00:00", ("MSFT", "1.0", "-0.5")),
+            article("C", "garbage", ("MSFT", "0.95", "0.1")),
+            article("D", "20240102T000000", ("MSFT", "0.85", "0.2"), ("TSLA", "0.1", "1")),
+        ]
+    )
+    weights = frame.recency_weights(now)
+    # A is one half-life old; C's unreadable timestamp counts as just published.
+    np.testing.assert_allclose(weights, [0.5, 1.0, 1.0, 1.0])
+    assert frame.invalid_timestamps == ["C"]
+    np.testing.assert_array_equal(frame.sentiment, np.zeros(len(frame)))
+
+    aggregates = aggregate_tickers(frame, weights, min_relevance=0.8, top_n=3)
+    msft, aapl, tsla = (frame.tickers.index(t) for t in ("MSFT", "AAPL", "TSLA"))
+    mention_weights = np.array([0.45, 1.0, 0.95, 0.85])
+    expected = (mention_weights * [0.5, -0.5, 0.1, 0.2]).sum() / mention_weights.sum()
+    np.testing.assert_allclose(aggregates.score[msft], expected)
+    np.testing.assert_allclose(aggregates.score[aapl], -0.5)
+    assert aggregates.mentions[tsla] == 0
+    # Heaviest mentions first, capped at top_n
+    assert [frame.titles[i] for i in aggregates.top_articles[msft]] == ["B", "C", "D"]
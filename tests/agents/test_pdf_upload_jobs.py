@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import io
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+
+from src.agent_tools.rag.pdf_upload_jobs import PdfUploadJobs, UploadTooLargeError
+from src.models.edgar_ingestion import IngestionJobStatus
+from src.models.rag_upload import PdfUploadJob
+
+PDF_BYTES = b"%PDF-1.7\n" + b"x" * 5000
+EXPECTED_PAGES, EXPECTED_CHUNKS = 2, 7
+
+
+def _upload(payload: bytes = PDF_BYTES) -> UploadFile:
+    return UploadFile(io.BytesIO(payload), filename="report.pdf")
+
+
+def test_pdf_upload_is_spooled_and_indexed_in_background(tmp_path):
+    async def run():
+        release = asyncio.Event()
+        spooled: list[bytes] = []
+
+        async def fake_index(job: PdfUploadJob) -> tuple[int, int]:
+            spooled.append(Path(job.spool_path).read_bytes())
+            await release.wait()
+            if job.company_name == "BROKEN":
+                raise RuntimeError("parse failed")
+            return EXPECTED_PAGES, EXPECTED_CHUNKS
+
+        jobs = PdfUploadJobs(
+            str(tmp_path / "jobs"), str(tmp_path / "spool"), workers=1, index=fake_index
+        )
+        submit = {
+            "collection_name": "finance_analyst_report_ACME",
+            "domain": "finance",
+            "corpus": "analyst_report",
+        }
+        job = await jobs.submit(_upload(), company_name="ACME", **submit)
+        broken = await jobs.submit(_upload(), company_name="BROKEN", **submit)
+        assert job.status == IngestionJobStatus.QUEUED
+        assert job.size_bytes == len(PDF_BYTES)
+
+        pending = await jobs.wait(job.job_id, timeout=0.05)
+        assert pending.status == IngestionJobStatus.RUNNING
+
+        release.set()
+        done = await jobs.wait(job.job_id, timeout=1)
+        failed = await jobs.wait(broken.job_id, timeout=1)
+        return done, failed, spooled
+
+    done, failed, spooled = asyncio.run(run())
+    assert spooled == [PDF_BYTES, PDF_BYTES]
+    assert done.status == IngestionJobStatus.SUCCEEDED
+    assert (done.pages, done.chunks_indexed) == (EXPECTED_PAGES, EXPECTED_CHUNKS)
+    assert failed.status == IngestionJobStatus.FAILED
+    assert failed.error == "parse failed"
+    assert list((tmp_path / "spool").iterdir()) == []
+
+
+def test_pdf_upload_over_size_limit_is_rejected(tmp_path):
+    async def run():
+        jobs = PdfUploadJobs(str(tmp_path / "jobs"), str(tmp_path / "spool"), max_bytes=1024)
+        with pytest.raises(UploadTooLargeError):
+            await jobs.submit(
+                _upload(),
+                collection_name="finance_analyst_report_ACME",
+                domain="finance",
+                corpus="analyst_report",
+                company_name="ACME",
+            )
+
+    asyncio.run(run())
+    assert list((tmp_path / "spool").iterdir()) == []
+
+
+def test_pdf_upload_jobs_resume_on_start(tmp_path):
+    async def run():
+        indexed: list[str] = []
+
+        async def fake_index(job: PdfUploadJob) -> tuple[int, int]:
+            indexed.append(job.job_id)
+            return EXPECTED_PAGES, EXPECTED_CHUNKS
+
+        spool = tmp_path / "spool"
+        spool.mkdir()
+        (spool / "kept.pdf").write_bytes(PDF_BYTES)
+        previous = PdfUploadJobs(str(tmp_path / "jobs"), str(spool), index=fake_index)
+        for job_id in ("kept", "lost"):
+            previous._save(
+                PdfUploadJob(
+                    job_id=job_id,
+                    file_name="report.pdf",
+                    collection_name="finance_analyst_report_ACME",
+                    spool_path=str(spool / f"{job_id}.pdf"),
+                    domain="finance",
+                    corpus="analyst_report",
+                    company_name="ACME",
+                    size_bytes=len(PDF_BYTES),
+                    status=IngestionJobStatus.RUNNING,
+                    enqueued_at=datetime.now(UTC),
+                )
+            )
+        previous.cache.close()
+
+        # A fresh process: starting up alone resumes the surviving upload.
+        jobs = PdfUploadJobs(str(tmp_path / "jobs"), str(spool), index=fake_index)
+        jobs.start()
+        await asyncio.gather(*jobs._tasks)
+        await jobs.stop()
+        return jobs.get("kept"), jobs.get("lost"), indexed
+
+    kept, lost, indexed = asyncio.run(run())
+    assert indexed == ["kept"]
+    assert kept.status == IngestionJobStatus.SUCCEEDED
+    assert lost.status == IngestionJobStatus.FAILED
+    assert list((tmp_path / "spool").iterdir()) == []
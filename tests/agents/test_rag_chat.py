@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent_tools.rag.embedding_reduction import get_embedding_reducer
+from src.routes import rag_route
+
+
+class DummyCollection:
+    def __init__(self):
+        self.query_embeddings: list[list[float]] = []
+
+    async def query(self, query_embeddings, n_results):
+        self.query_embeddings.extend(query_embeddings)
+        return {
+            "ids": [["chunk-1"]],
+            "documents": [["Revenue grew 12% on services strength."]],
+            "metadatas": [[{"source_file": "report.pdf", "page": 3}]],
+            "distances": [[0.1]],
+        }
+
+
+class DummyChromaClient:
+    def __init__(self):
+        self.opened: list[str] = []
+        self.collection = DummyCollection()
+
+    async def get_collection_or_raise(self, collection_name, *, cache, ticker=None):
+        self.opened.append(collection_name)
+        return self.collection
+
+
+class DummyEmbeddingRegistry:
+    async def aget_query_embedding(self, text, model_name=None):
+        return [0.1, 0.2]
+
+
+class DummyResponses:
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+
+        async def events():
+            yield SimpleNamespace(type="response.created")
+            for text in ("Revenue ", "grew 12%."):
+                yield SimpleNamespace(type="response.output_text.delta", delta=text)
+            yield SimpleNamespace(type="response.completed")
+
+        return events()
+
+
+def test_chat_stream_emits_sources_then_answer_deltas(monkeypatch):
+    chroma = DummyChromaClient()
+    responses = DummyResponses()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(rag_route, "chroma_client", chroma)
+    monkeypatch.setattr(rag_route, "embedding_registry", DummyEmbeddingRegistry())
+    monkeypatch.setattr(
+        rag_route, "get_async_openai_client", lambda api_key: SimpleNamespace(responses=responses)
+    )
+
+    async def run():
+        response = await rag_route.chat_stream(query="How did revenue do?", company_name="ACME")
+        assert response.media_type == "text/event-stream"
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = asyncio.run(run())
+    events = [json.loads(chunk.removeprefix("data: ")) for chunk in chunks]
+
+    assert [event["type"] for event in events] == ["sources", "delta", "delta", "done"]
+    assert events[0]["results"]["ids"] == [["chunk-1"]]
+    assert "".join(event["text"] for event in events if event["type"] == "delta") == (
+        "Revenue grew 12%."
+    )
+    assert chroma.opened == ["finance_analyst_report_ACME"]
+    assert responses.calls[0]["stream"] is True
+    assert "Revenue grew 12%" in responses.calls[0]["input"]
+
+
+def test_chat_context_reduces_the_query_like_the_stored_vectors(monkeypatch):
+    chroma = DummyChromaClient()
+    monkeypatch.setattr(rag_route, "chroma_client", chroma)
+    monkeypatch.setattr(rag_route, "embedding_registry", DummyEmbeddingRegistry())
+    monkeypatch.setenv("RAG_EMBED_REDUCTION", "matryoshka:1")
+    monkeypatch.setenv("RAG_EMBED_REDUCTION_COLLECTIONS", "finance_analyst_report_ACME")
+    get_embedding_reducer.cache_clear()
+    try:
+        asyncio.run(
+            rag_route._chat_context("How did revenue do?", "finance_analyst_report_ACME", 3)
+        )
+    finally:
+        get_embedding_reducer.cache_clear()
+
+    assert chroma.collection.query_embeddings == [[pytest.approx(1.0)]]
@@ -1,16 +1,50 @@
 from __future__ import annotations
 
 import asyncio
+import sqlite3
 
-from src.agent_tools.rag import retrieve_report_impl
+import numpy as np
+import pytest
+from diskcache import Cache
+
+from clients.chroma_client import ChromaClient
+from clients.embedding_registry import EmbeddingRegistry
+from src.agent_tools.edgar.ingestion_manifest import IngestionManifest
+from src.agent_tools.rag import fulltext_index, retrieve_report_impl
+from src.agent_tools.rag.context_builder import build_rag_context
+from src.agent_tools.rag.embedding_reduction import (
+    MatryoshkaReducer,
+    PcaReducer,
+    get_embedding_reducer,
+    recall_report,
+)
+from src.agent_tools.rag.fulltext_index import FullTextIndex
+from src.agent_tools.rag.hot_vector_cache import HotVectorCache
 from src.models.rag_retrieve import RAGRetrieveInput
+from src.utils.tokenizer import Tokenizer
+
+EXPECTED_QUERIES_AFTER_INGEST = 2
+CONTEXT_TOKEN_BUDGET = 400
+EXPECTED_QUERIES_BEFORE_PROMOTION = 2
+EXPECTED_SHARD_LOADS_AFTER_INGEST = 2
+
+
+@pytest.fixture(autouse=True)
+def disabled_hot_vector_cache(monkeypatch):
+    monkeypatch.setattr(
+        retrieve_report_impl,
+        "hot_vector_cache",
+        HotVectorCache(None, version_source=lambda collection_name, ticker: 0),
+    )
 
 
 class DummyCollection:
     def __init__(self) -> None:
         self.query_calls: list[dict[str, object]] = []
+        self.ids_calls: list[list[str] | None] = []
+        self.where_document_calls: list[dict[str, object] | None] = []
 
-    def query(
+    async def query(
         self,
         *,
         query_embeddings: list[object],
@@ -18,8 +52,11 @@ class DummyCollection:
         where: dict[str, object] | None,
         where_document: dict[str, object] | None,
         include: list[str],
+        ids: list[str] | None = None,
     ) -> dict[str, list[list[object]]]:
         self.query_calls.append(where or {})
+        self.ids_calls.append(ids)
+        self.where_document_calls.append(where_document)
         return {
             "ids": [["chunk-1"]],
             "documents": [["sample document"]],
@@ -38,12 +75,16 @@ def test_retrieve_report_normalizes_edgar_filters(monkeypatch):
         dummy_collection = DummyCollection()
 
         class DummyChromaClient:
-            async def get_collection_or_raise(self, collection_name: str, *, cache=None):
-                return dummy_collection
+            async def get_query_collections_or_raise(
+                self, collection_name: str, *, cache=None, ticker=None
+            ):
+                return [dummy_collection]
 
         monkeypatch.setattr(retrieve_report_impl, "chroma_client", DummyChromaClient())
         monkeypatch.setattr(
-            retrieve_report_impl, "resolve_embed_model", lambda name: DummyEmbedModel()
+            retrieve_report_impl,
+            "embedding_registry",
+            EmbeddingRegistry(resolver=lambda name: DummyEmbedModel()),
         )
 
         input_data = RAGRetrieveInput(
@@ -58,3 +99,521 @@ def test_retrieve_report_normalizes_edgar_filters(monkeypatch):
         assert result["filters"] == {"ticker": "AAPL", "form": "10-K"}
 
     asyncio.run(run())
+
+
+def _patch_retrieval(
+    monkeypatch,
+    dummy_collection: DummyCollection,
+    index: FullTextIndex,
+    manifest: IngestionManifest | None = None,
+) -> None:
+    class DummyChromaClient:
+        async def get_query_collections_or_raise(
+            self, collection_name: str, *, cache=None, ticker=None
+        ):
+            return [dummy_collection]
+
+    monkeypatch.setattr(retrieve_report_impl, "chroma_client", DummyChromaClient())
+    monkeypatch.setattr(
+        retrieve_report_impl,
+        "embedding_registry",
+        EmbeddingRegistry(resolver=lambda name: DummyEmbedModel()),
+    )
+    monkeypatch.setattr(retrieve_report_impl, "fulltext_index", index)
+    if manifest is not None:
+        monkeypatch.setattr(retrieve_report_impl, "ingestion_manifest", manifest)
+
+
+def _manifest(tmp_path, **chunk_counts: int) -> IngestionManifest:
+    """A manifest recording the filings `_indexed` holds, plus any `chunk_counts` for AAPL."""
+    manifest = IngestionManifest(str(tmp_path / "manifest"))
+    filings = {"ACC-1": ("AAPL", 2), "ACC-2": ("MSFT", 1)} | {
+        accession: ("AAPL", count) for accession, count in chunk_counts.items()
+    }
+    for accession, (ticker, count) in filings.items():
+        manifest.mark_ingested(
+            accession, chunk_count=count, collection_name="edgar_filings", ticker=ticker
+        )
+    return manifest
+
+
+def _indexed(tmp_path) -> FullTextIndex:
+    index = FullTextIndex(str(tmp_path / "fulltext.sqlite3"))
+    index.add_chunks(
+        "edgar_filings",
+        "ACC-1",
+        [
+            ("chunk-1", "sample document", {"ticker": "AAPL", "form": "10-K"}),
+            (
+                "chunk-2",
+                "No goodwill impairment was recorded in fiscal 2024.",
+                {"ticker": "AAPL", "form": "10-K"},
+            ),
+        ],
+    )
+    index.add_chunks(
+        "edgar_filings",
+        "ACC-2",
+        [("chunk-3", "Goodwill impairment at a peer.", {"ticker": "MSFT", "form": "10-K"})],
+    )
+    return index
+
+
+def test_retrieve_report_hybrid_fuses_keyword_and_vector_ranks(monkeypatch, tmp_path):
+    async def run():
+        dummy_collection = DummyCollection()
+        _patch_retrieval(monkeypatch, dummy_collection, _indexed(tmp_path), _manifest(tmp_path))
+
+        result = await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="goodwill impairment",
+                domain="edgar",
+                filters={"ticker": "AAPL"},
+                top_k=2,
+                retrieval_mode="hybrid",
+            )
+        )
+
+        # chunk-1 comes from the vector side, chunk-2 only from BM25; MSFT is filtered out.
+        assert [match["id"] for match in result["matches"]] == ["chunk-1", "chunk-2"]
+        assert result["retrieval_mode"] == "hybrid"
+
+    asyncio.run(run())
+
+
+class MultiQueryCollection(DummyCollection):
+    """Returns one ranking per query embedding; sub-queries surface different chunks."""
+
+    RANKINGS = (["chunk-1", "chunk-2"], ["chunk-3", "chunk-1"], ["chunk-4", "chunk-3"])
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.embedding_counts: list[int] = []
+
+    async def query(self, *, query_embeddings, n_results, **kwargs):
+        self.embedding_counts.append(len(query_embeddings))
+        rankings = self.RANKINGS[: len(query_embeddings)]
+        return {
+            "ids": [list(ids) for ids in rankings],
+            "documents": [[f"text of {chunk_id}" for chunk_id in ids] for ids in rankings],
+            "metadatas": [[{"ticker": "AAPL"} for _ in ids] for ids in rankings],
+            "distances": [[0.1 * rank for rank in range(1, len(ids) + 1)] for ids in rankings],
+        }
+
+
+def test_retrieve_report_fuses_sub_queries_from_one_batched_query(monkeypatch, tmp_path):
+    async def run():
+        dummy_collection = MultiQueryCollection()
+        _patch_retrieval(monkeypatch, dummy_collection, _indexed(tmp_path))
+
+        return dummy_collection, await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="earnings summary",
+                sub_queries=["AAPL risk factors", "AAPL guidance", "earnings summary", " "],
+                domain="edgar",
+                filters={"ticker": "AAPL"},
+                top_k=4,
+            )
+        )
+
+    dummy_collection, result = asyncio.run(run())
+    expected_queries = ["earnings summary", "AAPL risk factors", "AAPL guidance"]
+    assert result["queries"] == expected_queries
+    assert dummy_collection.embedding_counts == [len(expected_queries)]
+    # chunk-1 and chunk-3 are found by two queries each, so they outrank single hits.
+    assert [match["id"] for match in result["matches"]] == [
+        "chunk-1",
+        "chunk-3",
+        "chunk-4",
+        "chunk-2",
+    ]
+
+
+class SectionedCollection(DummyCollection):
+    """Only chunks tagged with a section match section-scoped filters."""
+
+    def __init__(self, *, tagged: bool) -> None:
+        super().__init__()
+        self.tagged = tagged
+
+    async def query(self, *, where=None, **kwargs):
+        result = await super().query(where=where, **kwargs)
+        if "$and" in (where or {}) and not self.tagged:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        return result
+
+
+def test_retrieve_report_scopes_search_to_sections_with_fallback(monkeypatch, tmp_path):
+    def retrieve():
+        return retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="What risks and guidance did management give?",
+                domain="edgar",
+                filters={"ticker": "AAPL"},
+                sections=["risk_factors", "mdna"],
+            )
+        )
+
+    async def run():
+        tagged = SectionedCollection(tagged=True)
+        _patch_retrieval(monkeypatch, tagged, _indexed(tmp_path))
+        scoped = await retrieve()
+        assert tagged.query_calls == [
+            {
+                "$and": [
+                    {"ticker": "AAPL"},
+                    {"section": {"$in": ["item_1a", "part_ii_item_1a", "item_7", "part_i_item_2"]}},
+                ]
+            }
+        ]
+        assert scoped["sections"] == ["risk_factors", "mdna"]
+
+        # Filings ingested before section tagging are still found by the unscoped search.
+        legacy = SectionedCollection(tagged=False)
+        _patch_retrieval(monkeypatch, legacy, _indexed(tmp_path))
+        fallback = await retrieve()
+        assert legacy.query_calls[-1] == {"ticker": "AAPL"}
+        assert fallback["sections"] is None
+        assert [match["id"] for match in fallback["matches"]] == ["chunk-1"]
+
+    asyncio.run(run())
+
+
+def test_retrieve_report_resolves_document_contains_from_fulltext_index(monkeypatch, tmp_path):
+    async def run():
+        dummy_collection = DummyCollection()
+        _patch_retrieval(monkeypatch, dummy_collection, _indexed(tmp_path), _manifest(tmp_path))
+
+        result = await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="impairment testing",
+                domain="edgar",
+                filters={"ticker": "AAPL"},
+                document_contains="goodwill impairment",
+            )
+        )
+        assert dummy_collection.ids_calls == [["chunk-2"]]
+        assert dummy_collection.where_document_calls == [None]
+        assert result["keyword_filter"] == "fulltext"
+
+        # Tickers the index has never seen still use Chroma's document scan.
+        await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="impairment testing",
+                domain="edgar",
+                filters={"ticker": "NVDA"},
+                document_contains="goodwill impairment",
+            )
+        )
+        assert dummy_collection.where_document_calls[-1] == {"$contains": "goodwill impairment"}
+
+        # Too many matches to pass as ids also falls back to the document scan.
+        monkeypatch.setattr(retrieve_report_impl, "MAX_KEYWORD_IDS", 0)
+        await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="impairment testing",
+                domain="edgar",
+                filters={"ticker": "AAPL"},
+                document_contains="goodwill impairment",
+            )
+        )
+        assert dummy_collection.ids_calls[-1] is None
+        assert dummy_collection.where_document_calls[-1] == {"$contains": "goodwill impairment"}
+
+    asyncio.run(run())
+
+
+def test_retrieve_report_skips_fulltext_index_for_partly_indexed_scope(monkeypatch, tmp_path):
+    async def run():
+        dummy_collection = DummyCollection()
+        # ACC-9 is in Chroma but its keyword indexing failed.
+        manifest = _manifest(tmp_path, **{"ACC-9": 3})
+        _patch_retrieval(monkeypatch, dummy_collection, _indexed(tmp_path), manifest)
+
+        contains = await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="impairment testing",
+                domain="edgar",
+                filters={"ticker": "AAPL"},
+                document_contains="goodwill impairment",
+            )
+        )
+        assert contains["keyword_filter"] == "chroma"
+        assert dummy_collection.ids_calls == [None]
+
+        hybrid = await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(
+                query="goodwill impairment",
+                domain="edgar",
+                filters={"ticker": "AAPL"},
+                top_k=2,
+                retrieval_mode="hybrid",
+            )
+        )
+        # Pure vector search: the indexed BM25 hit chunk-2 is not fused in.
+        assert [match["id"] for match in hybrid["matches"]] == ["chunk-1"]
+
+    asyncio.run(run())
+
+
+def test_retrieve_report_caches_results_until_ticker_content_changes(monkeypatch, tmp_path):
+    async def run():
+        dummy_collection = DummyCollection()
+        _patch_retrieval(monkeypatch, dummy_collection, _indexed(tmp_path))
+        manifest = IngestionManifest(str(tmp_path / "manifest"))
+        monkeypatch.setattr(retrieve_report_impl, "ingestion_manifest", manifest)
+        cache = Cache(str(tmp_path / "cache"))
+
+        def retrieve(ticker: str):
+            return retrieve_report_impl._retrieve_report(
+                RAGRetrieveInput(
+                    query="revenue growth", domain="edgar", filters={"ticker": ticker}
+                ),
+                cache=cache,
+            )
+
+        first = await retrieve("AAPL")
+        assert await retrieve("aapl") == first
+        assert len(dummy_collection.query_calls) == 1
+
+        # Another company's ingest leaves AAPL results cached.
+        manifest.bump_content_version("edgar_filings", "MSFT")
+        await retrieve("AAPL")
+        assert len(dummy_collection.query_calls) == 1
+
+        manifest.bump_content_version("edgar_filings", "AAPL")
+        await retrieve("AAPL")
+        assert len(dummy_collection.query_calls) == EXPECTED_QUERIES_AFTER_INGEST
+
+    asyncio.run(run())
+
+
+def _chunk(chunk_id: str, rank: int, chunk_index: int, text: str) -> dict:
+    return {
+        "rank": rank,
+        "id": chunk_id,
+        "document": text,
+        "metadata": {
+            "ticker": "AAPL",
+            "form": "10-K",
+            "filing_date": "2024-11-01",
+            "accession_number": "ACC-1",
+            "section_title": "Item 7. MD&A",
+            "chunk_index": chunk_index,
+        },
+    }
+
+
+def test_build_rag_context_merges_adjacent_chunks_and_strips_overlap():
+    overlap = "Gross margin expanded on a richer services mix."
+    matches = [
+        _chunk("ACC-1:4", 1, 4, f"{overlap} Operating expenses grew 5% year over year."),
+        _chunk("ACC-1:9", 2, 9, "Share repurchases totalled $95 billion."),
+        _chunk("ACC-1:3", 3, 3, f"Net sales rose 2% to $391 billion. {overlap}"),
+        _chunk("ACC-1:4-dup", 4, 4, f"{overlap} Operating expenses grew 5% year over year."),
+    ]
+
+    context = build_rag_context(matches, tokenizer=Tokenizer())
+
+    assert context.split("\n\n") == [
+        "[1] AAPL | 10-K | 2024-11-01 | Item 7. MD&A | #3-4\n"
+        f"Net sales rose 2% to $391 billion. {overlap} Operating expenses grew 5% year over year.",
+        "[2] AAPL | 10-K | 2024-11-01 | Item 7. MD&A | #9\nShare repurchases totalled $95 billion.",
+    ]
+
+
+def test_build_rag_context_packs_to_token_budget():
+    matches = [
+        _chunk(f"ACC-1:{i}", i + 1, i * 2, f"Paragraph {i}. " + "word " * 200) for i in range(5)
+    ]
+    tokenizer = Tokenizer()
+
+    context = build_rag_context(matches, max_tokens=CONTEXT_TOKEN_BUDGET, tokenizer=tokenizer)
+
+    assert tokenizer.count(context) <= CONTEXT_TOKEN_BUDGET
+    assert context.startswith("[1] ")
+    assert "[2] " in context
+    assert context.endswith("...")
+    assert "[3] " not in context
+
+
+def test_retrieve_report_routes_to_ticker_shards(monkeypatch):
+    async def run():
+        client = ChromaClient(sharding_mode="ticker")
+        shards = {"AAPL": DummyCollection(), "MSFT": DummyCollection()}
+        for ticker, collection in shards.items():
+            client._collections[client.route("edgar_filings", ticker)] = collection
+
+        async def list_collection_names(*, cache):
+            return sorted(client._collections)
+
+        monkeypatch.setattr(client, "list_collection_names", list_collection_names)
+        monkeypatch.setattr(retrieve_report_impl, "chroma_client", client)
+        monkeypatch.setattr(
+            retrieve_report_impl,
+            "embedding_registry",
+            EmbeddingRegistry(resolver=lambda name: DummyEmbedModel()),
+        )
+
+        await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(query="revenue", domain="edgar", filters={"ticker": "msft"})
+        )
+        assert len(shards["MSFT"].query_calls) == 1
+        assert shards["AAPL"].query_calls == []
+
+        # Reads not scoped to one ticker fan out across every shard.
+        result = await retrieve_report_impl._retrieve_report(
+            RAGRetrieveInput(query="revenue", filters={"form": "10-K"}, top_k=2)
+        )
+        assert [len(collection.query_calls) for collection in shards.values()] == [1, 2]
+        assert [match["rank"] for match in result["matches"]] == [1, 2]
+
+    asyncio.run(run())
+
+
+def test_chroma_client_routes_hash_buckets_deterministically():
+    client = ChromaClient(sharding_mode="hash", shard_buckets=8)
+
+    assert client.route("edgar_filings", "aapl") == client.route("edgar_filings", "AAPL")
+    assert client.route("edgar_filings", "AAPL").startswith("edgar_filings__b00")
+    assert client.route("edgar_filings") == "edgar_filings"
+    assert ChromaClient(sharding_mode="none").route("edgar_filings", "AAPL") == "edgar_filings"
+    assert ChromaClient(sharding_mode="ticker").route("edgar_filings", "BRK.B") == (
+        "edgar_filings__brk.b"
+    )
+
+
+class HotTickerCollection(DummyCollection):
+    def __init__(self) -> None:
+        super().__init__()
+        self.metadata = {"hnsw:space": "l2"}
+        self.get_calls = 0
+
+    async def get(self, *, where, include) -> dict:
+        self.get_calls += 1
+        return {
+            "ids": ["ACC-1:0", "ACC-1:1", "ACC-2:0"],
+            "embeddings": [[0.0, 1.0], [0.1, 0.2], [0.1, 0.25]],
+            "documents": ["Risk factors.", "Revenue grew 8%.", "Revenue grew 3%."],
+            "metadatas": [
+                {"ticker": "AAPL", "form": "10-K"},
+                {"ticker": "AAPL", "form": "10-K"},
+                {"ticker": "AAPL", "form": "10-Q"},
+            ],
+        }
+
+
+def test_retrieve_report_answers_hot_tickers_from_local_vectors(monkeypatch, tmp_path):
+    async def run():
+        collection = HotTickerCollection()
+        client = ChromaClient()
+        client._collections["edgar_filings"] = collection
+        versions = {"AAPL": 0}
+        hot_cache = HotVectorCache(
+            str(tmp_path / "hot"),
+            version_source=lambda collection_name, ticker: versions[ticker],
+            promote_after=2,
+        )
+        monkeypatch.setattr(retrieve_report_impl, "chroma_client", client)
+        monkeypatch.setattr(retrieve_report_impl, "hot_vector_cache", hot_cache)
+        monkeypatch.setattr(
+            retrieve_report_impl,
+            "embedding_registry",
+            EmbeddingRegistry(resolver=lambda name: DummyEmbedModel()),
+        )
+
+        async def retrieve(filters: dict) -> dict:
+            result = await retrieve_report_impl._retrieve_report(
+                RAGRetrieveInput(query="revenue", domain="edgar", filters=filters, top_k=2)
+            )
+            await asyncio.gather(*hot_cache._tasks)
+            return result
+
+        for _ in range(2):
+            await retrieve({"ticker": "AAPL"})
+        assert len(collection.query_calls) == EXPECTED_QUERIES_BEFORE_PROMOTION
+        assert collection.get_calls == 1
+
+        # Exact search over the shard, filtered like Chroma would: nearest 10-K chunk first.
+        result = await retrieve({"ticker": "AAPL", "form": "10-K"})
+        assert len(collection.query_calls) == EXPECTED_QUERIES_BEFORE_PROMOTION
+        assert [match["id"] for match in result["matches"]] == ["ACC-1:1", "ACC-1:0"]
+        assert result["matches"][0]["distance"] == pytest.approx(0.0, abs=1e-6)
+
+        # A new ingest for the ticker sends reads back to Chroma until the shard is rebuilt.
+        versions["AAPL"] = 1
+        await retrieve({"ticker": "AAPL"})
+        assert len(collection.query_calls) == EXPECTED_QUERIES_BEFORE_PROMOTION + 1
+        assert collection.get_calls == EXPECTED_SHARD_LOADS_AFTER_INGEST
+
+    asyncio.run(run())
+
+
+def test_embedding_reduction_keeps_neighbours_of_low_rank_data():
+    rng = np.random.default_rng(7)
+    # 64-d vectors that really live on 8 dimensions: PCA to 8 loses nothing.
+    corpus = rng.normal(size=(300, 8)) @ rng.normal(size=(8, 64))
+    queries = corpus[:20] + 0.01 * rng.normal(size=(20, 64))
+
+    baseline, matryoshka, pca = recall_report(
+        corpus, queries, [MatryoshkaReducer(8), PcaReducer.fit(corpus, 8)], k=5
+    )
+
+    assert baseline.recall_at_k == 1.0
+    assert pca.recall_at_k == pytest.approx(1.0)
+    assert pca.size_ratio == pytest.approx(8 / 64)
+    assert matryoshka.spec == "matryoshka:8"
+    assert 0.0 <= matryoshka.recall_at_k <= 1.0
+
+
+def test_retrieve_report_applies_collection_embedding_reduction(monkeypatch):
+    async def run():
+        dummy_collection = DummyCollection()
+        captured: list[list[float]] = []
+        original_query = dummy_collection.query
+
+        async def query(**kwargs):
+            captured.extend(kwargs["query_embeddings"])
+            return await original_query(**kwargs)
+
+        dummy_collection.query = query
+        monkeypatch.setenv("RAG_EMBED_REDUCTION", "matryoshka:1")
+        get_embedding_reducer.cache_clear()
+        try:
+            _patch_retrieval(monkeypatch, dummy_collection, FullTextIndex(":memory:"))
+            await retrieve_report_impl._retrieve_report(
+                RAGRetrieveInput(query="revenue", domain="edgar", filters={"ticker": "AAPL"})
+            )
+        finally:
+            get_embedding_reducer.cache_clear()
+
+        assert captured == [[pytest.approx(1.0)]]
+
+    asyncio.run(run())
+
+
+def test_fulltext_index_keeps_per_accession_counts_outside_the_fts_table(tmp_path):
+    path = str(tmp_path / "fulltext.sqlite3")
+    # An index file from before the bookkeeping table: only the FTS rows exist.
+    legacy = sqlite3.connect(path)
+    legacy.execute(fulltext_index.SCHEMA.split(";")[0])
+    legacy.executemany(
+        "INSERT INTO chunks (document, chunk_id, collection, accession_number, metadata) "
+        "VALUES (?, ?, 'edgar_filings', ?, '{}')",
+        [("Goodwill impairment.", "ACC-1:0", "ACC-1"), ("Net sales.", "ACC-1:1", "ACC-1")],
+    )
+    legacy.commit()
+    legacy.close()
+
+    index = FullTextIndex(path)
+    assert index.indexed_counts("edgar_filings", ["ACC-1", "ACC-2"]) == {"ACC-1": 2}
+
+    # Re-indexing replaces the accession's rows, including the backfilled ones.
+    index.add_chunks("edgar_filings", "ACC-1", [("ACC-1:0", "Goodwill impairment.", {})])
+    assert index.indexed_counts("edgar_filings", ["ACC-1"]) == {"ACC-1": 1}
+    scope = {"ACC-1": 1}
+    assert index.match_ids("edgar_filings", "goodwill impairment", expected=scope, limit=10) == [
+        "ACC-1:0"
+    ]
+    # Punctuation is left to Chroma's substring match.
+    assert index.match_ids("edgar_filings", "impairment.", expected=scope, limit=10) is None
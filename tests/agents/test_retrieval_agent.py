@@ -3,14 +3,16 @@ from __future__ import annotations
 import asyncio
 
 from src.agents.retrieval.retrieval_agent import AnalystRetrievalAgent
+from src.models.rag_retrieve import EdgarSearchMetaData, FilingResult
 
 
 def test_retrieval_agent_process(monkeypatch):
     async def run():
         agent = AnalystRetrievalAgent()
-        upsert_calls: list[dict[str, object]] = []
+        enqueue_calls: list[dict[str, object]] = []
+        plan_calls: list[dict[str, object]] = []
 
-        async def fake_call(self, server_url, tool_name, tool_input):
+        async def fake_call(self, server_url, tool_name, tool_input):  # noqa: PLR0911
             if tool_name == "search_reports":
                 return {
                     "ticker": "NVDA",
@@ -35,9 +37,25 @@ def test_retrieval_agent_process(monkeypatch):
                         }
                     ],
                 }
-            if tool_name == "upsert_edgar_report":
-                upsert_calls.append(tool_input)
-                return None
+            if tool_name == "plan_edgar_ingestion":
+                plan_calls.append(tool_input)
+                return {"pending": ["ACC-1"], "ingested": []}
+            if tool_name == "enqueue_edgar_reports":
+                enqueue_calls.append(tool_input)
+                return {"jobs": []}
+            if tool_name == "get_ingestion_jobs":
+                assert tool_input["accession_numbers"] == ["ACC-1"]
+                return {
+                    "jobs": [
+                        {
+                            "accession_number": "ACC-1",
+                            "href": "https://edgar/ACC-1",
+                            "collection_name": "edgar_filings",
+                            "status": "succeeded",
+                            "enqueued_at": "2024-01-01T00:00:00Z",
+                        }
+                    ]
+                }
             if tool_name == "retrieve_report":
                 return {"context": "rg_context"}
             if tool_name == "news_sentiment":
@@ -61,13 +79,20 @@ def test_retrieval_agent_process(monkeypatch):
                         "time_published": "20241120T000000",
                     }
                 ]
-            if tool_name == "extract_financial_statement":
+            if tool_name == "extract_financial_statements":
                 return {
                     "accession_number": "ACC-1",
-                    "statement_type": "income_statement",
-                    "statement_text": "net income detail",
-                    "chunks_returned": 1,
-                    "matches_examined": 1,
+                    "statements": [
+                        {
+                            "accession_number": "ACC-1",
+                            "statement_type": statement_type,
+                            "statement_text": f"{statement_type} detail",
+                            "chunks_returned": 1,
+                            "matches_examined": 1,
+                        }
+                        for statement_type in tool_input["statement_types"]
+                    ],
+                    "chunk_counts": dict.fromkeys(tool_input["statement_types"], 1),
                 }
             if tool_name == "get_financial_reports":
                 return {"cik": "0001234", "symbol": "NVDA", "data": []}
@@ -86,11 +111,19 @@ def test_retrieval_agent_process(monkeypatch):
         assert result.status == "success"
         assert result.answer == "rg_context"
         assert len(result.edgar_filings.filings) == 1
-        assert len(upsert_calls) == 1
+        assert len(enqueue_calls) == 1
+        assert enqueue_calls[0]["filings"][0]["href"] == "https://edgar/ACC-1"
+        assert plan_calls == [{"accession_numbers": ["ACC-1"]}]
         assert result.market_news[0].title == "Tech headline"
         assert result.metadata.warnings == []
         assert result.financial_statement is not None
         assert result.financial_statement.statement_type == "income_statement"
+        assert result.financial_statements is not None
+        assert result.financial_statements.chunk_counts == {
+            "income_statement": 1,
+            "balance_sheet": 1,
+            "cash_flow_statement": 1,
+        }
         assert result.financial_reports is not None
         assert result.financial_reports.symbol == "NVDA"
 
@@ -104,8 +137,6 @@ def test_retrieval_agent_handles_retriable_error(monkeypatch):
         async def fake_call(self, server_url, tool_name, tool_input):
             if tool_name == "search_reports":
                 raise ValueError("search backend busy")
-            if tool_name == "upsert_edgar_report":
-                return None
             if tool_name == "retrieve_report":
                 return {"context": "partial_context"}
             if tool_name == "news_sentiment":
@@ -129,3 +160,61 @@ def test_retrieval_agent_handles_retriable_error(monkeypatch):
         assert result.market_news == []
 
     asyncio.run(run())
+
+
+def test_retrieval_agent_waits_on_filings_ingested_elsewhere(monkeypatch):
+    async def run():
+        agent = AnalystRetrievalAgent()
+        calls: list[tuple[str, dict[str, object]]] = []
+
+        async def fake_call(self, server_url, tool_name, tool_input):
+            calls.append((tool_name, tool_input))
+            if tool_name == "plan_edgar_ingestion":
+                return {"in_progress": ["ACC-QUEUED", "ACC-DIRECT"], "ingested": ["ACC-DONE"]}
+            if tool_name == "get_ingestion_jobs":
+                return {
+                    "jobs": [
+                        {
+                            "accession_number": "ACC-QUEUED",
+                            "href": "https://edgar/ACC-QUEUED",
+                            "collection_name": "edgar_filings",
+                            "status": "running",
+                            "enqueued_at": "2024-01-01T00:00:00Z",
+                        }
+                    ],
+                    "unknown": ["ACC-DIRECT"],
+                }
+            raise AssertionError(tool_name)
+
+        monkeypatch.setattr(AnalystRetrievalAgent, "call_mcp_tool", fake_call)
+
+        filings = [
+            FilingResult(
+                form="10-K",
+                filing_date="2024-01-01",
+                accession_number=accession,
+                href=f"https://edgar/{accession}",
+                metadata=EdgarSearchMetaData(
+                    cik="0001234",
+                    ticker="NVDA",
+                    company_name="NVIDIA",
+                    form="10-K",
+                    filing_date="2024-01-01",
+                    report_date="2023-12-31",
+                    accession_number=accession,
+                    collection_name="edgar_filings",
+                ),
+            )
+            for accession in ("ACC-QUEUED", "ACC-DIRECT", "ACC-DONE")
+        ]
+        metadata = await agent._upsert_filings(filings)
+
+        # Nothing new to enqueue, but the in-progress ingests are waited on and reported.
+        assert [name for name, _ in calls] == ["plan_edgar_ingestion", "get_ingestion_jobs"]
+        assert calls[1][1]["accession_numbers"] == ["ACC-QUEUED", "ACC-DIRECT"]
+        assert metadata.warnings == [
+            "ingestion still running for ACC-QUEUED, ACC-DIRECT; "
+            "retrieval used already indexed filings only"
+        ]
+
+    asyncio.run(run())